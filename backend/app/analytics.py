@@ -0,0 +1,174 @@
+"""
+Vectorized KPI breakdowns over arbitrary date ranges.
+
+One query pulls (user_id, team_id, clock_in, clock_out) as epoch-second
+columns; grouping, percentiles and histograms are then computed with
+NumPy instead of looping over Clock objects.
+"""
+from datetime import datetime
+from typing import Literal, Optional
+
+import numpy as np
+from sqlalchemy import Float, cast
+from sqlmodel import Session, select
+
+from app.kpi_engine import (
+    SECONDS_PER_DAY,
+    WORKDAY_START_SECONDS,
+    WORKDAY_END_SECONDS,
+    LATE_THRESHOLD_SECONDS,
+    OVERTIME_THRESHOLD_SECONDS,
+    epoch_seconds,
+)
+from app.models import Clock, Team, User, KPIBreakdown, KPIGroupStats
+
+# Histogram bucket edges, in minutes (last bucket is open-ended)
+LATENESS_BINS = [0, 5, 15, 30, 60]
+OVERTIME_BINS = [0, 30, 60, 120, 240]
+
+PERCENTILES = (50, 90, 95)
+
+
+def load_shift_columns(
+    session: Session,
+    start: datetime,
+    end: datetime,
+    team_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+) -> np.ndarray:
+    """
+    Return an (N, 4) float array: user_id, team_id, clock_in, clock_out
+    (epoch seconds). Missing team / open shifts are NaN.
+    """
+    statement = (
+        select(
+            Clock.user_id,
+            User.team_id,
+            cast(epoch_seconds(Clock.clock_in), Float),
+            cast(epoch_seconds(Clock.clock_out), Float),
+        )
+        .join(User, User.id == Clock.user_id)
+        .where(Clock.clock_in >= start, Clock.clock_in < end)
+    )
+    if team_id is not None:
+        statement = statement.where(User.team_id == team_id)
+    if user_id is not None:
+        statement = statement.where(Clock.user_id == user_id)
+
+    rows = session.exec(statement).all()
+    if not rows:
+        return np.empty((0, 4), dtype=np.float64)
+    return np.array(rows, dtype=np.float64)
+
+
+def _grouped_histogram(group_index: np.ndarray, values: np.ndarray, edges, n_groups: int) -> np.ndarray:
+    """(n_groups, len(edges)) counts; the last bucket collects values >= edges[-1]."""
+    buckets = np.searchsorted(edges, values, side="right") - 1
+    flat = np.bincount(group_index * len(edges) + buckets, minlength=n_groups * len(edges))
+    return flat.reshape(n_groups, len(edges))
+
+
+def _grouped_percentiles(group_index: np.ndarray, values: np.ndarray, n_groups: int) -> np.ndarray:
+    """(n_groups, len(PERCENTILES)) percentiles; NaN for empty groups."""
+    out = np.full((n_groups, len(PERCENTILES)), np.nan)
+    if values.size == 0:
+        return out
+    order = np.lexsort((values, group_index))
+    sorted_groups, sorted_values = group_index[order], values[order]
+    boundaries = np.flatnonzero(np.diff(sorted_groups)) + 1
+    for group, chunk in zip(sorted_groups[np.r_[0, boundaries]], np.split(sorted_values, boundaries)):
+        out[group] = np.percentile(chunk, PERCENTILES)
+    return out
+
+
+def _sum_by_group(group_index: np.ndarray, weights: np.ndarray, n_groups: int) -> np.ndarray:
+    return np.bincount(group_index, weights=weights, minlength=n_groups)
+
+
+def _labels(session: Session, group_by: str, ids) -> dict:
+    ids = [int(i) for i in ids if i >= 0]
+    if not ids:
+        return {}
+    if group_by == "team":
+        rows = session.exec(select(Team.id, Team.name).where(Team.id.in_(ids))).all()
+        return dict(rows)
+    rows = session.exec(select(User.id, User.first_name, User.last_name).where(User.id.in_(ids))).all()
+    return {uid: f"{first} {last}" for uid, first, last in rows}
+
+
+def _round(value, digits=2):
+    return None if np.isnan(value) else round(float(value), digits)
+
+
+def compute_breakdown(
+    session: Session,
+    start: datetime,
+    end: datetime,
+    group_by: Literal["team", "user"] = "team",
+    team_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+) -> KPIBreakdown:
+    data = load_shift_columns(session, start, end, team_id=team_id, user_id=user_id)
+    users, teams, clock_in, clock_out = data.T
+
+    # Shifts without a team are grouped under id -1
+    keys = np.nan_to_num(teams if group_by == "team" else users, nan=-1).astype(np.int64)
+    group_ids, group_index = np.unique(keys, return_inverse=True)
+    n_groups = group_ids.size
+
+    completed = ~np.isnan(clock_out)
+    shift_hours = (clock_out[completed] - clock_in[completed]) / 3600.0
+
+    in_of_day = np.mod(clock_in, SECONDS_PER_DAY)
+    late = in_of_day >= LATE_THRESHOLD_SECONDS
+    late_minutes = (in_of_day[late] - WORKDAY_START_SECONDS) / 60.0
+
+    out_of_day = np.mod(clock_out, SECONDS_PER_DAY, where=completed, out=np.zeros_like(clock_out))
+    overtime = completed & (out_of_day >= OVERTIME_THRESHOLD_SECONDS)
+    overtime_minutes = (out_of_day[overtime] - WORKDAY_END_SECONDS) / 60.0
+
+    shifts = np.bincount(group_index, minlength=n_groups)
+    completed_shifts = np.bincount(group_index[completed], minlength=n_groups)
+    total_hours = _sum_by_group(group_index[completed], shift_hours, n_groups)
+    hours_pct = _grouped_percentiles(group_index[completed], shift_hours, n_groups)
+
+    late_shifts = np.bincount(group_index[late], minlength=n_groups)
+    late_pct = _grouped_percentiles(group_index[late], late_minutes, n_groups)
+    late_hist = _grouped_histogram(group_index[late], late_minutes, LATENESS_BINS, n_groups)
+
+    overtime_shifts = np.bincount(group_index[overtime], minlength=n_groups)
+    overtime_total = _sum_by_group(group_index[overtime], overtime_minutes, n_groups) / 60.0
+    overtime_hist = _grouped_histogram(group_index[overtime], overtime_minutes, OVERTIME_BINS, n_groups)
+
+    labels = _labels(session, group_by, group_ids)
+    groups = []
+    for g, key in enumerate(group_ids):
+        key = int(key)
+        groups.append(KPIGroupStats(
+            id=key if key >= 0 else None,
+            label=labels.get(key, "No team" if group_by == "team" else str(key)),
+            shifts=int(shifts[g]),
+            completedShifts=int(completed_shifts[g]),
+            totalHours=round(float(total_hours[g]), 2),
+            avgShiftHours=round(float(total_hours[g] / completed_shifts[g]), 2) if completed_shifts[g] else 0.0,
+            shiftHoursP50=_round(hours_pct[g, 0]),
+            shiftHoursP90=_round(hours_pct[g, 1]),
+            shiftHoursP95=_round(hours_pct[g, 2]),
+            lateShifts=int(late_shifts[g]),
+            lateRate=round(float(late_shifts[g] / shifts[g]), 3),
+            lateMinutesP50=_round(late_pct[g, 0], 1),
+            lateMinutesP90=_round(late_pct[g, 1], 1),
+            latenessHistogram=late_hist[g].tolist(),
+            overtimeShifts=int(overtime_shifts[g]),
+            overtimeHours=round(float(overtime_total[g]), 2),
+            overtimeHistogram=overtime_hist[g].tolist(),
+        ))
+
+    return KPIBreakdown(
+        start=start,
+        end=end,
+        groupBy=group_by,
+        latenessBinsMinutes=LATENESS_BINS,
+        overtimeBinsMinutes=OVERTIME_BINS,
+        groups=groups,
+    )
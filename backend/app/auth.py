@@ -1,13 +1,24 @@
+import hashlib
 import os
-import requests
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
 from dotenv import load_dotenv
 from fastapi import Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import HTTPBearer
+from sqlalchemy.orm import selectinload
 from sqlmodel import Session, select
-from jose import jwt, JWTError
+from sqlmodel.ext.asyncio.session import AsyncSession
+from jose import jwk, jwt, JWTError
 
-from app.database import get_session
+from app.database import get_async_session
+from app.read_routing import replica_router
+from app.http_client import keycloak_http
 from app.models import User, UserPublic
+from app.identity_sync import identity_writes, create_user_from_token
 
 # ==========================================
 # CONFIG
@@ -29,45 +40,165 @@ KEYCLOAK_JWKS_URL = (
 # Only keep business roles that the app uses
 BUSINESS_ROLES = {"employee", "manager", "organization"}
 
+
+def business_roles(roles) -> List[str]:
+    """Stored form of realm roles: business roles only, deduplicated and
+    sorted, so token order and the reconciler never disagree."""
+    return sorted({r for r in roles if r in BUSINESS_ROLES})
+
+# Keycloak public keys: refreshed every JWKS_TTL seconds, or on an
+# unknown kid at most once every JWKS_MIN_REFRESH_INTERVAL seconds
+JWKS_TTL = int(os.getenv("JWKS_TTL", "3600"))
+JWKS_MIN_REFRESH_INTERVAL = int(os.getenv("JWKS_MIN_REFRESH_INTERVAL", "30"))
+JWKS_FETCH_TIMEOUT = float(os.getenv("JWKS_FETCH_TIMEOUT", "5"))
+
+# Verified tokens kept in memory (entries live until the token's exp,
+# capped so DB-side user changes show up within TOKEN_CACHE_MAX_TTL)
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "1024"))
+TOKEN_CACHE_MAX_TTL = int(os.getenv("TOKEN_CACHE_MAX_TTL", "300"))
+
 # ==========================================
 # JWKS CACHE
 # ==========================================
-jwks_cache = None
+def fetch_jwks() -> dict:
+    """Download the realm's public keys from Keycloak."""
+    resp = keycloak_http.request_sync("GET", KEYCLOAK_JWKS_URL, endpoint="jwks", timeout=JWKS_FETCH_TIMEOUT)
+    resp.raise_for_status()
+    return resp.json()
 
 
-def get_jwks():
+class JWKSManager:
     """
-    Load the list of Keycloak public keys.
-    Cache the response to avoid spamming the IDP.
+    kid -> prebuilt RS256 key, refreshed when older than `ttl` or when a
+    token carries an unknown kid (Keycloak key rotation).
+
+    Refetches are single-flight (one thread fetches, the others wait and
+    reuse its result) and rate-limited to one per `min_interval` seconds,
+    so a flood of forged kids cannot hammer Keycloak. If a refresh fails
+    the previous keys are kept. Token verification (verify_token) runs in
+    FastAPI's threadpool, so fetches never block the event loop.
     """
-    global jwks_cache
 
-    if jwks_cache is None:
-        resp = requests.get(KEYCLOAK_JWKS_URL)
-        resp.raise_for_status()
-        jwks_cache = resp.json()
+    def __init__(self, fetch=fetch_jwks, ttl: float = JWKS_TTL, min_interval: float = JWKS_MIN_REFRESH_INTERVAL):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.min_interval = min_interval
+        self._keys = {}
+        self._fetched_at = None
+        self._attempted_at = None
+        self._lock = threading.Lock()
+
+    def _stale(self, now: float) -> bool:
+        return self._fetched_at is None or now - self._fetched_at >= self.ttl
 
-    return jwks_cache
+    def refresh(self, force: bool = False) -> bool:
+        """Refetch the key set; returns False when skipped (rate limit) or failed."""
+        attempted_before = self._attempted_at
+        with self._lock:
+            now = time.monotonic()
+            if self._attempted_at != attempted_before:
+                # Another thread refreshed while we waited for the lock
+                return True
+            if not force and not self._stale(now):
+                return True
+            if self._attempted_at is not None and now - self._attempted_at < self.min_interval:
+                return False
+
+            self._attempted_at = now
+            try:
+                document = self.fetch()
+                keys = {
+                    key["kid"]: jwk.construct(key, key.get("alg", "RS256"))
+                    for key in document.get("keys", [])
+                    if key.get("kid") and key.get("use", "sig") == "sig"
+                }
+            except Exception as e:
+                print(f"[Auth] JWKS refresh failed, keeping {len(self._keys)} cached keys: {e}")
+                return False
+
+            self._keys = keys
+            self._fetched_at = now
+            return True
+
+    def get_key(self, kid: str):
+        """Key for kid, refreshing on TTL expiry or unknown kid. None if still unknown."""
+        if self._stale(time.monotonic()):
+            self.refresh()
+        key = self._keys.get(kid)
+        if key is None:
+            self.refresh(force=True)
+            key = self._keys.get(kid)
+        return key
+
+
+jwks_manager = JWKSManager()
 
 
 # ==========================================
-# TOKEN VALIDATION
+# VERIFIED TOKEN CACHE
 # ==========================================
-def get_current_user(
-    credentials=Depends(bearer_scheme),
-    session: Session = Depends(get_session),
-):
+class TokenCache:
     """
-    1. Retrieve the Bearer token
-    2. Retrieve the Keycloak public key (JWKS)
-    3. Decode + validate the JWT
-    4. Extract user information
-    5. Map Keycloak → User DB
+    Bounded LRU of verified tokens: sha256(token) -> (expires_at, UserPublic).
+    A hit skips the signature check and the user lookup.
     """
 
-    token = credentials.credentials
-    jwks = get_jwks()
+    def __init__(self, maxsize: int = TOKEN_CACHE_SIZE, max_ttl: int = TOKEN_CACHE_MAX_TTL):
+        self.maxsize = maxsize
+        self.max_ttl = max_ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str) -> Optional[UserPublic]:
+        key = self.key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.time():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1].model_copy()
+
+    def put(self, token: str, exp: Optional[float], user: UserPublic):
+        if self.maxsize <= 0:
+            return
+        expires_at = time.time() + self.max_ttl
+        if exp is not None:
+            expires_at = min(expires_at, float(exp))
+        with self._lock:
+            self._entries[self.key(token)] = (expires_at, user.model_copy())
+            self._entries.move_to_end(self.key(token))
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
 
+
+token_cache = TokenCache()
+
+
+# ==========================================
+# TOKEN VALIDATION
+# ==========================================
+def verify_token(token: str) -> dict:
+    """
+    Check the token's RS256 signature, audience and issuer against the
+    Keycloak JWKS; returns the claims. Blocking (JWKS fetch, RSA math).
+    """
     try:
         # Read the JWT header to retrieve the kid
         header = jwt.get_unverified_header(token)
@@ -77,12 +208,12 @@ def get_current_user(
             raise HTTPException(status_code=401, detail="Invalid token header: missing kid")
 
         # Find the correct key in the JWKS
-        rsa_key = next((key for key in jwks["keys"] if key["kid"] == kid), None)
+        rsa_key = jwks_manager.get_key(kid)
         if rsa_key is None:
             raise HTTPException(status_code=401, detail="Invalid token key ID")
 
         # Decode the Keycloak token
-        payload = jwt.decode(
+        return jwt.decode(
             token,
             rsa_key,
             algorithms=["RS256"],
@@ -93,6 +224,35 @@ def get_current_user(
     except JWTError as e:
         raise HTTPException(status_code=401, detail=f"Invalid token: {e}")
 
+
+def _first_login(session: Session, *args) -> Optional[UserPublic]:
+    # Runs on the sync side of the AsyncSession (UserPublic reads relationships)
+    user = create_user_from_token(session, *args)
+    return UserPublic.model_validate(user) if user is not None else None
+
+
+async def get_current_user(
+    credentials=Depends(bearer_scheme),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    1. Retrieve the Bearer token
+    2. Retrieve the Keycloak public key (JWKS)
+    3. Decode + validate the JWT
+    4. Extract user information
+    5. Map Keycloak → User DB
+
+    Repeat requests with an already verified token are served from
+    token_cache until the token expires.
+    """
+
+    token = credentials.credentials
+    cached = token_cache.get(token)
+    if cached is not None:
+        return cached
+
+    payload = await run_in_threadpool(verify_token, token)
+
     # ==========================================
     # EXTRACTION DES INFOS DU PROFIL KEYCLOAK
     # ==========================================
@@ -106,38 +266,40 @@ def get_current_user(
 
     # Roles: filter only those that the app needs
     full_roles = payload.get("realm_access", {}).get("roles", [])
-    realm_roles = [r for r in full_roles if r in BUSINESS_ROLES]
+    realm_roles = business_roles(full_roles)
 
     # ==========================================
     # USER DB : fetch ou auto-create
     # ==========================================
-    stmt = select(User).where(User.keycloak_id == keycloak_id)
-    user = session.exec(stmt).first()
+    stmt = (
+        select(User)
+        .where(User.keycloak_id == keycloak_id)
+        .options(selectinload(User.team), selectinload(User.managed_team))
+    )
+    user = (await session.exec(stmt)).first()
 
     if not user:
-        user = User(
-            keycloak_id=keycloak_id,
-            email=email or f"{keycloak_id}@unknown.local",
-            first_name=first_name,
-            last_name=last_name,
-            phone_number=None,
-            realm_roles=realm_roles,
+        user_public = await session.run_sync(
+            _first_login, keycloak_id, email, first_name, last_name, realm_roles
         )
-        session.add(user)
-        session.commit()
-        session.refresh(user)
+        if user_public is None:
+            raise HTTPException(status_code=409, detail="Email already linked to another account")
+        # Just created on the primary: the route's reads must not miss it
+        replica_router.note_writes([user_public.id])
     else:
-        # Update roles if changed on Keycloak side
-        if user.realm_roles != realm_roles:
-            user.realm_roles = realm_roles
-            session.add(user)
-            session.commit()
-            session.refresh(user)
+        if business_roles(user.realm_roles or []) != realm_roles:
+            # Roles changed on Keycloak side: written behind, not in this request
+            identity_writes.queue_roles(keycloak_id, realm_roles)
+        user_public = UserPublic.model_validate(user)
+
+    # Give the connection back before the route runs: read-only routes
+    # take a second session (get_read_session) and must not hold two
+    await session.close()
 
     # ==========================================
     # USER PUBLIC
     # ==========================================
-    user_public = UserPublic.model_validate(user)
     user_public.realm_roles = realm_roles
 
+    token_cache.put(token, payload.get("exp"), user_public)
     return user_public
@@ -0,0 +1,142 @@
+"""
+Load benchmark of the authentication path, fully offline.
+
+Drives authenticated GET /users/me requests through the real FastAPI app
+(in-process, httpx.ASGITransport) against a temporary SQLite database,
+with tokens minted by FakeKeycloak. Reports p50/p95/p99 latency and RPS
+per scenario:
+
+    verify    new token per request, token cache off (RS256 + user lookup)
+    cached    one token per user, token cache on (steady state of the SPA)
+    baseline  unauthenticated GET / (framework overhead)
+
+    python -m app.benchmarks.auth_bench [--requests 2000] [--concurrency 16] [--users 50]
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from typing import Callable, List
+
+import httpx
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import Session, SQLModel, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app import auth
+from app.benchmarks.fake_keycloak import FakeKeycloak
+from app.database import get_async_session
+from app.read_routing import get_read_session
+from app.main import app
+from app.models import User
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(name: str, latencies: List[float], elapsed: float, errors: int) -> dict:
+    latencies = sorted(latencies)
+    return {
+        "scenario": name,
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+async def drive(client: httpx.AsyncClient, path: str, headers_for: Callable[[int], dict],
+                total: int, concurrency: int):
+    latencies, errors = [], 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            headers = headers_for(i)
+            started = time.perf_counter()
+            response = await client.get(path, headers=headers)
+            latencies.append(time.perf_counter() - started)
+            errors += response.status_code != 200
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, time.perf_counter() - started, errors
+
+
+def setup(users: int):
+    """Temporary DB with `users` users mirrored in a FakeKeycloak."""
+    path = os.path.join(tempfile.mkdtemp(prefix="auth-bench-"), "bench.db")
+    engine = create_engine(f"sqlite:///{path}")
+    SQLModel.metadata.create_all(engine)
+    fake = FakeKeycloak()
+
+    with Session(engine) as session:
+        for i in range(users):
+            email = f"bench{i}@corp.fr"
+            kc_id = fake.add_user(email, "Bench", str(i), roles=["employee"])
+            session.add(User(first_name="Bench", last_name=str(i), email=email,
+                             keycloak_id=kc_id, realm_roles=["employee"]))
+        session.commit()
+
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+
+    async def session_override():
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            yield session
+
+    app.dependency_overrides[get_async_session] = session_override
+    app.dependency_overrides[get_read_session] = session_override
+    auth.jwks_manager = auth.JWKSManager(fetch=fake.jwks)
+    return fake, list(fake.users)
+
+
+async def run(requests: int, concurrency: int, users: int) -> List[dict]:
+    fake, user_ids = setup(users)
+    results = []
+
+    transport = httpx.ASGITransport(app=app)  # no lifespan: scheduler / Postgres stay off
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        latencies, elapsed, errors = await drive(client, "/", lambda i: {}, requests, concurrency)
+        results.append(summarize("baseline", latencies, elapsed, errors))
+
+        # Minting is done up front so it is not measured
+        fresh = [fake.mint_token(user_ids[i % users]) for i in range(requests)]
+        auth.token_cache = auth.TokenCache(maxsize=0)
+        latencies, elapsed, errors = await drive(
+            client, "/users/me", lambda i: {"Authorization": f"Bearer {fresh[i]}"}, requests, concurrency
+        )
+        results.append(summarize("verify", latencies, elapsed, errors))
+
+        steady = [fake.mint_token(user_id) for user_id in user_ids]
+        auth.token_cache = auth.TokenCache()
+        latencies, elapsed, errors = await drive(
+            client, "/users/me", lambda i: {"Authorization": f"Bearer {steady[i % users]}"}, requests, concurrency
+        )
+        results.append(summarize("cached", latencies, elapsed, errors))
+        results[-1]["cache"] = auth.token_cache.stats()
+
+    app.dependency_overrides.clear()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the authentication path offline.")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--users", type=int, default=50)
+    args = parser.parse_args()
+
+    for result in asyncio.run(run(args.requests, args.concurrency, args.users)):
+        print(result)
+
+
+if __name__ == "__main__":
+    main()
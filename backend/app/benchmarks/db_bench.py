@@ -0,0 +1,157 @@
+"""
+Sync vs async database path, side by side.
+
+Each simulated request runs the auth user lookup and one page of the
+user's clocks (the /users/{id}/clocks/ query) under three strategies:
+
+    blocking    sync Session called from an async route (the old routes:
+                every query stalls the event loop)
+    threadpool  sync Session in FastAPI's threadpool (the sync fallback)
+    async       AsyncSession on the async engine (the current routes)
+
+Reports p50/p95/p99 latency, RPS and the worst event loop lag measured
+by a ticker running next to the workload ("blocking" latencies look low
+because requests run one at a time; the loop lag is what every other
+request on the worker waits meanwhile). Defaults to a temporary SQLite
+file; pass --sync-url / --async-url to compare against PostgreSQL
+(postgresql:// and postgresql+asyncpg:// DSNs of the same database).
+
+    python -m app.benchmarks.db_bench [--requests 2000] [--concurrency 32] [--users 200]
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import selectinload
+from sqlmodel import Session, SQLModel, create_engine, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.benchmarks.auth_bench import summarize
+from app.models import Clock, User
+from app.pagination import paginate_clocks
+
+PAGE_SIZE = 50
+
+
+def seed(engine, users: int, clocks_per_user: int):
+    SQLModel.metadata.drop_all(engine)
+    SQLModel.metadata.create_all(engine)
+    start = datetime(2026, 1, 5, 8, 0, tzinfo=timezone.utc)
+    with Session(engine) as session:
+        session.add_all([
+            User(first_name="Bench", last_name=str(i), email=f"bench{i}@corp.fr",
+                 keycloak_id=f"kc-bench-{i}", realm_roles=["employee"])
+            for i in range(users)
+        ])
+        session.commit()
+        for user_id in range(1, users + 1):
+            session.add_all([
+                Clock(user_id=user_id, clock_in=start + timedelta(days=d), clock_out=start + timedelta(days=d, hours=8))
+                for d in range(clocks_per_user)
+            ])
+        session.commit()
+
+
+def lookup_statement(i: int, users: int):
+    return (
+        select(User)
+        .where(User.keycloak_id == f"kc-bench-{i % users}")
+        .options(selectinload(User.team), selectinload(User.managed_team))
+    )
+
+
+def sync_request(engine, i: int, users: int):
+    with Session(engine) as session:
+        user = session.exec(lookup_statement(i, users)).one()
+        return paginate_clocks(session, limit=PAGE_SIZE, user_id=user.id)
+
+
+async def async_request(async_engine, i: int, users: int):
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        user = (await session.exec(lookup_statement(i, users))).one()
+        return await session.run_sync(paginate_clocks, limit=PAGE_SIZE, user_id=user.id)
+
+
+async def drive(handler, total: int, concurrency: int):
+    latencies, errors, lag = [], 0, 0.0
+    counter = iter(range(total))
+    done = asyncio.Event()
+
+    async def ticker():
+        nonlocal lag
+        while not done.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(0.001)
+            lag = max(lag, time.perf_counter() - started - 0.001)
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            started = time.perf_counter()
+            try:
+                await handler(i)
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    tick = asyncio.create_task(ticker())
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await tick
+    return latencies, elapsed, errors, lag
+
+
+async def run(sync_url: str, async_url: str, requests: int, concurrency: int,
+              users: int, clocks_per_user: int) -> List[dict]:
+    engine = create_engine(sync_url, pool_size=concurrency, max_overflow=0)
+    async_engine = create_async_engine(async_url, pool_size=concurrency, max_overflow=0)
+    seed(engine, users, clocks_per_user)
+
+    async def blocking(i):
+        sync_request(engine, i, users)
+
+    async def threadpool(i):
+        await run_in_threadpool(sync_request, engine, i, users)
+
+    async def native(i):
+        await async_request(async_engine, i, users)
+
+    results = []
+    for name, handler in (("blocking", blocking), ("threadpool", threadpool), ("async", native)):
+        await handler(0)  # warm the pool
+        latencies, elapsed, errors, lag = await drive(handler, requests, concurrency)
+        result = summarize(name, latencies, elapsed, errors)
+        result["max_loop_lag_ms"] = round(lag * 1000, 3)
+        results.append(result)
+
+    await async_engine.dispose()
+    engine.dispose()
+    return results
+
+
+def main():
+    default_file = os.path.join(tempfile.mkdtemp(prefix="db-bench-"), "bench.db")
+    parser = argparse.ArgumentParser(description="Benchmark the sync and async database paths.")
+    parser.add_argument("--sync-url", default=f"sqlite:///{default_file}")
+    parser.add_argument("--async-url", default=f"sqlite+aiosqlite:///{default_file}")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--clocks-per-user", type=int, default=60)
+    args = parser.parse_args()
+
+    for result in asyncio.run(run(args.sync_url, args.async_url, args.requests, args.concurrency,
+                                  args.users, args.clocks_per_user)):
+        print(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""
+Local stand-in for the parts of Keycloak this backend talks to.
+
+- JWKS endpoint and RS256 token minting with a locally generated key
+- password grant (admin-cli on master, user logins on the app realm)
+- admin API: users (list/create/get/delete), realm roles, role members,
+  role mappings and reset-password
+
+Tokens carry the same issuer / audience as app.auth expects, so they
+pass get_current_user unchanged. Run it standalone and point
+KEYCLOAK_INTERNAL_URL at it:
+    python -m app.benchmarks.fake_keycloak --port 8081
+or use it in-process (FakeKeycloak().app with httpx.ASGITransport).
+"""
+import argparse
+import time
+import uuid
+from collections import defaultdict
+from typing import Dict, Iterable, Optional
+from urllib.parse import urlparse
+
+import rsa
+from fastapi import APIRouter, FastAPI, HTTPException, Request, Response
+from jose import JWTError, jwk, jwt
+
+from app.auth import KEYCLOAK_AUDIENCE, KEYCLOAK_ISSUER, KEYCLOAK_REALM
+from app.keycloak_admin import KEYCLOAK_INTERNAL_URL
+
+DEFAULT_ROLES = ("employee", "manager", "organization", "offline_access")
+
+
+class FakeKeycloak:
+    def __init__(self, realm: str = KEYCLOAK_REALM, issuer: str = KEYCLOAK_ISSUER,
+                 audience: str = KEYCLOAK_AUDIENCE, key_bits: int = 2048,
+                 admin_user: str = "admin", admin_password: str = "admin",
+                 base_path: str = urlparse(KEYCLOAK_INTERNAL_URL).path.rstrip("/")):
+        self.realm = realm
+        self.base_path = base_path  # e.g. "/auth", as in KEYCLOAK_INTERNAL_URL
+        self.issuer = issuer
+        self.audience = audience
+        self.admin_credentials = (admin_user, admin_password)
+
+        public, private = rsa.newkeys(key_bits)
+        self.kid = uuid.uuid4().hex
+        self.private_pem = private.save_pkcs1().decode()
+        self.public_jwk = {
+            **jwk.construct(public.save_pkcs1().decode(), "RS256").to_dict(),
+            "kid": self.kid,
+            "use": "sig",
+            "alg": "RS256",
+        }
+
+        self.users: Dict[str, dict] = {}
+        self.passwords: Dict[str, str] = {}
+        self.roles = {name: {"id": uuid.uuid4().hex, "name": name} for name in DEFAULT_ROLES}
+        self.role_mappings = defaultdict(set)
+        self.app = self._build_app()
+
+    # ==========================================
+    # TOKENS / DIRECT SETUP
+    # ==========================================
+    def jwks(self) -> dict:
+        return {"keys": [self.public_jwk]}
+
+    def mint_token(self, sub: str, email: Optional[str] = None, roles: Iterable[str] = (),
+                   ttl: int = 300, **claims) -> str:
+        user = self.users.get(sub, {})
+        now = int(time.time())
+        payload = {
+            "sub": sub,
+            "iss": self.issuer,
+            "aud": self.audience,
+            "iat": now,
+            "exp": now + ttl,
+            "jti": uuid.uuid4().hex,
+            "email": email or user.get("email"),
+            "given_name": user.get("firstName", ""),
+            "family_name": user.get("lastName", ""),
+            "realm_access": {"roles": list(roles) or sorted(self.role_mappings.get(sub, ()))},
+            **claims,
+        }
+        return jwt.encode(payload, self.private_pem, algorithm="RS256", headers={"kid": self.kid})
+
+    def add_user(self, email: str, first_name: str = "", last_name: str = "",
+                 password: str = "password", roles: Iterable[str] = ()) -> str:
+        user_id = str(uuid.uuid4())
+        self.users[user_id] = {
+            "id": user_id,
+            "username": email.split("@")[0],
+            "email": email,
+            "firstName": first_name,
+            "lastName": last_name,
+            "enabled": True,
+        }
+        self.passwords[user_id] = password
+        self.role_mappings[user_id].update(roles)
+        return user_id
+
+    def _check_admin(self, request: Request):
+        auth = request.headers.get("authorization", "")
+        if not auth.startswith("Bearer "):
+            raise HTTPException(status_code=401)
+        try:
+            jwt.decode(auth[7:], self.public_jwk, algorithms=["RS256"], options={"verify_aud": False})
+        except JWTError:
+            raise HTTPException(status_code=401)
+
+    # ==========================================
+    # HTTP API
+    # ==========================================
+    def _build_app(self) -> FastAPI:
+        app = FastAPI(title="Fake Keycloak")
+        router = APIRouter(prefix=self.base_path)
+        admin = f"/admin/realms/{self.realm}"
+
+        @router.get(f"/realms/{self.realm}/protocol/openid-connect/certs")
+        def certs():
+            return self.jwks()
+
+        @router.post("/realms/{realm}/protocol/openid-connect/token")
+        async def token(realm: str, request: Request):
+            form = await request.form()
+            username, password = form.get("username"), form.get("password")
+            if realm == "master":
+                if (username, password) != self.admin_credentials:
+                    raise HTTPException(status_code=401, detail="invalid_grant")
+                return {"access_token": self.mint_token("admin", roles=["admin"]), "expires_in": 60}
+            user = next(
+                (u for u in self.users.values() if username in (u["username"], u["email"])), None
+            )
+            if realm != self.realm or user is None or self.passwords.get(user["id"]) != password:
+                raise HTTPException(status_code=401, detail="invalid_grant")
+            return {"access_token": self.mint_token(user["id"]), "expires_in": 300}
+
+        @router.get(f"{admin}/users")
+        def list_users(request: Request, first: int = 0, max: int = 100):
+            self._check_admin(request)
+            return list(self.users.values())[first:first + max]
+
+        @router.post(f"{admin}/users", status_code=201)
+        async def create_user(request: Request, response: Response):
+            self._check_admin(request)
+            body = await request.json()
+            if any(u["email"] == body.get("email") or u["username"] == body.get("username")
+                   for u in self.users.values()):
+                raise HTTPException(status_code=409, detail="User exists with same username or email")
+            user_id = self.add_user(
+                body["email"], body.get("firstName", ""), body.get("lastName", ""),
+                (body.get("credentials") or [{}])[0].get("value", ""),
+            )
+            self.users[user_id]["username"] = body.get("username", self.users[user_id]["username"])
+            if body.get("attributes"):
+                self.users[user_id]["attributes"] = body["attributes"]
+            response.headers["Location"] = f"{request.url}/{user_id}"
+
+        @router.get(f"{admin}/users/{{user_id}}")
+        def get_user(user_id: str, request: Request):
+            self._check_admin(request)
+            if user_id not in self.users:
+                raise HTTPException(status_code=404)
+            return self.users[user_id]
+
+        @router.delete(f"{admin}/users/{{user_id}}", status_code=204)
+        def delete_user(user_id: str, request: Request):
+            self._check_admin(request)
+            if self.users.pop(user_id, None) is None:
+                raise HTTPException(status_code=404)
+            self.role_mappings.pop(user_id, None)
+
+        @router.put(f"{admin}/users/{{user_id}}/reset-password", status_code=204)
+        async def reset_password(user_id: str, request: Request):
+            self._check_admin(request)
+            if user_id not in self.users:
+                raise HTTPException(status_code=404)
+            self.passwords[user_id] = (await request.json())["value"]
+
+        @router.post(f"{admin}/users/{{user_id}}/role-mappings/realm", status_code=204)
+        async def add_role_mappings(user_id: str, request: Request):
+            self._check_admin(request)
+            if user_id not in self.users:
+                raise HTTPException(status_code=404)
+            self.role_mappings[user_id].update(role["name"] for role in await request.json())
+
+        @router.get(f"{admin}/roles")
+        def list_roles(request: Request):
+            self._check_admin(request)
+            return list(self.roles.values())
+
+        @router.get(f"{admin}/roles/{{role}}/users")
+        def role_members(role: str, request: Request, first: int = 0, max: int = 100):
+            self._check_admin(request)
+            if role not in self.roles:
+                raise HTTPException(status_code=404)
+            members = [u for uid, u in self.users.items() if role in self.role_mappings.get(uid, ())]
+            return members[first:first + max]
+
+        app.include_router(router)
+        return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Run a local fake Keycloak.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    args = parser.parse_args()
+
+    fake = FakeKeycloak()
+    print(f"Fake Keycloak for realm '{fake.realm}' (issuer {fake.issuer}) on http://{args.host}:{args.port}")
+    uvicorn.run(fake.app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Response encoding: FastAPI's default vs the app's FastJSONResponse.
+
+Renders the payloads the list endpoints hand to their response class,
+built from synthetic rows (no database):
+
+    /users/               user_public_dicts() for --users users
+    /clocks/              a full page (MAX_PAGE_SIZE) of clock_public_dicts()
+    /teams/               list[TeamPublic] dumped by the response_model
+
+with two encoders:
+
+    stdlib    jsonable_encoder + starlette JSONResponse (json.dumps),
+              FastAPI's default
+    orjson    FastJSONResponse (app.responses), the app default
+
+Reports p50/p95/p99 per render, MB/s and the body size.
+
+    python -m app.benchmarks.json_bench [--users 20000] [--teams 500] [--iterations 50]
+"""
+import argparse
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from app.benchmarks.auth_bench import summarize
+from app.models import TeamPublic
+from app.pagination import MAX_PAGE_SIZE
+from app.projections import clock_public_dicts, user_public_dicts
+from app.responses import FastJSONResponse
+
+START = datetime(2026, 1, 5, 8, 0, tzinfo=timezone.utc)
+
+
+def user_rows(count: int, team_size: int = 20):
+    for i in range(1, count + 1):
+        team_id = (i - 1) // team_size + 1
+        manages = team_id if i % team_size == 1 else None
+        yield (i, f"bench{i}@corp.fr", "Bench", str(i), f"+336{i:08d}", START - timedelta(days=i % 365),
+               f"kc-bench-{i}", ["employee"], team_id, f"Team {team_id}", manages, f"Team {manages}" if manages else None)
+
+
+def clock_rows(count: int):
+    for i in range(1, count + 1):
+        clock_in = START + timedelta(minutes=i)
+        clock_out = clock_in + timedelta(hours=8) if i % 10 else None
+        yield (i, i % 500 + 1, clock_in, clock_out, "Bench", str(i), f"bench{i}@corp.fr", None, ["employee"])
+
+
+def teams_payload(count: int, members: int = 20) -> list:
+    def user(i):
+        return {"id": i, "first_name": "Bench", "last_name": str(i), "email": f"bench{i}@corp.fr",
+                "phone_number": None, "realm_roles": ["employee"]}
+
+    teams = [
+        {"id": t, "name": f"Team {t}", "description": "Bench", "manager_id": t * members, "created_at": START,
+         "manager": user(t * members), "members": [user(t * members + m) for m in range(members)]}
+        for t in range(1, count + 1)
+    ]
+    adapter = TypeAdapter(list[TeamPublic])
+    return adapter.dump_python(adapter.validate_python(teams), mode="json")
+
+
+def stdlib(content) -> bytes:
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def fast(content) -> bytes:
+    return FastJSONResponse(content).body
+
+
+def run(users: int, teams: int, iterations: int) -> List[dict]:
+    payloads = {
+        "/users/": user_public_dicts(user_rows(users)),
+        "/clocks/": {"items": clock_public_dicts(clock_rows(MAX_PAGE_SIZE)), "next_cursor": None},
+        "/teams/": teams_payload(teams),
+    }
+
+    results = []
+    for endpoint, content in payloads.items():
+        for name, encode in (("stdlib", stdlib), ("orjson", fast)):
+            latencies = []
+            started = time.perf_counter()
+            for _ in range(iterations):
+                call_started = time.perf_counter()
+                body = encode(content)
+                latencies.append(time.perf_counter() - call_started)
+            elapsed = time.perf_counter() - started
+
+            result = summarize(f"{endpoint} {name}", latencies, elapsed, 0)
+            result["bytes"] = len(body)
+            result["mb_per_s"] = round(len(body) * iterations / elapsed / 1e6, 1)
+            results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark JSON response encoding of the list endpoints.")
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--teams", type=int, default=500)
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    for result in run(args.users, args.teams, args.iterations):
+        print(result)
+
+
+if __name__ == "__main__":
+    main()
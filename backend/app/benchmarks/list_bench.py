@@ -0,0 +1,169 @@
+"""
+ORM + validation vs column projection for the list endpoints.
+
+Builds the response body of GET /users/ (every user) and of a full page
+of GET /clocks/ and GET /users/{id}/clocks/ both ways, query included:
+
+    orm         ORM objects with selectinload'ed relationships, turned
+                into UserPublic / ClockPage, then validated and dumped
+                against the response_model as FastAPI does, then
+                rendered (the previous routes)
+    projection  column tuples -> dicts -> rendered (the current routes,
+                app.projections)
+
+Both render with the app's FastJSONResponse (see json_bench for the
+encoder itself).
+
+Reports p50/p95/p99 per call, rows per second and the body size (both
+paths must produce identical bytes). Defaults to a temporary SQLite
+file; pass --url for PostgreSQL (a postgresql:// DSN of a scratch
+database: the tables are dropped and re-seeded).
+
+    python -m app.benchmarks.list_bench [--users 20000] [--clocks-per-user 5] [--iterations 20]
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+from pydantic import TypeAdapter
+from sqlalchemy.orm import selectinload
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from app.benchmarks.auth_bench import summarize
+from app.models import Clock, ClockPage, Team, TeamBasic, User, UserPublic
+from app.pagination import MAX_PAGE_SIZE, paginate_clock_rows, paginate_clocks
+from app.projections import user_public_dicts, users_statement
+from app.responses import FastJSONResponse
+
+USERS_ADAPTER = TypeAdapter(list[UserPublic])
+PAGE_ADAPTER = TypeAdapter(ClockPage)
+
+
+def seed(engine, users: int, clocks_per_user: int, team_size: int = 20):
+    SQLModel.metadata.drop_all(engine)
+    SQLModel.metadata.create_all(engine)
+    start = datetime(2026, 1, 5, 8, 0, tzinfo=timezone.utc)
+    with Session(engine) as session:
+        session.add_all([
+            User(first_name="Bench", last_name=str(i), email=f"bench{i}@corp.fr",
+                 keycloak_id=f"kc-bench-{i}", realm_roles=["employee"])
+            for i in range(users)
+        ])
+        session.commit()
+        session.add_all([
+            Team(name=f"Team {t}", description="Bench", manager_id=t * team_size + 1)
+            for t in range(users // team_size)
+        ])
+        session.commit()
+        for team_id in range(1, users // team_size + 1):
+            session.execute(
+                User.__table__.update()
+                .where(User.id.between((team_id - 1) * team_size + 1, team_id * team_size))
+                .values(team_id=team_id)
+            )
+        session.execute(Clock.__table__.insert(), [
+            {"user_id": user_id, "clock_in": start + timedelta(days=d), "clock_out": start + timedelta(days=d, hours=8)}
+            for user_id in range(1, users + 1)
+            for d in range(clocks_per_user)
+        ])
+        session.commit()
+
+
+def fastapi_body(adapter: TypeAdapter, content) -> bytes:
+    """What FastAPI does with a response_model: validate, dump to JSON types, render."""
+    value = adapter.validate_python(content, from_attributes=True)
+    return FastJSONResponse(adapter.dump_python(value, mode="json")).body
+
+
+def users_orm(session: Session) -> bytes:
+    db_users = session.exec(
+        select(User).options(selectinload(User.team), selectinload(User.managed_team)).order_by(User.id)
+    ).all()
+    users = [
+        UserPublic(
+            id=u.id,
+            email=u.email,
+            first_name=u.first_name,
+            last_name=u.last_name,
+            phone_number=u.phone_number,
+            created_at=u.created_at,
+            keycloak_id=u.keycloak_id,
+            realm_roles=u.realm_roles,
+            team_id=u.team_id,
+            team=TeamBasic(id=u.team.id, name=u.team.name) if u.team else None,
+            managed_team=TeamBasic(id=u.managed_team.id, name=u.managed_team.name) if u.managed_team else None,
+        )
+        for u in db_users
+    ]
+    return fastapi_body(USERS_ADAPTER, users)
+
+
+def users_projection(session: Session) -> bytes:
+    return FastJSONResponse(user_public_dicts(session.exec(users_statement()).all())).body
+
+
+def measure(engine, handler, iterations: int):
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        call_started = time.perf_counter()
+        # Fresh session per call, like a request: no identity map carried over
+        with Session(engine) as session:
+            body = handler(session)
+        latencies.append(time.perf_counter() - call_started)
+    return latencies, time.perf_counter() - started, body
+
+
+def run(url: str, users: int, clocks_per_user: int, iterations: int) -> List[dict]:
+    engine = create_engine(url)
+    seed(engine, users, clocks_per_user)
+
+    scenarios = {
+        "/users/": (users, users_orm, users_projection),
+        "/clocks/": (
+            MAX_PAGE_SIZE,
+            lambda s: fastapi_body(PAGE_ADAPTER, paginate_clocks(s, limit=MAX_PAGE_SIZE)),
+            lambda s: FastJSONResponse(paginate_clock_rows(s, limit=MAX_PAGE_SIZE)).body,
+        ),
+        "/users/{id}/clocks/": (
+            min(clocks_per_user, MAX_PAGE_SIZE),
+            lambda s: fastapi_body(PAGE_ADAPTER, paginate_clocks(s, limit=MAX_PAGE_SIZE, user_id=1)),
+            lambda s: FastJSONResponse(paginate_clock_rows(s, limit=MAX_PAGE_SIZE, user_id=1)).body,
+        ),
+    }
+
+    results = []
+    for endpoint, (rows, orm, projection) in scenarios.items():
+        bodies = {}
+        for name, handler in (("orm", orm), ("projection", projection)):
+            latencies, elapsed, bodies[name] = measure(engine, handler, iterations)
+            result = summarize(f"{endpoint} {name}", latencies, elapsed, 0)
+            result["rows"] = rows
+            result["rows_per_s"] = round(rows * iterations / elapsed, 1)
+            result["bytes"] = len(bodies[name])
+            results.append(result)
+        if bodies["orm"] != bodies["projection"]:
+            raise SystemExit(f"{endpoint}: the projection body differs from the ORM body")
+
+    engine.dispose()
+    return results
+
+
+def main():
+    default_file = os.path.join(tempfile.mkdtemp(prefix="list-bench-"), "bench.db")
+    parser = argparse.ArgumentParser(description="Benchmark ORM vs projection serialization of the list endpoints.")
+    parser.add_argument("--url", default=f"sqlite:///{default_file}")
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--clocks-per-user", type=int, default=5)
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    for result in run(args.url, args.users, args.clocks_per_user, args.iterations):
+        print(result)
+
+
+if __name__ == "__main__":
+    main()
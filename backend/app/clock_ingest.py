@@ -0,0 +1,230 @@
+"""
+Batch ingestion of buffered badge taps.
+
+Terminals that were offline replay their taps in one request. Events are
+replayed per user in timestamp order against the user's open shift, then
+written in a single transaction: one executemany UPDATE for shifts that
+were already open, one multi-row INSERT (insertmanyvalues) for new
+shifts, and one bulk rollup upsert.
+
+A terminal that did not get the response retries the whole batch: taps
+whose timestamp is already stored as a clock_in / clock_out of the same
+user are reported as "duplicate" instead of being replayed again.
+"""
+from collections import defaultdict
+from typing import Iterable, List
+
+from sqlalchemy import and_, exists, func, insert, or_, text, tuple_, update
+from sqlalchemy.engine import Connection
+from sqlmodel import Session, select
+
+from app.kpi_rollup import apply_deltas_bulk, as_utc, clock_in_deltas, clock_out_deltas
+from app.models import Clock, ClockEvent, ClockEventResult, ClockBatchResult, User
+from app.presence import presence
+
+MAX_BATCH_EVENTS = 5000
+
+# First key of pg_advisory_xact_lock(int, int), the second is the user id
+CLOCK_LOCK_NAMESPACE = 0x636C6B  # "clk"
+
+
+class _Shift:
+    """A shift being replayed: either already in the database or new."""
+
+    def __init__(self, user_id, clock_in, clock_id=None):
+        self.user_id = user_id
+        self.clock_in = clock_in
+        self.clock_out = None
+        self.clock_id = clock_id
+        self.event_indexes = []
+
+
+def lock_user_clocks(session: Session, user_ids: Iterable[int]):
+    """
+    Serialize shift changes per user until the transaction ends
+    (PostgreSQL). Once clocks is partitioned, uq_clocks_open_per_user
+    only exists per monthly partition and no longer stops a second open
+    shift in another month (a replayed tap from last month racing a live
+    one), so every path that opens a shift takes this lock before reading
+    the user's open shift. Ids are locked in ascending order so two
+    batches cannot deadlock.
+    """
+    if session.get_bind().dialect.name != "postgresql":
+        return  # SQLite serializes writers anyway
+    session.execute(
+        text(
+            "SELECT pg_advisory_xact_lock(:namespace, user_id) "
+            "FROM (SELECT unnest(CAST(:user_ids AS integer[])) AS user_id ORDER BY 1) AS locked"
+        ),
+        {"namespace": CLOCK_LOCK_NAMESPACE, "user_ids": sorted(set(user_ids))},
+    )
+
+
+def ingest_clock_events(session: Session, events: List[ClockEvent]) -> ClockBatchResult:
+    results = {}
+    user_ids = {e.user_id for e in events}
+    lock_user_clocks(session, user_ids)
+
+    team_by_user = dict(
+        session.exec(select(User.id, User.team_id).where(User.id.in_(user_ids))).all()
+    )
+    open_shifts = {
+        user_id: _Shift(user_id, as_utc(clock_in), clock_id)
+        for clock_id, user_id, clock_in in session.exec(
+            select(Clock.id, Clock.user_id, Clock.clock_in).where(
+                Clock.user_id.in_(user_ids), Clock.clock_out.is_(None)
+            )
+        ).all()
+    }
+
+    # Shift bounds already stored at the batch's timestamps (retried batch)
+    timestamps = {as_utc(e.timestamp) for e in events}
+    stored = {}
+    for clock_id, user_id, clock_in, clock_out in session.exec(
+        select(Clock.id, Clock.user_id, Clock.clock_in, Clock.clock_out).where(
+            Clock.user_id.in_(user_ids),
+            or_(Clock.clock_in.in_(timestamps), Clock.clock_out.in_(timestamps)),
+        )
+    ).all():
+        stored[(user_id, "in", as_utc(clock_in))] = clock_id
+        if clock_out is not None:
+            stored[(user_id, "out", as_utc(clock_out))] = clock_id
+
+    # --- Replay every user's taps in order ---
+    by_user = defaultdict(list)
+    for index, event in enumerate(events):
+        by_user[event.user_id].append((as_utc(event.timestamp), index, event))
+
+    closed_existing: List[_Shift] = []
+    new_shifts: List[_Shift] = []
+    touched: List[_Shift] = []
+
+    def note(shift, index, status):
+        if not shift.event_indexes:
+            touched.append(shift)
+        shift.event_indexes.append((index, status))
+
+    def reject(index, event, detail):
+        results[index] = ClockEventResult(index=index, user_id=event.user_id, status="rejected", detail=detail)
+
+    for user_id, user_events in by_user.items():
+        if user_id not in team_by_user:
+            for _, index, event in user_events:
+                reject(index, event, "User not found")
+            continue
+
+        current = open_shifts.get(user_id)
+        seen = set()
+        for timestamp, index, event in sorted(user_events, key=lambda e: (e[0], e[1])):
+            if (timestamp, event.direction) in seen:
+                results[index] = ClockEventResult(index=index, user_id=user_id, status="duplicate")
+                continue
+            seen.add((timestamp, event.direction))
+
+            stored_id = None
+            if event.direction != "out":
+                stored_id = stored.get((user_id, "in", timestamp))
+            if stored_id is None and event.direction != "in":
+                stored_id = stored.get((user_id, "out", timestamp))
+            if stored_id is not None:
+                results[index] = ClockEventResult(
+                    index=index, user_id=user_id, status="duplicate", clock_id=stored_id
+                )
+                continue
+
+            direction = event.direction or ("out" if current else "in")
+
+            if direction == "in":
+                if current is not None:
+                    if current.clock_in == timestamp:
+                        note(current, index, "duplicate")
+                    else:
+                        reject(index, event, "Already clocked in")
+                    continue
+                current = _Shift(user_id, timestamp)
+                note(current, index, "opened")
+                new_shifts.append(current)
+                continue
+
+            if current is None:
+                reject(index, event, "No open shift to close")
+                continue
+            if timestamp < current.clock_in:
+                reject(index, event, "Clock out before clock in")
+                continue
+            current.clock_out = timestamp
+            note(current, index, "closed")
+            if current.clock_id is not None:
+                closed_existing.append(current)
+            current = None
+
+    # --- Write: closes first so reopened users don't hit uq_clocks_open_per_user ---
+    if closed_existing:
+        session.exec(
+            update(Clock),
+            params=[{"id": s.clock_id, "clock_out": s.clock_out} for s in closed_existing],
+        )
+    if new_shifts:
+        inserted = session.exec(
+            insert(Clock).returning(Clock.id, sort_by_parameter_order=True),
+            params=[
+                {"user_id": s.user_id, "clock_in": s.clock_in, "clock_out": s.clock_out}
+                for s in new_shifts
+            ],
+        ).scalars().all()
+        for shift, clock_id in zip(new_shifts, inserted):
+            shift.clock_id = clock_id
+
+    contributions = []
+    for shift in new_shifts:
+        team_id, day = team_by_user[shift.user_id], shift.clock_in.date()
+        contributions.append((shift.user_id, team_id, day, clock_in_deltas(shift.clock_in)))
+    for shift in new_shifts + closed_existing:
+        if shift.clock_out is not None:
+            team_id, day = team_by_user[shift.user_id], shift.clock_in.date()
+            contributions.append((shift.user_id, team_id, day, clock_out_deltas(shift.clock_in, shift.clock_out)))
+    apply_deltas_bulk(session, contributions)
+
+    session.commit()
+
+    for shift in closed_existing:
+        presence.clock_out(shift.user_id, shift.clock_id)
+    for shift in new_shifts:
+        if shift.clock_out is None:
+            presence.clock_in(shift.user_id, shift.clock_id, shift.clock_in, team_by_user[shift.user_id])
+
+    for shift in touched:
+        for index, status in shift.event_indexes:
+            results[index] = ClockEventResult(
+                index=index, user_id=shift.user_id, status=status, clock_id=shift.clock_id
+            )
+
+    ordered = [results[i] for i in range(len(events))]
+    return ClockBatchResult(
+        opened=sum(r.status == "opened" for r in ordered),
+        closed=sum(r.status == "closed" for r in ordered),
+        rejected=sum(r.status == "rejected" for r in ordered),
+        results=ordered,
+    )
+
+
+def close_duplicate_open_shifts(conn: Connection) -> int:
+    """
+    Data repair run before uq_clocks_open_per_user is built (the index
+    cannot be created over them): concurrent taps from before the guarded
+    toggle left some users with several open shifts. Keeps each user's
+    newest open shift and closes the others at the clock_in of the
+    user's next shift. Rollups are not adjusted, rebuild them with
+    python -m app.kpi_rollup. Returns the number of shifts closed.
+    """
+    clocks = Clock.__table__
+    later = clocks.alias("later")
+    after = and_(
+        later.c.user_id == clocks.c.user_id,
+        tuple_(later.c.clock_in, later.c.id) > tuple_(clocks.c.clock_in, clocks.c.id),
+    )
+    return conn.execute(
+        update(clocks)
+        .where(clocks.c.clock_out.is_(None), exists().where(after, later.c.clock_out.is_(None)))
+        .values(clock_out=select(func.min(later.c.clock_in)).where(after).scalar_subquery())
+    ).rowcount
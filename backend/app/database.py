@@ -1,7 +1,13 @@
 import os
 from sqlmodel import create_engine, SQLModel, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from dotenv import load_dotenv
 
+from app.db_instrumentation import TimedAsyncQueuePool, TimedQueuePool, instrument_engine
+
 load_dotenv()
 
 POSTGRES_USER = os.getenv("POSTGRES_USER")
@@ -10,10 +16,81 @@ POSTGRES_DB = os.getenv("POSTGRES_DB")
 POSTGRES_HOST = os.getenv("POSTGRES_HOST")
 POSTGRES_PORT = os.getenv("POSTGRES_PORT")
 
+# Streaming read replica (optional): read-only routes use it, see app.read_routing
+POSTGRES_REPLICA_HOST = os.getenv("POSTGRES_REPLICA_HOST")
+POSTGRES_REPLICA_PORT = os.getenv("POSTGRES_REPLICA_PORT", POSTGRES_PORT)
+
 SQL_DB_URL = (f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}")
+ASYNC_SQL_DB_URL = (f"postgresql+asyncpg://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}")
+ASYNC_REPLICA_DB_URL = (
+    f"postgresql+asyncpg://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_REPLICA_HOST}:{POSTGRES_REPLICA_PORT}/{POSTGRES_DB}"
+    if POSTGRES_REPLICA_HOST else None
+)
+
+# Connection pool, per engine (each worker process has its own)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# Server-side cap on a single statement (0 = no limit)
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))
+
+POOL_OPTIONS = {
+    "pool_size": DB_POOL_SIZE,
+    "max_overflow": DB_MAX_OVERFLOW,
+    "pool_timeout": DB_POOL_TIMEOUT,
+    "pool_pre_ping": DB_POOL_PRE_PING,
+    "pool_recycle": DB_POOL_RECYCLE,
+}
+
+# Sync engine (psycopg2): admin panel, CSV export, CLIs and maintenance jobs
+engine = create_engine(
+    SQL_DB_URL,
+    poolclass=TimedQueuePool,
+    connect_args={"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"},
+    **POOL_OPTIONS,
+)
+
+# Async engine (asyncpg): API routes, auth and scheduler jobs
+async_engine = create_async_engine(
+    ASYNC_SQL_DB_URL,
+    poolclass=TimedAsyncQueuePool,
+    connect_args={"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}},
+    **POOL_OPTIONS,
+)
 
-engine = create_engine(SQL_DB_URL, echo=True)
+# Async engine on the replica, None when no replica is configured
+replica_engine = (
+    create_async_engine(
+        ASYNC_REPLICA_DB_URL,
+        poolclass=TimedAsyncQueuePool,
+        connect_args={"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}},
+        **POOL_OPTIONS,
+    )
+    if ASYNC_REPLICA_DB_URL else None
+)
+
+# Query timing / slow-query log / pool stats in place of echo (see app.db_instrumentation)
+instrument_engine(engine, "sync")
+instrument_engine(async_engine.sync_engine, "async")
+if replica_engine is not None:
+    instrument_engine(replica_engine.sync_engine, "replica")
 
 def get_session():
     with Session(engine) as session:
-        yield session
\ No newline at end of file
+        yield session
+
+
+async def get_async_session():
+    # Objects stay loaded after commit: an expired attribute would need
+    # an implicit (blocking) refresh, which AsyncSession cannot do
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
+
+
+def dialect_insert(session):
+    """insert() supporting ON CONFLICT for the session's backend (PostgreSQL, or SQLite in tests)."""
+    if session.get_bind().dialect.name == "postgresql":
+        return pg_insert
+    return sqlite_insert
@@ -0,0 +1,204 @@
+"""
+Database instrumentation (replaces engine echo).
+
+- Per request: number of statements and total time spent in the
+  database, collected through a context variable set by
+  DBTimingMiddleware and returned in the Server-Timing header.
+- Slow statements (>= DB_SLOW_QUERY_MS) are logged with their SQL and
+  parameter names only; values are never printed.
+- Pool: checkouts, checkout wait time and timeouts per engine, next to
+  the live size / checked-out / overflow counters (db_metrics()).
+"""
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from starlette.datastructures import MutableHeaders
+
+load_dotenv()
+
+DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "200"))
+
+
+# ==========================================
+# PER-REQUEST STATS
+# ==========================================
+class RequestDBStats:
+    __slots__ = ("queries", "seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+    def server_timing(self) -> str:
+        return f'db;dur={self.seconds * 1000:.1f};desc="{self.queries} queries"'
+
+
+_request_stats: ContextVar[Optional[RequestDBStats]] = ContextVar("request_db_stats", default=None)
+
+
+def track_request() -> RequestDBStats:
+    """Start collecting stats for the current request (task and the threads / greenlets it spawns)."""
+    stats = RequestDBStats()
+    _request_stats.set(stats)
+    return stats
+
+
+class DBTimingMiddleware:
+    """
+    ASGI middleware adding a Server-Timing header with the request's
+    query count and DB time. Streamed bodies (exports) query after the
+    headers are sent and are not counted.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = track_request()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append("Server-Timing", stats.server_timing())
+            await send(message)
+
+        await self.app(scope, receive, send_with_timing)
+
+
+# ==========================================
+# POOL STATS
+# ==========================================
+class PoolStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.slow_queries = 0
+
+    def record_wait(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_seconds += seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+
+    def as_dict(self) -> dict:
+        attempts = self.checkouts + self.timeouts
+        return {
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "avg_wait_ms": round(self.wait_seconds / attempts * 1000, 3) if attempts else 0.0,
+            "max_wait_ms": round(self.max_wait_seconds * 1000, 3),
+            "slow_queries": self.slow_queries,
+        }
+
+
+_pool_stats: Dict[str, PoolStats] = {}
+_engines: Dict[str, Engine] = {}
+
+
+class _TimedCheckout:
+    """Pool mixin timing how long a checkout waits for a free connection."""
+
+    stats_name: Optional[str] = None
+
+    def _do_get(self):
+        started = time.perf_counter()
+        stats = _pool_stats.get(self.stats_name)
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            if stats is not None:
+                stats.record_wait(time.perf_counter() - started, timed_out=True)
+            raise
+        if stats is not None:
+            stats.record_wait(time.perf_counter() - started)
+        return connection
+
+    def recreate(self):
+        # engine.dispose() swaps in a new pool; keep reporting under the same name
+        pool = super().recreate()
+        pool.stats_name = self.stats_name
+        return pool
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+
+# ==========================================
+# ENGINE HOOKS
+# ==========================================
+def _redacted(parameters, executemany: bool) -> str:
+    if executemany:
+        return f"<{len(parameters)} rows redacted>"
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{key}: ?" for key in parameters) + "}"
+    return f"<{len(parameters or ())} redacted>"
+
+
+def instrument_engine(engine: Engine, name: str) -> Engine:
+    """Attach query timing, slow-query logging and pool stats to `engine` (the sync_engine of an AsyncEngine)."""
+    stats = _pool_stats.setdefault(name, PoolStats())
+    _engines[name] = engine
+    if isinstance(engine.pool, _TimedCheckout):
+        engine.pool.stats_name = name
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+
+        request = _request_stats.get()
+        if request is not None:
+            request.queries += 1
+            request.seconds += elapsed
+
+        if elapsed * 1000 >= DB_SLOW_QUERY_MS:
+            stats.slow_queries += 1
+            print(f"[DB] Slow query on {name} ({elapsed * 1000:.1f} ms): "
+                  f"{' '.join(statement.split())} params={_redacted(parameters, executemany)}")
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        connection = context.connection
+        if connection is not None and connection.info.get("query_started"):
+            connection.info["query_started"].pop()
+
+    return engine
+
+
+def db_metrics() -> dict:
+    """Pool counters of every instrumented engine."""
+    metrics = {}
+    for name, engine in _engines.items():
+        pool = engine.pool
+        metrics[name] = {
+            **_pool_stats[name].as_dict(),
+            "size": pool.size() if hasattr(pool, "size") else None,
+            "checked_out": pool.checkedout() if hasattr(pool, "checkedout") else None,
+            "overflow": pool.overflow() if hasattr(pool, "overflow") else None,
+        }
+    return metrics
@@ -0,0 +1,113 @@
+"""
+Streaming clock exports (CSV / NDJSON).
+Rows are read through a server-side cursor (yield_per) with user and
+team columns joined in SQL, and written out in small chunks, so memory
+stays flat whatever the export size.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Iterator, Optional
+
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, select
+
+from app.models import Clock, Team, User
+
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_COLUMNS = [
+    "clock_id",
+    "user_id",
+    "first_name",
+    "last_name",
+    "email",
+    "team_id",
+    "team_name",
+    "clock_in",
+    "clock_out",
+    "duration_hours",
+]
+
+
+def export_statement(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    team_id: Optional[int] = None,
+):
+    statement = (
+        select(
+            Clock.id,
+            Clock.user_id,
+            User.first_name,
+            User.last_name,
+            User.email,
+            User.team_id,
+            Team.name,
+            Clock.clock_in,
+            Clock.clock_out,
+        )
+        .join(User, User.id == Clock.user_id)
+        .outerjoin(Team, Team.id == User.team_id)
+        .order_by(Clock.clock_in, Clock.id)
+    )
+    if start is not None:
+        statement = statement.where(Clock.clock_in >= start)
+    if end is not None:
+        statement = statement.where(Clock.clock_in < end)
+    if team_id is not None:
+        statement = statement.where(User.team_id == team_id)
+    return statement
+
+
+def iter_export_rows(bind: Engine, statement) -> Iterator[dict]:
+    """
+    Yield one dict per clock. Opens its own session because the response
+    body is streamed after the request's session dependency has closed.
+    """
+    with Session(bind) as session:
+        result = session.exec(statement.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        for clock_id, user_id, first_name, last_name, email, team_id, team_name, clock_in, clock_out in result:
+            duration = None
+            if clock_out is not None:
+                duration = round((clock_out - clock_in).total_seconds() / 3600.0, 2)
+            yield {
+                "clock_id": clock_id,
+                "user_id": user_id,
+                "first_name": first_name,
+                "last_name": last_name,
+                "email": email,
+                "team_id": team_id,
+                "team_name": team_name,
+                "clock_in": clock_in.isoformat(),
+                "clock_out": clock_out.isoformat() if clock_out else None,
+                "duration_hours": duration,
+            }
+
+
+def stream_csv(rows: Iterator[dict]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+    writer.writeheader()
+
+    for index, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if index % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+
+    yield buffer.getvalue()
+
+
+def stream_ndjson(rows: Iterator[dict]) -> Iterator[str]:
+    chunk = []
+    for row in rows:
+        chunk.append(json.dumps(row))
+        if len(chunk) == EXPORT_BATCH_SIZE:
+            yield "\n".join(chunk) + "\n"
+            chunk = []
+
+    if chunk:
+        yield "\n".join(chunk) + "\n"
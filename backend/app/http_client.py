@@ -0,0 +1,167 @@
+"""
+Shared, pooled HTTP client for Keycloak traffic.
+
+One httpx.AsyncClient (keep-alive pool) serves the async route handlers;
+a sync httpx.Client with the same settings serves code that already runs
+in FastAPI's threadpool (token verification). Both apply the same
+timeouts, bounded retries with exponential backoff, and record latency
+per logical endpoint (see keycloak_http.metrics()).
+
+Retries: connection failures are always retried (nothing reached the
+server); timeouts and 502/503/504 responses only for idempotent methods.
+"""
+import asyncio
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3"))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "2"))
+HTTP_RETRY_BACKOFF = float(os.getenv("HTTP_RETRY_BACKOFF", "0.2"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+
+RETRY_STATUSES = {502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+
+class EndpointStats:
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.retries = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "retries": self.retries,
+            "avg_ms": round(self.total_seconds / self.count * 1000, 2) if self.count else 0.0,
+            "max_ms": round(self.max_seconds * 1000, 2),
+        }
+
+
+class HTTPClient:
+    def __init__(
+        self,
+        timeout: float = HTTP_TIMEOUT,
+        connect_timeout: float = HTTP_CONNECT_TIMEOUT,
+        max_retries: int = HTTP_MAX_RETRIES,
+        backoff: float = HTTP_RETRY_BACKOFF,
+        max_connections: int = HTTP_MAX_CONNECTIONS,
+        transport: Optional[httpx.BaseTransport] = None,
+        async_transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._client_kwargs = {
+            "timeout": httpx.Timeout(timeout, connect=connect_timeout),
+            "limits": httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        }
+        self._transport = transport
+        self._async_transport = async_transport
+        self._sync_client: Optional[httpx.Client] = None
+        self._async_client: Optional[httpx.AsyncClient] = None
+        self._stats: Dict[str, EndpointStats] = {}
+        self._lock = threading.Lock()
+
+    # --- clients (created lazily, reused for keep-alive) ---
+    @property
+    def sync_client(self) -> httpx.Client:
+        with self._lock:
+            if self._sync_client is None:
+                self._sync_client = httpx.Client(transport=self._transport, **self._client_kwargs)
+            return self._sync_client
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        if self._async_client is None or self._async_client.is_closed:
+            self._async_client = httpx.AsyncClient(transport=self._async_transport, **self._client_kwargs)
+        return self._async_client
+
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+        if self._sync_client is not None:
+            self._sync_client.close()
+            self._sync_client = None
+
+    # --- retry policy / metrics ---
+    def _retryable(self, method: str, attempt: int, error: Optional[Exception] = None,
+                   response: Optional[httpx.Response] = None) -> bool:
+        if attempt >= self.max_retries:
+            return False
+        if isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)):
+            return True
+        if method.upper() not in IDEMPOTENT_METHODS:
+            return False
+        if error is not None:
+            return isinstance(error, httpx.TransportError)
+        return response is not None and response.status_code in RETRY_STATUSES
+
+    def _delay(self, attempt: int) -> float:
+        return self.backoff * (2 ** attempt)
+
+    def _record(self, endpoint: str, elapsed: float, failed: bool, retries: int):
+        with self._lock:
+            stats = self._stats.setdefault(endpoint, EndpointStats())
+            stats.count += 1
+            stats.errors += failed
+            stats.retries += retries
+            stats.total_seconds += elapsed
+            stats.max_seconds = max(stats.max_seconds, elapsed)
+
+    def metrics(self) -> Dict[str, dict]:
+        with self._lock:
+            return {endpoint: stats.as_dict() for endpoint, stats in self._stats.items()}
+
+    # --- requests ---
+    async def request(self, method: str, url: str, *, endpoint: str, **kwargs) -> httpx.Response:
+        started = time.perf_counter()
+        attempt, response = 0, None
+        try:
+            while True:
+                try:
+                    response = await self.async_client.request(method, url, **kwargs)
+                except httpx.TransportError as e:
+                    if not self._retryable(method, attempt, error=e):
+                        raise
+                else:
+                    if not self._retryable(method, attempt, response=response):
+                        return response
+                await asyncio.sleep(self._delay(attempt))
+                attempt += 1
+        finally:
+            failed = response is None or response.status_code >= 500
+            self._record(endpoint, time.perf_counter() - started, failed, attempt)
+
+    def request_sync(self, method: str, url: str, *, endpoint: str, **kwargs) -> httpx.Response:
+        started = time.perf_counter()
+        attempt, response = 0, None
+        try:
+            while True:
+                try:
+                    response = self.sync_client.request(method, url, **kwargs)
+                except httpx.TransportError as e:
+                    if not self._retryable(method, attempt, error=e):
+                        raise
+                else:
+                    if not self._retryable(method, attempt, response=response):
+                        return response
+                time.sleep(self._delay(attempt))
+                attempt += 1
+        finally:
+            failed = response is None or response.status_code >= 500
+            self._record(endpoint, time.perf_counter() - started, failed, attempt)
+
+
+keycloak_http = HTTPClient()
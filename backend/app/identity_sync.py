@@ -0,0 +1,89 @@
+"""
+Write-behind sync of Keycloak identity data into the users table.
+
+get_current_user only reads users. When a token's realm roles differ
+from the stored ones the change is queued here, coalesced per
+keycloak_id (last token wins), and flushed in one executemany UPDATE by
+the scheduler, so authenticated reads never take a write lock on users.
+
+First-time users still need a row (and an id) before the request can
+continue; they are created with a single INSERT ... ON CONFLICT DO
+NOTHING, once per user.
+"""
+import threading
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import bindparam, update
+from sqlmodel import Session, select
+
+from app.database import engine, dialect_insert
+from app.models import User
+
+
+class IdentityWriteBehind:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending: Dict[str, List[str]] = {}
+
+    def queue_roles(self, keycloak_id: str, realm_roles: List[str]):
+        with self._lock:
+            self._pending[keycloak_id] = list(realm_roles)
+
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def flush(self, bind=None) -> int:
+        """Write every queued role change in one batch; returns the number of users updated."""
+        with self._lock:
+            batch, self._pending = self._pending, {}
+        if not batch:
+            return 0
+
+        users = User.__table__
+        try:
+            with Session(bind or engine) as session:
+                session.exec(
+                    update(users)
+                    .where(users.c.keycloak_id == bindparam("b_keycloak_id"))
+                    .values(realm_roles=bindparam("b_realm_roles")),
+                    params=[
+                        {"b_keycloak_id": keycloak_id, "b_realm_roles": roles}
+                        for keycloak_id, roles in batch.items()
+                    ],
+                )
+                session.commit()
+        except Exception:
+            # Put the batch back unless newer tokens already replaced it
+            with self._lock:
+                for keycloak_id, roles in batch.items():
+                    self._pending.setdefault(keycloak_id, roles)
+            raise
+        return len(batch)
+
+
+identity_writes = IdentityWriteBehind()
+
+
+def create_user_from_token(session: Session, keycloak_id: str, email: Optional[str],
+                           first_name: str, last_name: str, realm_roles: List[str]) -> Optional[User]:
+    """
+    Create the user on first login. Concurrent first requests race on the
+    keycloak_id/email unique constraints and all read back the same row;
+    returns None if the email belongs to another account.
+    """
+    session.exec(
+        dialect_insert(session)(User)
+        .values(
+            keycloak_id=keycloak_id,
+            email=email or f"{keycloak_id}@unknown.local",
+            first_name=first_name,
+            last_name=last_name,
+            phone_number=None,
+            realm_roles=realm_roles,
+            created_at=datetime.now(timezone.utc),
+        )
+        .on_conflict_do_nothing()
+    )
+    session.commit()
+    return session.exec(select(User).where(User.keycloak_id == keycloak_id)).first()
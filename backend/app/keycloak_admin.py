@@ -1,11 +1,15 @@
 """
 Keycloak Admin API helper functions
 """
+import asyncio
 import os
-import requests
-from typing import Optional, List
+import time
+import httpx
+from typing import Dict, Optional, List
 from dotenv import load_dotenv
 
+from app.http_client import keycloak_http
+
 load_dotenv()
 
 KEYCLOAK_REALM = os.getenv("KEYCLOAK_REALM", "time-manager")
@@ -13,48 +17,139 @@ KEYCLOAK_INTERNAL_URL = os.getenv("KEYCLOAK_INTERNAL_URL", "http://keycloak:8080
 KEYCLOAK_ADMIN_USER = os.getenv("KEYCLOAK_ADMIN", "admin")
 KEYCLOAK_ADMIN_PASSWORD = os.getenv("KEYCLOAK_ADMIN_PASSWORD", "admin")
 
-# Cache for admin token
-_admin_token: Optional[str] = None
-_admin_token_expires_at: Optional[float] = None
+ADMIN_TOKEN_REFRESH_MARGIN = int(os.getenv("KEYCLOAK_ADMIN_TOKEN_REFRESH_MARGIN", "60"))
+REALM_ROLES_TTL = int(os.getenv("KEYCLOAK_REALM_ROLES_TTL", "300"))
 
 
-def get_admin_token() -> str:
+class KeycloakAdminSession:
     """
-    Get or refresh the Keycloak admin token.
-    Uses caching to avoid unnecessary requests.
+    Admin API state shared by every request of this process.
+
+    - The admin token is refreshed single-flight: concurrent callers at
+      expiry wait on one lock and reuse the token the first one fetched.
+      Once start() is called a background task also refreshes it
+      `refresh_margin` seconds before it expires, so requests rarely wait.
+      The margin is capped at half the token's life: master-realm admin
+      tokens last 60s by default, as long as the default margin.
+    - Realm role representations are cached for `roles_ttl` seconds,
+      indexed by lowercase name.
     """
-    global _admin_token, _admin_token_expires_at
 
-    # Check if we have a valid cached token
-    import time
-    if _admin_token and _admin_token_expires_at and time.time() < _admin_token_expires_at - 60:
-        return _admin_token
+    def __init__(self, http=keycloak_http, refresh_margin: int = ADMIN_TOKEN_REFRESH_MARGIN,
+                 roles_ttl: int = REALM_ROLES_TTL):
+        self.http = http
+        self.refresh_margin = refresh_margin
+        self.roles_ttl = roles_ttl
+        self._token: Optional[str] = None
+        self._refresh_at = 0.0
+        self._roles: Dict[str, dict] = {}
+        self._roles_fetched_at: Optional[float] = None
+        self._token_lock = asyncio.Lock()
+        self._roles_lock = asyncio.Lock()
+        self._refresher: Optional[asyncio.Task] = None
 
-    # Get new token
-    token_url = f"{KEYCLOAK_INTERNAL_URL}/realms/master/protocol/openid-connect/token"
-    
-    data = {
-        "grant_type": "password",
-        "client_id": "admin-cli",
-        "username": KEYCLOAK_ADMIN_USER,
-        "password": KEYCLOAK_ADMIN_PASSWORD,
-    }
+    # --- admin token ---
+    def _token_fresh(self) -> bool:
+        return self._token is not None and time.monotonic() < self._refresh_at
 
-    try:
-        response = requests.post(token_url, data=data, timeout=10)
-        response.raise_for_status()
-        token_data = response.json()
-        
-        _admin_token = token_data["access_token"]
+    async def _fetch_token(self):
+        token_url = f"{KEYCLOAK_INTERNAL_URL}/realms/master/protocol/openid-connect/token"
+        data = {
+            "grant_type": "password",
+            "client_id": "admin-cli",
+            "username": KEYCLOAK_ADMIN_USER,
+            "password": KEYCLOAK_ADMIN_PASSWORD,
+        }
+        try:
+            response = await self.http.request("POST", token_url, endpoint="admin_token", data=data)
+            response.raise_for_status()
+            token_data = response.json()
+        except httpx.HTTPError as e:
+            raise Exception(f"Failed to get Keycloak admin token: {e}")
+
+        self._token = token_data["access_token"]
         expires_in = token_data.get("expires_in", 60)
-        _admin_token_expires_at = time.time() + expires_in
-        
-        return _admin_token
-    except requests.RequestException as e:
-        raise Exception(f"Failed to get Keycloak admin token: {e}")
+        self._refresh_at = time.monotonic() + expires_in - min(self.refresh_margin, expires_in / 2)
+
+    async def token(self) -> str:
+        if self._token_fresh():
+            return self._token
+        async with self._token_lock:
+            if not self._token_fresh():
+                await self._fetch_token()
+            return self._token
+
+    def invalidate_token(self):
+        self._token = None
+
+    async def _refresh_loop(self):
+        while True:
+            delay = max(self._refresh_at - time.monotonic(), 1)
+            await asyncio.sleep(delay if self._token else 1)
+            try:
+                async with self._token_lock:
+                    if not self._token_fresh():
+                        await self._fetch_token()
+            except Exception as e:
+                print(f"[Keycloak] Background admin token refresh failed: {e}")
+                await asyncio.sleep(30)
 
+    def start(self):
+        """Start proactive token refresh on the running event loop."""
+        if self._refresher is None or self._refresher.done():
+            self._refresher = asyncio.get_running_loop().create_task(self._refresh_loop())
 
-def create_keycloak_user(
+    async def stop(self):
+        if self._refresher is not None:
+            self._refresher.cancel()
+            try:
+                await self._refresher
+            except asyncio.CancelledError:
+                pass
+            self._refresher = None
+
+    async def get_json(self, path: str, *, endpoint: str, params: Optional[dict] = None):
+        """GET {admin realm URL}{path}; retried once with a new token on 401."""
+        url = f"{KEYCLOAK_INTERNAL_URL}/admin/realms/{KEYCLOAK_REALM}{path}"
+        for attempt in range(2):
+            headers = {"Authorization": f"Bearer {await self.token()}"}
+            response = await self.http.request("GET", url, endpoint=endpoint, params=params, headers=headers)
+            if response.status_code == 401 and attempt == 0:
+                self.invalidate_token()
+                continue
+            response.raise_for_status()
+            return response.json()
+
+    # --- realm roles ---
+    def _roles_fresh(self) -> bool:
+        return self._roles_fetched_at is not None and time.monotonic() - self._roles_fetched_at < self.roles_ttl
+
+    async def realm_roles(self) -> Dict[str, dict]:
+        """Realm role representations keyed by lowercase role name."""
+        if self._roles_fresh():
+            return self._roles
+        async with self._roles_lock:
+            if not self._roles_fresh():
+                roles_url = f"{KEYCLOAK_INTERNAL_URL}/admin/realms/{KEYCLOAK_REALM}/roles"
+                headers = {"Authorization": f"Bearer {await self.token()}"}
+                response = await self.http.request("GET", roles_url, endpoint="realm_roles", headers=headers)
+                response.raise_for_status()
+                self._roles = {role["name"].lower(): role for role in response.json()}
+                self._roles_fetched_at = time.monotonic()
+            return self._roles
+
+
+admin_session = KeycloakAdminSession()
+
+
+async def get_admin_token() -> str:
+    """
+    Get or refresh the Keycloak admin token (see KeycloakAdminSession).
+    """
+    return await admin_session.token()
+
+
+async def create_keycloak_user(
     email: str,
     username: str,
     password: str,
@@ -69,7 +164,7 @@ def create_keycloak_user(
     Returns:
         The Keycloak user ID (UUID)
     """
-    admin_token = get_admin_token()
+    admin_token = await get_admin_token()
     
     # Create user payload
     user_payload = {
@@ -102,7 +197,9 @@ def create_keycloak_user(
     }
 
     try:
-        response = requests.post(create_url, json=user_payload, headers=headers, timeout=10)
+        response = await keycloak_http.request(
+            "POST", create_url, endpoint="create_user", json=user_payload, headers=headers
+        )
         
         if response.status_code == 409:
             raise Exception(f"User with email {email} or username {username} already exists in Keycloak")
@@ -119,38 +216,33 @@ def create_keycloak_user(
         
         # Assign realm roles if provided
         if realm_roles:
-            assign_realm_roles(user_id, realm_roles)
+            await assign_realm_roles(user_id, realm_roles)
         
         return user_id
         
-    except requests.RequestException as e:
+    except httpx.HTTPError as e:
         if hasattr(e, "response") and e.response is not None:
             error_detail = e.response.text
             raise Exception(f"Failed to create user in Keycloak: {error_detail}")
         raise Exception(f"Failed to create user in Keycloak: {e}")
 
 
-def assign_realm_roles(user_id: str, roles: List[str]):
+async def assign_realm_roles(user_id: str, roles: List[str]):
     """
     Assign realm roles to a Keycloak user.
     """
-    admin_token = get_admin_token()
-    
-    # Get available realm roles
-    roles_url = f"{KEYCLOAK_INTERNAL_URL}/admin/realms/{KEYCLOAK_REALM}/roles"
+    admin_token = await get_admin_token()
     headers = {
         "Authorization": f"Bearer {admin_token}",
         "Content-Type": "application/json",
     }
     
     try:
-        # Get all realm roles
-        response = requests.get(roles_url, headers=headers, timeout=10)
-        response.raise_for_status()
-        all_roles = response.json()
+        # Realm roles, cached by lowercase name
+        all_roles = await admin_session.realm_roles()
         
         # Filter to only the roles we want to assign
-        roles_to_assign = [r for r in all_roles if r["name"].lower() in [role.lower() for role in roles]]
+        roles_to_assign = [all_roles[role.lower()] for role in dict.fromkeys(roles) if role.lower() in all_roles]
         
         if not roles_to_assign:
             # If no matching roles found, skip assignment
@@ -158,19 +250,21 @@ def assign_realm_roles(user_id: str, roles: List[str]):
         
         # Assign roles to user
         assign_url = f"{KEYCLOAK_INTERNAL_URL}/admin/realms/{KEYCLOAK_REALM}/users/{user_id}/role-mappings/realm"
-        response = requests.post(assign_url, json=roles_to_assign, headers=headers, timeout=10)
+        response = await keycloak_http.request(
+            "POST", assign_url, endpoint="assign_realm_roles", json=roles_to_assign, headers=headers
+        )
         response.raise_for_status()
         
-    except requests.RequestException as e:
+    except httpx.HTTPError as e:
         # Log error but don't fail user creation if role assignment fails
         print(f"Warning: Failed to assign roles to user {user_id}: {e}")
 
 
-def delete_keycloak_user(keycloak_id: str):
+async def delete_keycloak_user(keycloak_id: str):
     """
     Delete a user from Keycloak via Admin API.
     """
-    admin_token = get_admin_token()
+    admin_token = await get_admin_token()
     
     delete_url = f"{KEYCLOAK_INTERNAL_URL}/admin/realms/{KEYCLOAK_REALM}/users/{keycloak_id}"
     headers = {
@@ -178,16 +272,16 @@ def delete_keycloak_user(keycloak_id: str):
     }
     
     try:
-        response = requests.delete(delete_url, headers=headers, timeout=10)
+        response = await keycloak_http.request("DELETE", delete_url, endpoint="delete_user", headers=headers)
         # 404 is OK if user doesn't exist
         if response.status_code not in (204, 404):
             response.raise_for_status()
-    except requests.RequestException as e:
+    except httpx.HTTPError as e:
         # Log error but don't fail if deletion fails
         print(f"Warning: Failed to delete user {keycloak_id} from Keycloak: {e}")
 
 
-def verify_user_password(keycloak_id: str, password: str) -> bool:
+async def verify_user_password(keycloak_id: str, password: str) -> bool:
     """
     Verify a user's password by attempting to authenticate.
     
@@ -196,13 +290,13 @@ def verify_user_password(keycloak_id: str, password: str) -> bool:
     """
     try:
         # Get user info to find username/email
-        admin_token = get_admin_token()
+        admin_token = await get_admin_token()
         user_url = f"{KEYCLOAK_INTERNAL_URL}/admin/realms/{KEYCLOAK_REALM}/users/{keycloak_id}"
         headers = {
             "Authorization": f"Bearer {admin_token}",
         }
         
-        response = requests.get(user_url, headers=headers, timeout=10)
+        response = await keycloak_http.request("GET", user_url, endpoint="get_user", headers=headers)
         response.raise_for_status()
         user_data = response.json()
         
@@ -219,14 +313,14 @@ def verify_user_password(keycloak_id: str, password: str) -> bool:
             "password": password,
         }
         
-        auth_response = requests.post(token_url, data=auth_data, timeout=10)
+        auth_response = await keycloak_http.request("POST", token_url, endpoint="password_grant", data=auth_data)
         return auth_response.status_code == 200
         
-    except requests.RequestException:
+    except httpx.HTTPError:
         return False
 
 
-def change_keycloak_user_password(keycloak_id: str, new_password: str, temporary: bool = False):
+async def change_keycloak_user_password(keycloak_id: str, new_password: str, temporary: bool = False):
     """
     Change a user's password in Keycloak via Admin API.
     
@@ -235,7 +329,7 @@ def change_keycloak_user_password(keycloak_id: str, new_password: str, temporary
         new_password: The new password
         temporary: Whether the password should be marked as temporary
     """
-    admin_token = get_admin_token()
+    admin_token = await get_admin_token()
     
     # Reset password endpoint
     reset_password_url = f"{KEYCLOAK_INTERNAL_URL}/admin/realms/{KEYCLOAK_REALM}/users/{keycloak_id}/reset-password"
@@ -251,9 +345,11 @@ def change_keycloak_user_password(keycloak_id: str, new_password: str, temporary
     }
     
     try:
-        response = requests.put(reset_password_url, json=password_payload, headers=headers, timeout=10)
+        response = await keycloak_http.request(
+            "PUT", reset_password_url, endpoint="reset_password", json=password_payload, headers=headers
+        )
         response.raise_for_status()
-    except requests.RequestException as e:
+    except httpx.HTTPError as e:
         if hasattr(e, "response") and e.response is not None:
             error_detail = e.response.text
             raise Exception(f"Failed to change password in Keycloak: {error_detail}")
@@ -0,0 +1,102 @@
+"""
+SQL aggregation engine for the KPI dashboard.
+Computes the KPISummary fields with COUNT / SUM / AVG ... FILTER
+expressions so no model objects are loaded into Python.
+"""
+from datetime import datetime, timezone, timedelta
+from typing import Optional
+
+from sqlalchemy import extract, func
+from sqlmodel import Session, select
+
+from app.models import User, Team, Clock, KPISummary
+
+SECONDS_PER_DAY = 86400
+
+# Scheduled day (UTC): arrival after 09:00, departure after 17:00.
+# "Late" / "overtime" only start counting once the minute has passed.
+WORKDAY_START_SECONDS = 9 * 3600
+WORKDAY_END_SECONDS = 17 * 3600
+LATE_THRESHOLD_SECONDS = WORKDAY_START_SECONDS + 60
+OVERTIME_THRESHOLD_SECONDS = WORKDAY_END_SECONDS + 60
+
+
+def start_of_week_utc(now: datetime) -> datetime:
+    """
+    ISO week: Monday 00:00 UTC -> now
+    """
+    # now is timezone-aware (UTC)
+    monday = now - timedelta(days=now.weekday())
+    return monday.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def epoch_seconds(column):
+    """UTC epoch seconds of a timestamp column (portable across dialects)."""
+    return extract("epoch", column)
+
+
+def seconds_of_day(column):
+    """Seconds elapsed since 00:00 UTC for a timestamp column."""
+    return epoch_seconds(column) % SECONDS_PER_DAY
+
+
+def compute_kpi_summary(session: Session, now: Optional[datetime] = None) -> KPISummary:
+    """
+    Build the current-week KPI summary in two aggregate queries.
+    """
+    now = now or datetime.now(timezone.utc)
+    week_start = start_of_week_utc(now)
+
+    # --- Base counts (one round trip) ---
+    total_employees, total_teams, active_clocks = session.exec(
+        select(
+            select(func.count()).select_from(User).scalar_subquery(),
+            select(func.count()).select_from(Team).scalar_subquery(),
+            select(func.count())
+            .select_from(Clock)
+            .where(Clock.clock_out.is_(None))
+            .scalar_subquery(),
+        )
+    ).one()
+
+    # --- Week aggregates ---
+    completed = Clock.clock_out.is_not(None)
+    duration = epoch_seconds(Clock.clock_out) - epoch_seconds(Clock.clock_in)
+    in_of_day = seconds_of_day(Clock.clock_in)
+    out_of_day = seconds_of_day(Clock.clock_out)
+
+    is_late = in_of_day >= LATE_THRESHOLD_SECONDS
+    is_overtime = completed & (out_of_day >= OVERTIME_THRESHOLD_SECONDS)
+
+    (
+        completed_count,
+        total_seconds,
+        late_count,
+        avg_late_seconds,
+        overtime_count,
+        avg_overtime_seconds,
+    ) = session.exec(
+        select(
+            func.count().filter(completed),
+            func.sum(duration).filter(completed),
+            func.count().filter(is_late),
+            func.avg(in_of_day - WORKDAY_START_SECONDS).filter(is_late),
+            func.count().filter(is_overtime),
+            func.avg(out_of_day - WORKDAY_END_SECONDS).filter(is_overtime),
+        ).where(Clock.clock_in >= week_start)
+    ).one()
+
+    total_hours_week = float(total_seconds or 0) / 3600.0
+    avg_hours_per_shift = total_hours_week / completed_count if completed_count else 0.0
+    avg_late_minutes = float(avg_late_seconds) / 60.0 if late_count else 0.0
+    avg_overtime_hours = float(avg_overtime_seconds) / 3600.0 if overtime_count else 0.0
+
+    return KPISummary(
+        totalEmployees=total_employees,
+        totalTeams=total_teams,
+        activeClocks=active_clocks,
+        totalHoursThisWeek=round(total_hours_week, 2),
+        avgHoursPerShift=round(avg_hours_per_shift, 2),
+        avgLateTimeMinutes=round(avg_late_minutes, 1),
+        avgOvertimeHours=round(avg_overtime_hours, 2),
+    )
@@ -0,0 +1,272 @@
+"""
+Incrementally maintained daily KPI rollups.
+
+Clock events update per-user / per-team counters for the UTC day of the
+shift's clock_in, so /kpi/summary scans ~7 x N small rows per week
+instead of every clock event.
+
+Rebuild from history with:
+    docker exec -it backend python -m app.kpi_rollup [--since YYYY-MM-DD]
+"""
+import argparse
+from collections import defaultdict
+from datetime import date, datetime, timezone, timedelta
+from typing import Optional
+
+from sqlalchemy import delete, func, insert
+from sqlmodel import Session, select
+
+from app.database import engine, dialect_insert
+from app.kpi_engine import (
+    SECONDS_PER_DAY,
+    WORKDAY_START_SECONDS,
+    WORKDAY_END_SECONDS,
+    LATE_THRESHOLD_SECONDS,
+    OVERTIME_THRESHOLD_SECONDS,
+    epoch_seconds,
+    seconds_of_day,
+    start_of_week_utc,
+)
+from app.models import User, Team, Clock, UserDailyKPI, TeamDailyKPI, KPISummary
+
+EPOCH = date(1970, 1, 1)
+COUNTER_COLUMNS = (
+    "worked_seconds",
+    "shift_count",
+    "late_count",
+    "late_minutes",
+    "overtime_count",
+    "overtime_minutes",
+)
+
+
+# ==========================================
+# PER-CLOCK CONTRIBUTIONS
+# ==========================================
+def as_utc(dt: datetime) -> datetime:
+    # SQLite hands back naive datetimes; they are stored as UTC
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc)
+
+
+def _seconds_of_day(dt: datetime) -> float:
+    return dt.hour * 3600 + dt.minute * 60 + dt.second + dt.microsecond / 1e6
+
+
+def clock_in_deltas(clock_in: datetime) -> dict:
+    """Counters known as soon as a shift starts (lateness)."""
+    seconds = _seconds_of_day(as_utc(clock_in))
+    if seconds < LATE_THRESHOLD_SECONDS:
+        return {}
+    return {
+        "late_count": 1,
+        "late_minutes": (seconds - WORKDAY_START_SECONDS) / 60.0,
+    }
+
+
+def clock_out_deltas(clock_in: datetime, clock_out: datetime) -> dict:
+    """Counters known once a shift is closed (duration, overtime)."""
+    clock_in, clock_out = as_utc(clock_in), as_utc(clock_out)
+    deltas = {
+        "worked_seconds": (clock_out - clock_in).total_seconds(),
+        "shift_count": 1,
+    }
+    seconds = _seconds_of_day(clock_out)
+    if seconds >= OVERTIME_THRESHOLD_SECONDS:
+        deltas["overtime_count"] = 1
+        deltas["overtime_minutes"] = (seconds - WORKDAY_END_SECONDS) / 60.0
+    return deltas
+
+
+# ==========================================
+# UPSERTS
+# ==========================================
+def _upsert_increment(session: Session, model, keys: dict, deltas: dict):
+    """INSERT ... ON CONFLICT DO UPDATE SET col = col + excluded.col"""
+    if not deltas:
+        return
+    table = model.__table__
+    stmt = dialect_insert(session)(table).values(**keys, **deltas)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={col: table.c[col] + stmt.excluded[col] for col in deltas},
+    )
+    session.exec(stmt)
+
+
+def apply_deltas(session: Session, user_id: int, team_id: Optional[int], day: date, deltas: dict):
+    """
+    Add counter deltas to the user's (and team's) row for a day.
+    Runs inside the caller's transaction; the caller commits.
+    """
+    _upsert_increment(session, UserDailyKPI, {"user_id": user_id, "day": day}, deltas)
+    if team_id is not None:
+        _upsert_increment(session, TeamDailyKPI, {"team_id": team_id, "day": day}, deltas)
+
+
+def apply_deltas_bulk(session: Session, contributions):
+    """
+    Sum many (user_id, team_id, day, deltas) contributions in memory and
+    write them with one executemany upsert per rollup table.
+    """
+    user_totals = defaultdict(lambda: dict.fromkeys(COUNTER_COLUMNS, 0))
+    team_totals = defaultdict(lambda: dict.fromkeys(COUNTER_COLUMNS, 0))
+    for user_id, team_id, day, deltas in contributions:
+        targets = [user_totals[(user_id, day)]]
+        if team_id is not None:
+            targets.append(team_totals[(team_id, day)])
+        for totals in targets:
+            for col, value in deltas.items():
+                totals[col] += value
+
+    for model, key, totals in (
+        (UserDailyKPI, "user_id", user_totals),
+        (TeamDailyKPI, "team_id", team_totals),
+    ):
+        if not totals:
+            continue
+        table = model.__table__
+        stmt = dialect_insert(session)(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[key, "day"],
+            set_={col: table.c[col] + stmt.excluded[col] for col in COUNTER_COLUMNS},
+        )
+        session.exec(stmt, params=[{key: k, "day": d, **c} for (k, d), c in totals.items()])
+
+
+def record_clock_in(session: Session, user_id: int, team_id: Optional[int], clock_in: datetime):
+    day = as_utc(clock_in).date()
+    apply_deltas(session, user_id, team_id, day, clock_in_deltas(clock_in))
+
+
+def record_clock_out(
+    session: Session, user_id: int, team_id: Optional[int], clock_in: datetime, clock_out: datetime
+):
+    day = as_utc(clock_in).date()
+    apply_deltas(session, user_id, team_id, day, clock_out_deltas(clock_in, clock_out))
+
+
+# ==========================================
+# READS
+# ==========================================
+def compute_kpi_summary_from_rollup(session: Session, now: Optional[datetime] = None) -> KPISummary:
+    """Current-week KPI summary read from the daily rollup table."""
+    now = now or datetime.now(timezone.utc)
+    week_start = start_of_week_utc(now).date()
+
+    total_employees, total_teams, active_clocks = session.exec(
+        select(
+            select(func.count()).select_from(User).scalar_subquery(),
+            select(func.count()).select_from(Team).scalar_subquery(),
+            select(func.count())
+            .select_from(Clock)
+            .where(Clock.clock_out.is_(None))
+            .scalar_subquery(),
+        )
+    ).one()
+
+    totals = session.exec(
+        select(*(func.coalesce(func.sum(UserDailyKPI.__table__.c[col]), 0) for col in COUNTER_COLUMNS))
+        .where(UserDailyKPI.day >= week_start)
+    ).one()
+    worked_seconds, shift_count, late_count, late_minutes, overtime_count, overtime_minutes = totals
+
+    total_hours_week = float(worked_seconds) / 3600.0
+    avg_hours_per_shift = total_hours_week / shift_count if shift_count else 0.0
+    avg_late_minutes = float(late_minutes) / late_count if late_count else 0.0
+    avg_overtime_hours = float(overtime_minutes) / 60.0 / overtime_count if overtime_count else 0.0
+
+    return KPISummary(
+        totalEmployees=total_employees,
+        totalTeams=total_teams,
+        activeClocks=active_clocks,
+        totalHoursThisWeek=round(total_hours_week, 2),
+        avgHoursPerShift=round(avg_hours_per_shift, 2),
+        avgLateTimeMinutes=round(avg_late_minutes, 1),
+        avgOvertimeHours=round(avg_overtime_hours, 2),
+    )
+
+
+# ==========================================
+# REBUILD
+# ==========================================
+def rebuild_rollup(session: Session, since: Optional[date] = None) -> int:
+    """
+    Recompute rollup rows from the clocks table (all history, or every
+    day >= since). Team rows use the users' current team. Returns the
+    number of user-day rows written.
+    """
+    completed = Clock.clock_out.is_not(None)
+    in_of_day = seconds_of_day(Clock.clock_in)
+    out_of_day = seconds_of_day(Clock.clock_out)
+    is_late = in_of_day >= LATE_THRESHOLD_SECONDS
+    is_overtime = completed & (out_of_day >= OVERTIME_THRESHOLD_SECONDS)
+    day_index = (epoch_seconds(Clock.clock_in) - in_of_day) / SECONDS_PER_DAY
+
+    stmt = (
+        select(
+            Clock.user_id,
+            User.team_id,
+            day_index,
+            func.coalesce(func.sum(epoch_seconds(Clock.clock_out) - epoch_seconds(Clock.clock_in)).filter(completed), 0),
+            func.count().filter(completed),
+            func.count().filter(is_late),
+            func.coalesce(func.sum(in_of_day - WORKDAY_START_SECONDS).filter(is_late), 0),
+            func.count().filter(is_overtime),
+            func.coalesce(func.sum(out_of_day - WORKDAY_END_SECONDS).filter(is_overtime), 0),
+        )
+        .join(User, User.id == Clock.user_id)
+        .group_by(Clock.user_id, User.team_id, day_index)
+    )
+    if since is not None:
+        stmt = stmt.where(Clock.clock_in >= datetime.combine(since, datetime.min.time(), tzinfo=timezone.utc))
+
+    user_rows = []
+    team_rows = defaultdict(lambda: dict.fromkeys(COUNTER_COLUMNS, 0))
+    for user_id, team_id, day_idx, worked, shifts, late, late_s, overtime, overtime_s in session.exec(stmt):
+        counters = {
+            "worked_seconds": float(worked),
+            "shift_count": shifts,
+            "late_count": late,
+            "late_minutes": float(late_s) / 60.0,
+            "overtime_count": overtime,
+            "overtime_minutes": float(overtime_s) / 60.0,
+        }
+        day = EPOCH + timedelta(days=int(day_idx))
+        user_rows.append({"user_id": user_id, "day": day, **counters})
+        if team_id is not None:
+            team_row = team_rows[(team_id, day)]
+            for col, value in counters.items():
+                team_row[col] += value
+
+    for model in (UserDailyKPI, TeamDailyKPI):
+        cleanup = delete(model)
+        if since is not None:
+            cleanup = cleanup.where(model.day >= since)
+        session.exec(cleanup)
+
+    if user_rows:
+        session.exec(insert(UserDailyKPI), params=user_rows)
+    if team_rows:
+        session.exec(
+            insert(TeamDailyKPI),
+            params=[{"team_id": t, "day": d, **c} for (t, d), c in team_rows.items()],
+        )
+    session.commit()
+    return len(user_rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the daily KPI rollup tables.")
+    parser.add_argument("--since", type=date.fromisoformat, default=None,
+                        help="Only rebuild days >= this date (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    with Session(engine) as session:
+        rows = rebuild_rollup(session, since=args.since)
+    print(f"✅ Rebuilt {rows} user-day KPI rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,15 @@
 from fastapi import FastAPI
-from sqlmodel import SQLModel
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.utils import get_openapi
-from app.scheduler import start_scheduler, shutdown_scheduler
+from app.scheduler import start_scheduler, shutdown_scheduler, resync_presence
 
 
-from app.database import engine
+from app.database import async_engine, replica_engine
+from app.db_instrumentation import DBTimingMiddleware, db_metrics
+from app.read_routing import replica_router
+from app.responses import FastJSONResponse
+from app.http_client import keycloak_http
+from app.keycloak_admin import admin_session
 from app.admin_panel import setup_admin
 from app.routers import users, clocks, teams, kpi
 # from app.routers import auth_routes
@@ -16,6 +20,7 @@ app = FastAPI(
     description="API for managing users, teams and clocks.",
     version="1.0.0",
     redirect_slashes=False,
+    default_response_class=FastJSONResponse,
 )
 
 def custom_openapi():
@@ -47,17 +52,35 @@ app.add_middleware(
 
 
 # ==============================
-#          DATABASE INIT
+#       DB INSTRUMENTATION
 # ==============================
+app.add_middleware(DBTimingMiddleware)
+
+
+# ==============================
+#            STARTUP
+# ==============================
+# The schema is managed out-of-band by migrations (python -m app.migrate
+# upgrade head), startup runs no DDL
 @app.on_event("startup")
-def on_startup():
-    SQLModel.metadata.create_all(engine)
+async def on_startup():
+    await resync_presence()  # warm the "who is clocked in" index
     start_scheduler()  # Add this line
 
 
+@app.on_event("startup")
+async def start_keycloak_admin():
+    admin_session.start()  # refresh the admin token before it expires
+
+
 @app.on_event("shutdown")
-def on_shutdown():
-    shutdown_scheduler()  # Add this event
+async def on_shutdown():
+    await shutdown_scheduler()  # Add this event
+    await admin_session.stop()
+    await keycloak_http.aclose()
+    await async_engine.dispose()
+    if replica_engine is not None:
+        await replica_engine.dispose()
 
 
 # ==============================
@@ -68,6 +91,12 @@ async def root():
     return {"message": "Connected to Time Manager API"}
 
 
+@app.get("/metrics")
+async def metrics():
+    """Connection pool, replica routing and Keycloak client counters of this worker."""
+    return {"database": db_metrics(), "replica": replica_router.stats(), "keycloak": keycloak_http.metrics()}
+
+
 # ==============================
 #           ROUTERS
 # ==============================
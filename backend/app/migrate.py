@@ -0,0 +1,49 @@
+"""
+Versioned schema migrations (Alembic, revisions in app/migrations/versions).
+
+The API never issues DDL: apply migrations out-of-band, before starting
+or right after deploying a new backend image:
+    docker exec -it backend python -m app.migrate upgrade head
+
+Other commands are Alembic's own:
+    python -m app.migrate current
+    python -m app.migrate history
+    python -m app.migrate downgrade -1
+    python -m app.migrate revision --autogenerate -m "add foo"
+
+Databases created before migrations existed (tables made by create_all
+at startup) are adopted by the baseline revision, which only records
+itself when the tables are already there; the following revisions
+create whatever that database is still missing.
+
+Migrations connect with their own engine, without the API's
+statement_timeout, so index builds on large tables are not cancelled.
+"""
+import os
+from typing import List, Optional
+
+from alembic.config import CommandLine, Config
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), "migrations")
+
+
+def make_config(connection=None) -> Config:
+    """Alembic config for app/migrations; `connection` runs the migrations on an existing connection."""
+    config = Config()
+    config.set_main_option("script_location", MIGRATIONS_DIR)
+    config.set_main_option("file_template", "%%(rev)s_%%(slug)s")
+    if connection is not None:
+        config.attributes["connection"] = connection
+    return config
+
+
+def main(argv: Optional[List[str]] = None):
+    cli = CommandLine(prog="python -m app.migrate")
+    options = cli.parser.parse_args(argv)
+    if not hasattr(options, "cmd"):
+        cli.parser.error("too few arguments")
+    cli.run_cmd(make_config(), options)
+
+
+if __name__ == "__main__":
+    main()
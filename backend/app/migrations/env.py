@@ -0,0 +1,28 @@
+from alembic import context
+from sqlalchemy.pool import NullPool
+from sqlmodel import SQLModel, create_engine
+
+from app import models  # noqa: F401  (registers the tables for --autogenerate)
+from app.database import SQL_DB_URL
+
+target_metadata = SQLModel.metadata
+
+
+def run_migrations(connection):
+    context.configure(connection=connection, target_metadata=target_metadata)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+if context.is_offline_mode():
+    # Revisions inspect the live schema (existing tables, partitioning)
+    raise SystemExit("Offline (--sql) migrations are not supported, run them against the database.")
+
+connection = context.config.attributes.get("connection")
+if connection is not None:
+    run_migrations(connection)
+else:
+    engine = create_engine(SQL_DB_URL, poolclass=NullPool)
+    with engine.connect() as connection:
+        run_migrations(connection)
+    engine.dispose()
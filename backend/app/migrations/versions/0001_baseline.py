@@ -0,0 +1,82 @@
+"""Baseline: users, teams and clocks as create_all made them before migrations
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 09:00:00
+
+Databases that already have these tables (created by the old startup
+hook) are adopted as they are; the revision then only records itself.
+Everything added to the schema since then comes in later revisions,
+which check what already exists.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision: str = "0001"
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if sa.inspect(bind).has_table("users"):
+        return
+
+    # users.team_id and teams.manager_id reference each other: SQLite
+    # accepts the forward reference inline, PostgreSQL gets it afterwards
+    inline_team_fk = bind.dialect.name == "sqlite"
+
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("first_name", sa.VARCHAR(), nullable=False),
+        sa.Column("last_name", sa.VARCHAR(), nullable=False),
+        sa.Column("email", sa.VARCHAR(), nullable=False),
+        sa.Column("phone_number", sa.VARCHAR(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("keycloak_id", sa.VARCHAR(), nullable=False),
+        sa.Column("realm_roles", postgresql.JSON(astext_type=sa.Text()), nullable=False),
+        sa.Column("team_id", sa.Integer(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("phone_number"),
+        *([sa.ForeignKeyConstraint(["team_id"], ["teams.id"])] if inline_team_fk else []),
+    )
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+    op.create_index("ix_users_keycloak_id", "users", ["keycloak_id"], unique=True)
+
+    op.create_table(
+        "teams",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.VARCHAR(), nullable=False),
+        sa.Column("description", sa.VARCHAR(), nullable=False),
+        sa.Column("manager_id", sa.Integer(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(["manager_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("name"),
+    )
+    if not inline_team_fk:
+        op.create_foreign_key("users_team_id_fkey", "users", "teams", ["team_id"], ["id"])
+
+    op.create_table(
+        "clocks",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("clock_in", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("clock_out", sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    op.drop_table("clocks")
+    if bind.dialect.name != "sqlite":
+        op.drop_constraint("users_team_id_fkey", "users", type_="foreignkey")
+    op.drop_table("teams")
+    op.drop_table("users")
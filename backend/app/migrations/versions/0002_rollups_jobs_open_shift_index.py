@@ -0,0 +1,96 @@
+"""KPI rollups, scheduler state and the one-open-shift-per-user index
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 09:15:00
+
+Adds what the startup create_all used to create after the baseline:
+kpi_daily_users, kpi_daily_teams, job_runs and uq_clocks_open_per_user.
+Each one is only created when missing, so databases that ran any
+version of the old startup hook upgrade cleanly.
+
+Concurrent taps from before the guarded toggle left duplicate open
+shifts, which the unique index cannot be built over: they are closed
+first (app.clock_ingest.close_duplicate_open_shifts), with clocks
+locked against writes until the index exists. Once clocks is
+partitioned the index lives on each partition (app.partitions) and is
+skipped here.
+
+Rollups created by this revision start empty, fill them from history:
+    docker exec -it backend python -m app.kpi_rollup
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.clock_ingest import close_duplicate_open_shifts
+from app.partitions import is_partitioned
+
+revision: str = "0002"
+down_revision: Union[str, Sequence[str], None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _kpi_columns():
+    return (
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("worked_seconds", sa.Float(), nullable=False),
+        sa.Column("shift_count", sa.Integer(), nullable=False),
+        sa.Column("late_count", sa.Integer(), nullable=False),
+        sa.Column("late_minutes", sa.Float(), nullable=False),
+        sa.Column("overtime_count", sa.Integer(), nullable=False),
+        sa.Column("overtime_minutes", sa.Float(), nullable=False),
+    )
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    existing = set(sa.inspect(bind).get_table_names())
+
+    if "kpi_daily_users" not in existing:
+        op.create_table(
+            "kpi_daily_users",
+            sa.Column("user_id", sa.Integer(), nullable=False),
+            *_kpi_columns(),
+            sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+            sa.PrimaryKeyConstraint("user_id", "day"),
+        )
+    if "kpi_daily_teams" not in existing:
+        op.create_table(
+            "kpi_daily_teams",
+            sa.Column("team_id", sa.Integer(), nullable=False),
+            *_kpi_columns(),
+            sa.ForeignKeyConstraint(["team_id"], ["teams.id"], ondelete="CASCADE"),
+            sa.PrimaryKeyConstraint("team_id", "day"),
+        )
+    if "job_runs" not in existing:
+        op.create_table(
+            "job_runs",
+            sa.Column("name", sa.VARCHAR(), nullable=False),
+            sa.Column("last_success_at", sa.DateTime(timezone=True), nullable=False),
+            sa.Column("affected_rows", sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint("name"),
+        )
+
+    if is_partitioned(bind):
+        return
+    if bind.dialect.name == "postgresql":
+        # Self-exclusive: no tap can open a new duplicate before the index exists
+        op.execute("LOCK TABLE clocks IN SHARE ROW EXCLUSIVE MODE")
+    closed = close_duplicate_open_shifts(bind)
+    if closed:
+        print(f"[Migrations] Closed {closed} duplicate open shifts")
+    op.create_index(
+        "uq_clocks_open_per_user", "clocks", ["user_id"], unique=True, if_not_exists=True,
+        postgresql_where=sa.text("clock_out IS NULL"),
+        sqlite_where=sa.text("clock_out IS NULL"),
+    )
+
+
+def downgrade() -> None:
+    if not is_partitioned(op.get_bind()):
+        op.drop_index("uq_clocks_open_per_user", table_name="clocks", if_exists=True)
+    for table in ("job_runs", "kpi_daily_teams", "kpi_daily_users"):
+        op.drop_table(table)
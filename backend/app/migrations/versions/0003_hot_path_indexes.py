@@ -0,0 +1,59 @@
+"""Hot-path indexes: clocks by user and time, team lookups
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 09:30:00
+
+- clocks (user_id, clock_in, id): a user's clocks, KPIs and the
+  /users/{id}/clocks/ keyset pagination
+- clocks (clock_in, id): clock_in range scans (rollups, exports,
+  keyset pagination of /clocks/)
+- users.team_id: team members, team KPIs
+- teams.manager_id: the manager's team
+
+Open shifts (clock_out IS NULL) are served by the partial
+uq_clocks_open_per_user index (revision 0002). On PostgreSQL the indexes are built
+CONCURRENTLY, so writes continue during the upgrade, except on a
+partitioned clocks table where PostgreSQL only allows a plain CREATE
+INDEX on the parent (it cascades to every partition). IF NOT EXISTS
+skips the clocks indexes the old startup hook already created; a
+failed concurrent build leaves an INVALID index behind, drop it before
+running the upgrade again.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+from app.partitions import is_partitioned
+
+revision: str = "0003"
+down_revision: Union[str, Sequence[str], None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = (
+    ("ix_clocks_user_id_clock_in_id", "clocks", ["user_id", "clock_in", "id"]),
+    ("ix_clocks_clock_in_id", "clocks", ["clock_in", "id"]),
+    ("ix_users_team_id", "users", ["team_id"]),
+    ("ix_teams_manager_id", "teams", ["manager_id"]),
+)
+
+
+def _concurrently(table: str) -> bool:
+    bind = op.get_bind()
+    return bind.dialect.name == "postgresql" and not (table == "clocks" and is_partitioned(bind))
+
+
+def upgrade() -> None:
+    for name, table, columns in INDEXES:
+        if _concurrently(table):
+            # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+            with op.get_context().autocommit_block():
+                op.create_index(name, table, columns, if_not_exists=True, postgresql_concurrently=True)
+        else:
+            op.create_index(name, table, columns, if_not_exists=True)
+
+
+def downgrade() -> None:
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
@@ -1,9 +1,9 @@
 from sqlmodel import SQLModel, Field, Relationship
-from sqlalchemy import Column, VARCHAR, DateTime
+from sqlalchemy import Column, VARCHAR, DateTime, Index, text
 from sqlalchemy.dialects.postgresql import JSON
 from pydantic import EmailStr, field_validator
-from datetime import datetime, timezone
-from typing import Optional, List
+from datetime import date, datetime, timezone
+from typing import Optional, List, Literal
 import phonenumbers
 
 
@@ -52,7 +52,7 @@ class User(SQLModel, table=True):
         sa_relationship_kwargs={"cascade": "all, delete-orphan"}
     )
 
-    team_id: Optional[int] = Field(default=None, foreign_key="teams.id")
+    team_id: Optional[int] = Field(default=None, foreign_key="teams.id", index=True)
     
     team: Optional["Team"] = Relationship(
         back_populates="members",
@@ -99,6 +99,20 @@ class User(SQLModel, table=True):
 
 class Clock(SQLModel, table=True):
     __tablename__: str = "clocks"
+    __table_args__ = (
+        # Keyset pagination: ORDER BY clock_in, id / WHERE (clock_in, id) > cursor
+        Index("ix_clocks_clock_in_id", "clock_in", "id"),
+        Index("ix_clocks_user_id_clock_in_id", "user_id", "clock_in", "id"),
+        # At most one open shift per user (created per partition once
+        # clocks is partitioned, see app.partitions)
+        Index(
+            "uq_clocks_open_per_user",
+            "user_id",
+            unique=True,
+            postgresql_where=text("clock_out IS NULL"),
+            sqlite_where=text("clock_out IS NULL"),
+        ),
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True)
 
@@ -137,7 +151,7 @@ class Team(SQLModel, table=True):
     name: str = Field(sa_column=Column("name", VARCHAR, unique=True, nullable=False))
     description: str = Field(sa_column=Column("description", VARCHAR, nullable=False))
 
-    manager_id: Optional[int] = Field(default=None, foreign_key="users.id")
+    manager_id: Optional[int] = Field(default=None, foreign_key="users.id", index=True)
 
     created_at: datetime = Field(
         default_factory=lambda: datetime.now(timezone.utc),
@@ -159,6 +173,61 @@ class Team(SQLModel, table=True):
     )
 
 
+# =====================================================
+#                 KPI DAILY ROLLUPS
+# =====================================================
+
+class UserDailyKPI(SQLModel, table=True):
+    """Per-user, per-day KPI counters (day = UTC date of clock_in)."""
+    __tablename__: str = "kpi_daily_users"
+
+    user_id: int = Field(foreign_key="users.id", primary_key=True, ondelete="CASCADE")
+    day: date = Field(primary_key=True)
+
+    worked_seconds: float = Field(default=0.0)
+    shift_count: int = Field(default=0)
+    late_count: int = Field(default=0)
+    late_minutes: float = Field(default=0.0)
+    overtime_count: int = Field(default=0)
+    overtime_minutes: float = Field(default=0.0)
+
+
+class TeamDailyKPI(SQLModel, table=True):
+    """Per-team, per-day KPI counters (team membership at event time)."""
+    __tablename__: str = "kpi_daily_teams"
+
+    team_id: int = Field(foreign_key="teams.id", primary_key=True, ondelete="CASCADE")
+    day: date = Field(primary_key=True)
+
+    worked_seconds: float = Field(default=0.0)
+    shift_count: int = Field(default=0)
+    late_count: int = Field(default=0)
+    late_minutes: float = Field(default=0.0)
+    overtime_count: int = Field(default=0)
+    overtime_minutes: float = Field(default=0.0)
+
+
+# =====================================================
+#                   SCHEDULER STATE
+# =====================================================
+
+class JobRun(SQLModel, table=True):
+    """Last successful run of each scheduled job (used for catch-up)."""
+    __tablename__: str = "job_runs"
+
+    name: str = Field(sa_column=Column("name", VARCHAR, primary_key=True))
+
+    last_success_at: datetime = Field(
+        sa_column=Column(
+            "last_success_at",
+            DateTime(timezone=True),
+            nullable=False
+        )
+    )
+
+    affected_rows: int = Field(default=0)
+
+
 
 # =====================================================
 #                     SCHEMAS
@@ -219,10 +288,53 @@ class PasswordReset(SQLModel):
     temp_password: str
 
 
+class UserImportRowResult(SQLModel):
+    index: int
+    email: Optional[str] = None
+    status: Literal["created", "rejected", "failed"]
+    user_id: Optional[int] = None
+    keycloak_id: Optional[str] = None
+    temp_password: Optional[str] = None  # Only returned on creation
+    detail: Optional[str] = None
+
+
+class UserImportResult(SQLModel):
+    created: int
+    rejected: int
+    failed: int
+    results: List[UserImportRowResult]
+
+
 class ClockCreate(SQLModel):
     user_id: int
 
 
+class ClockEvent(SQLModel):
+    """A buffered badge tap replayed by a terminal. No direction = toggle."""
+    user_id: int
+    timestamp: datetime
+    direction: Optional[Literal["in", "out"]] = None
+
+
+class ClockBatch(SQLModel):
+    events: List[ClockEvent]
+
+
+class ClockEventResult(SQLModel):
+    index: int
+    user_id: int
+    status: Literal["opened", "closed", "duplicate", "rejected"]
+    clock_id: Optional[int] = None
+    detail: Optional[str] = None
+
+
+class ClockBatchResult(SQLModel):
+    opened: int
+    closed: int
+    rejected: int
+    results: List[ClockEventResult]
+
+
 class ClockPublic(SQLModel):
     id: int
     user_id: int
@@ -231,6 +343,18 @@ class ClockPublic(SQLModel):
     user: Optional[UserMinimal]
 
 
+class ClockPage(SQLModel):
+    items: List[ClockPublic]
+    next_cursor: Optional[str] = None
+
+
+class ActiveClock(SQLModel):
+    user_id: int
+    clock_id: int
+    clock_in: datetime
+    team_id: Optional[int] = None
+
+
 class TeamMinimal(SQLModel):
     id: int
     name: str
@@ -267,4 +391,43 @@ class UserMe(SQLModel):
     phone_number: Optional[str] = None
     role: str
     created_at: datetime
-    team: Optional[TeamMinimal] = None
\ No newline at end of file
+    team: Optional[TeamMinimal] = None
+
+
+class KPISummary(SQLModel):
+    totalEmployees: int
+    totalTeams: int
+    totalHoursThisWeek: float
+    avgHoursPerShift: float
+    avgLateTimeMinutes: float
+    avgOvertimeHours: float
+    activeClocks: int = 0
+
+
+class KPIGroupStats(SQLModel):
+    id: Optional[int]
+    label: str
+    shifts: int
+    completedShifts: int
+    totalHours: float
+    avgShiftHours: float
+    shiftHoursP50: Optional[float]
+    shiftHoursP90: Optional[float]
+    shiftHoursP95: Optional[float]
+    lateShifts: int
+    lateRate: float
+    lateMinutesP50: Optional[float]
+    lateMinutesP90: Optional[float]
+    latenessHistogram: List[int]
+    overtimeShifts: int
+    overtimeHours: float
+    overtimeHistogram: List[int]
+
+
+class KPIBreakdown(SQLModel):
+    start: datetime
+    end: datetime
+    groupBy: str
+    latenessBinsMinutes: List[int]
+    overtimeBinsMinutes: List[int]
+    groups: List[KPIGroupStats]
@@ -0,0 +1,114 @@
+"""
+Keyset (cursor) pagination for clock listings.
+Pages are ordered by (clock_in, id) and resume strictly after the last
+row of the previous page, so a page costs the same at any depth.
+"""
+import base64
+from datetime import datetime
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy import tuple_
+from sqlalchemy.orm import selectinload
+from sqlmodel import Session, select
+
+from app.models import Clock, ClockPage, ClockPublic, User
+from app.projections import clock_public_dicts, clock_rows_statement
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(clock_in: datetime, clock_id: int) -> str:
+    raw = f"{clock_in.isoformat()}|{clock_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        clock_in, clock_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(clock_in), int(clock_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _page_statement(
+    statement,
+    *,
+    cursor: Optional[str],
+    limit: int,
+    start: Optional[datetime],
+    end: Optional[datetime],
+    user_id: Optional[int],
+    team_id: Optional[int],
+    user_joined: bool = False,
+):
+    if user_id is not None:
+        statement = statement.where(Clock.user_id == user_id)
+    if team_id is not None:
+        if not user_joined:
+            statement = statement.join(User, User.id == Clock.user_id)
+        statement = statement.where(User.team_id == team_id)
+    if start is not None:
+        statement = statement.where(Clock.clock_in >= start)
+    if end is not None:
+        statement = statement.where(Clock.clock_in < end)
+    if cursor:
+        statement = statement.where(tuple_(Clock.clock_in, Clock.id) > decode_cursor(cursor))
+
+    # Fetch one extra row to know whether another page exists
+    return statement.order_by(Clock.clock_in, Clock.id).limit(limit + 1)
+
+
+def _split_page(rows, limit: int):
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1].clock_in, rows[-1].id)
+
+
+def paginate_clocks(
+    session: Session,
+    *,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    user_id: Optional[int] = None,
+    team_id: Optional[int] = None,
+) -> ClockPage:
+    """
+    Return one page of clocks with clock_in in [start, end), filtered by
+    user and/or team, plus the cursor for the next page (None at the end).
+    """
+    statement = _page_statement(
+        select(Clock).options(selectinload(Clock.user)),
+        cursor=cursor, limit=limit, start=start, end=end, user_id=user_id, team_id=team_id,
+    )
+    db_clocks, next_cursor = _split_page(session.exec(statement).all(), limit)
+
+    return ClockPage(
+        items=[ClockPublic.model_validate(c) for c in db_clocks],
+        next_cursor=next_cursor,
+    )
+
+
+def paginate_clock_rows(
+    session: Session,
+    *,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    user_id: Optional[int] = None,
+    team_id: Optional[int] = None,
+) -> dict:
+    """Same page as paginate_clocks(), as a dict built from a column projection (app.projections)."""
+    statement = _page_statement(
+        clock_rows_statement(),
+        cursor=cursor, limit=limit, start=start, end=end, user_id=user_id, team_id=team_id, user_joined=True,
+    )
+    rows, next_cursor = _split_page(session.exec(statement).all(), limit)
+
+    return {"items": clock_public_dicts(rows), "next_cursor": next_cursor}
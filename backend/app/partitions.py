@@ -0,0 +1,247 @@
+"""
+Monthly range partitioning of the clocks table on clock_in (PostgreSQL).
+
+Convert an existing database once (takes an exclusive lock on clocks):
+    docker exec -it backend python -m app.partitions convert
+
+After that the scheduler creates upcoming partitions and applies the
+retention policy every night. Retention is configured with:
+    CLOCKS_PARTITIONS_AHEAD   months created in advance (default 3)
+    CLOCKS_RETENTION_MONTHS   months kept, 0 = keep everything (default 0)
+    CLOCKS_RETENTION_MODE     "detach" (keep the table) or "drop" (default detach)
+
+PostgreSQL only allows unique indexes on a partitioned table when they
+include clock_in, so the "one open shift per user" index is created on
+every partition instead of on the parent. That only guarantees one open
+shift per user per month: across partitions the invariant rests on the
+per-user advisory lock every opening path takes first
+(app.clock_ingest.lock_user_clocks).
+
+Taps outside every monthly partition land in clocks_default. When the
+partition for their month is created later (far-future terminal clock,
+scheduler down for more than CLOCKS_PARTITIONS_AHEAD months), those rows
+are moved out of the default partition into the new one.
+"""
+import argparse
+import os
+from datetime import date, datetime, timezone
+from typing import List, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from app.database import engine
+
+load_dotenv()
+
+PARTITIONS_AHEAD = int(os.getenv("CLOCKS_PARTITIONS_AHEAD", "3"))
+RETENTION_MONTHS = int(os.getenv("CLOCKS_RETENTION_MONTHS", "0"))
+RETENTION_MODE = os.getenv("CLOCKS_RETENTION_MODE", "detach")
+
+PARENT_TABLE = "clocks"
+DEFAULT_PARTITION = "clocks_default"
+
+
+# ==========================================
+# NAMING / BOUNDS
+# ==========================================
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def add_months(month: date, count: int) -> date:
+    index = month.year * 12 + (month.month - 1) + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"clocks_y{month.year:04d}m{month.month:02d}"
+
+
+def partition_month(name: str) -> Optional[date]:
+    """Inverse of partition_name(); None for tables that are not monthly partitions."""
+    try:
+        return date(int(name[8:12]), int(name[13:15]), 1)
+    except ValueError:
+        return None
+
+
+# ==========================================
+# INTROSPECTION
+# ==========================================
+def is_partitioned(conn: Connection) -> bool:
+    if conn.dialect.name != "postgresql":
+        return False
+    return conn.execute(
+        text(
+            "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table p "
+            "JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = :name)"
+        ),
+        {"name": PARENT_TABLE},
+    ).scalar()
+
+
+def list_partitions(conn: Connection) -> List[str]:
+    return list(conn.execute(
+        text(
+            "SELECT child.relname FROM pg_inherits i "
+            "JOIN pg_class parent ON parent.oid = i.inhparent "
+            "JOIN pg_class child ON child.oid = i.inhrelid "
+            "WHERE parent.relname = :name ORDER BY child.relname"
+        ),
+        {"name": PARENT_TABLE},
+    ).scalars())
+
+
+# ==========================================
+# DDL
+# ==========================================
+def _create_open_shift_index(conn: Connection, partition: str):
+    conn.execute(text(
+        f"CREATE UNIQUE INDEX IF NOT EXISTS uq_{partition}_open_per_user "
+        f"ON {partition} (user_id) WHERE clock_out IS NULL"
+    ))
+
+
+def _table_exists(conn: Connection, name: str) -> bool:
+    return conn.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": name}).scalar()
+
+
+def create_partition(conn: Connection, month: date) -> str:
+    name = partition_name(month)
+    lower = f"'{month.isoformat()} 00:00:00+00'"
+    upper = f"'{add_months(month, 1).isoformat()} 00:00:00+00'"
+    bounds = f"FOR VALUES FROM ({lower}) TO ({upper})"
+
+    if not _table_exists(conn, name):
+        if _table_exists(conn, DEFAULT_PARTITION):
+            # PostgreSQL refuses a range partition while the default partition
+            # holds rows of that range: build it standalone, move those rows
+            # in, then attach it. Inserts into the default partition wait
+            # until the transaction ends.
+            conn.execute(text(f"LOCK TABLE {DEFAULT_PARTITION} IN SHARE ROW EXCLUSIVE MODE"))
+            conn.execute(text(f"CREATE TABLE {name} (LIKE {PARENT_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+            conn.execute(text(
+                f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} "
+                f"WHERE clock_in >= {lower} AND clock_in < {upper} "
+                "RETURNING id, user_id, clock_in, clock_out) "
+                f"INSERT INTO {name} (id, user_id, clock_in, clock_out) "
+                "SELECT id, user_id, clock_in, clock_out FROM moved"
+            ))
+            conn.execute(text(f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {name} {bounds}"))
+        else:
+            conn.execute(text(f"CREATE TABLE {name} PARTITION OF {PARENT_TABLE} {bounds}"))
+    _create_open_shift_index(conn, name)
+    return name
+
+
+def ensure_future_partitions(conn: Connection, months_ahead: int = PARTITIONS_AHEAD,
+                             today: Optional[date] = None) -> List[str]:
+    """Create the current month's partition and the next `months_ahead` ones."""
+    current = month_start(today or datetime.now(timezone.utc).date())
+    return [create_partition(conn, add_months(current, i)) for i in range(months_ahead + 1)]
+
+
+def apply_retention(conn: Connection, retention_months: int = RETENTION_MONTHS,
+                    mode: str = RETENTION_MODE, today: Optional[date] = None) -> List[str]:
+    """
+    Detach (or drop) monthly partitions entirely older than the retention
+    window. Returns the affected partition names.
+    """
+    if retention_months <= 0:
+        return []
+
+    cutoff = add_months(month_start(today or datetime.now(timezone.utc).date()), -retention_months)
+    expired = [
+        name for name in list_partitions(conn)
+        if (month := partition_month(name)) is not None and month < cutoff
+    ]
+    for name in expired:
+        conn.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}"))
+        if mode == "drop":
+            conn.execute(text(f"DROP TABLE {name}"))
+    return expired
+
+
+def maintain_partitions() -> dict:
+    """Nightly job: create upcoming partitions, then apply retention."""
+    with engine.begin() as conn:
+        if not is_partitioned(conn):
+            return {"partitioned": False}
+        created = ensure_future_partitions(conn)
+        expired = apply_retention(conn)
+    return {"partitioned": True, "ensured": created, "expired": expired}
+
+
+def convert_to_partitioned(conn: Connection):
+    """
+    One-off migration of a plain clocks table into a partitioned one.
+    Rows are copied into monthly partitions covering the existing history.
+    """
+    if is_partitioned(conn):
+        print("[Partitions] clocks is already partitioned")
+        return
+
+    conn.execute(text(f"LOCK TABLE {PARENT_TABLE} IN ACCESS EXCLUSIVE MODE"))
+    oldest = conn.execute(text(f"SELECT min(clock_in) FROM {PARENT_TABLE}")).scalar()
+
+    conn.execute(text("ALTER SEQUENCE clocks_id_seq OWNED BY NONE"))
+    conn.execute(text(f"ALTER TABLE {PARENT_TABLE} RENAME TO clocks_unpartitioned"))
+    conn.execute(text("ALTER TABLE clocks_unpartitioned RENAME CONSTRAINT clocks_pkey TO clocks_unpartitioned_pkey"))
+    for index in ("ix_clocks_clock_in_id", "ix_clocks_user_id_clock_in_id", "uq_clocks_open_per_user"):
+        conn.execute(text(f"DROP INDEX IF EXISTS {index}"))
+
+    # The primary key must include the partition key
+    conn.execute(text(
+        f"CREATE TABLE {PARENT_TABLE} ("
+        "id INTEGER NOT NULL DEFAULT nextval('clocks_id_seq'), "
+        "user_id INTEGER NOT NULL REFERENCES users (id), "
+        "clock_in TIMESTAMP WITH TIME ZONE NOT NULL, "
+        "clock_out TIMESTAMP WITH TIME ZONE, "
+        "PRIMARY KEY (id, clock_in)"
+        ") PARTITION BY RANGE (clock_in)"
+    ))
+    conn.execute(text(f"ALTER SEQUENCE clocks_id_seq OWNED BY {PARENT_TABLE}.id"))
+
+    today = datetime.now(timezone.utc).date()
+    month = month_start(oldest.date()) if oldest else month_start(today)
+    while month <= month_start(today):
+        create_partition(conn, month)
+        month = add_months(month, 1)
+    ensure_future_partitions(conn, today=today)
+
+    # Catch-all for out-of-range replays (very old or far-future taps)
+    conn.execute(text(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {PARENT_TABLE} DEFAULT"))
+    _create_open_shift_index(conn, DEFAULT_PARTITION)
+
+    conn.execute(text(
+        f"INSERT INTO {PARENT_TABLE} (id, user_id, clock_in, clock_out) "
+        "SELECT id, user_id, clock_in, clock_out FROM clocks_unpartitioned"
+    ))
+    conn.execute(text("DROP TABLE clocks_unpartitioned"))
+
+    # Created on the parent, propagated to every partition
+    conn.execute(text(f"CREATE INDEX ix_clocks_clock_in_id ON {PARENT_TABLE} (clock_in, id)"))
+    conn.execute(text(f"CREATE INDEX ix_clocks_user_id_clock_in_id ON {PARENT_TABLE} (user_id, clock_in, id)"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage clocks table partitions.")
+    parser.add_argument("command", choices=["convert", "maintain", "list"])
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        with engine.begin() as conn:
+            convert_to_partitioned(conn)
+        print("✅ clocks is partitioned by month")
+    elif args.command == "maintain":
+        print(maintain_partitions())
+    else:
+        with engine.connect() as conn:
+            for name in list_partitions(conn):
+                print(name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+In-process index of who is clocked in right now.
+
+Maps user_id -> open shift (clock id, clock_in, team) for every open
+clock. It is warmed from the database at startup and kept current by the
+clock writers (toggle, batch ingestion, auto clock-out) and by team
+membership changes, so /clocks/active is answered in O(active users)
+from memory. Writers update it only after their transaction commits.
+"""
+import threading
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional
+
+from sqlmodel import Session, select
+
+from app.kpi_rollup import as_utc
+from app.models import Clock, User
+
+
+class OpenShift(NamedTuple):
+    user_id: int
+    clock_id: int
+    clock_in: datetime
+    team_id: Optional[int]
+
+
+class PresenceIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._open: Dict[int, OpenShift] = {}
+        self.warmed = False
+
+    def warm(self, session: Session) -> int:
+        """Replace the index with the open clocks currently in the database."""
+        rows = session.exec(
+            select(Clock.user_id, Clock.id, Clock.clock_in, User.team_id)
+            .join(User, User.id == Clock.user_id)
+            .where(Clock.clock_out.is_(None))
+        ).all()
+        snapshot = {
+            user_id: OpenShift(user_id, clock_id, as_utc(clock_in), team_id)
+            for user_id, clock_id, clock_in, team_id in rows
+        }
+        with self._lock:
+            self._open = snapshot
+            self.warmed = True
+        return len(snapshot)
+
+    def clock_in(self, user_id: int, clock_id: int, clock_in: datetime, team_id: Optional[int]):
+        with self._lock:
+            self._open[user_id] = OpenShift(user_id, clock_id, as_utc(clock_in), team_id)
+
+    def clock_out(self, user_id: int, clock_id: Optional[int] = None):
+        """Drop the user's open shift (only if it is clock_id, when given)."""
+        with self._lock:
+            current = self._open.get(user_id)
+            if current is not None and (clock_id is None or current.clock_id == clock_id):
+                del self._open[user_id]
+
+    def set_team(self, user_id: int, team_id: Optional[int]):
+        with self._lock:
+            current = self._open.get(user_id)
+            if current is not None:
+                self._open[user_id] = current._replace(team_id=team_id)
+
+    def remove(self, user_id: int):
+        self.clock_out(user_id)
+
+    def active(self, team_id: Optional[int] = None) -> List[OpenShift]:
+        with self._lock:
+            shifts = list(self._open.values())
+        if team_id is not None:
+            shifts = [s for s in shifts if s.team_id == team_id]
+        return sorted(shifts, key=lambda s: (s.clock_in, s.clock_id))
+
+    def count(self, team_id: Optional[int] = None) -> int:
+        if team_id is None:
+            return len(self._open)
+        return len(self.active(team_id))
+
+
+presence = PresenceIndex()
@@ -0,0 +1,115 @@
+"""
+Column projections for the large list endpoints.
+
+read_users, read_clocks and read_user_clocks select only the columns
+their response schema needs and turn the row tuples straight into
+dicts: no ORM objects (identity map, relationship loads) and no
+Pydantic validation per row. The routes return them in a
+FastJSONResponse, which skips FastAPI's response_model validation and
+encodes the datetimes itself; the body is the same as UserPublic /
+ClockPublic would produce.
+"""
+from typing import Iterable, List
+
+from sqlalchemy.orm import aliased
+from sqlmodel import select
+
+from app.models import Clock, Team, User
+
+ManagedTeam = aliased(Team)
+
+CLOCK_PUBLIC_COLUMNS = (
+    Clock.id,
+    Clock.user_id,
+    Clock.clock_in,
+    Clock.clock_out,
+    User.first_name,
+    User.last_name,
+    User.email,
+    User.phone_number,
+    User.realm_roles,
+)
+
+USER_PUBLIC_COLUMNS = (
+    User.id,
+    User.email,
+    User.first_name,
+    User.last_name,
+    User.phone_number,
+    User.created_at,
+    User.keycloak_id,
+    User.realm_roles,
+    User.team_id,
+    Team.name.label("team_name"),
+    ManagedTeam.id.label("managed_team_id"),
+    ManagedTeam.name.label("managed_team_name"),
+)
+
+
+# ==========================================
+# CLOCKS
+# ==========================================
+def clock_rows_statement():
+    """Clocks with their user's UserMinimal columns; filter and order like paginate_clocks()."""
+    return select(*CLOCK_PUBLIC_COLUMNS).join(User, User.id == Clock.user_id)
+
+
+def clock_public_dicts(rows: Iterable) -> List[dict]:
+    return [
+        {
+            "id": clock_id,
+            "user_id": user_id,
+            "clock_in": clock_in,
+            "clock_out": clock_out,
+            "user": {
+                "id": user_id,
+                "first_name": first_name,
+                "last_name": last_name,
+                "email": email,
+                "phone_number": phone_number,
+                "realm_roles": realm_roles,
+            },
+        }
+        for clock_id, user_id, clock_in, clock_out, first_name, last_name, email, phone_number, realm_roles in rows
+    ]
+
+
+# ==========================================
+# USERS
+# ==========================================
+def users_statement():
+    """Every user with their team and managed team names, ordered by id."""
+    return (
+        select(*USER_PUBLIC_COLUMNS)
+        .outerjoin(Team, Team.id == User.team_id)
+        .outerjoin(ManagedTeam, ManagedTeam.manager_id == User.id)
+        .order_by(User.id, ManagedTeam.id)
+    )
+
+
+def user_public_dicts(rows: Iterable) -> List[dict]:
+    users = []
+    last_id = None
+    for (user_id, email, first_name, last_name, phone_number, created_at, keycloak_id, realm_roles,
+         team_id, team_name, managed_team_id, managed_team_name) in rows:
+        # A manager of several teams comes back once per team: keep the first
+        if user_id == last_id:
+            continue
+        last_id = user_id
+        users.append({
+            "id": user_id,
+            "email": email,
+            "first_name": first_name,
+            "last_name": last_name,
+            "phone_number": phone_number,
+            "created_at": created_at,
+            "keycloak_id": keycloak_id,
+            "realm_roles": realm_roles,
+            "team_id": team_id,
+            "team": {"id": team_id, "name": team_name} if team_id is not None else None,
+            "managed_team": (
+                {"id": managed_team_id, "name": managed_team_name} if managed_team_id is not None else None
+            ),
+            "temp_password": None,
+        })
+    return users
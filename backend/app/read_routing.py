@@ -0,0 +1,164 @@
+"""
+Read/write session routing.
+
+Read-only routes depend on get_read_session instead of get_async_session.
+It hands out a session on the streaming replica (replica_engine) unless:
+
+- no replica is configured (POSTGRES_REPLICA_HOST unset),
+- the replica is down, or lags more than REPLICA_MAX_LAG_SECONDS
+  behind the primary (checked by the scheduler every
+  REPLICA_CHECK_INTERVAL_SECONDS; a failed connection also marks it
+  down for REPLICA_RETRY_SECONDS),
+- the request is about a user or team written in the last
+  READ_YOUR_WRITES_SECONDS (user_id / team_id in the path or query
+  string): routes that write record it with replica_router.note_writes,
+  so a badge tap, a first login, a profile edit or a member change is
+  seen by the GET that follows it.
+
+In every other case the session falls back to the primary. Reads with
+no user or team in the request (the full lists) are only covered by the
+lag bound.
+"""
+import asyncio
+import os
+import threading
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+from dotenv import load_dotenv
+from fastapi import Request
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.database import async_engine, replica_engine
+
+load_dotenv()
+
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+REPLICA_CHECK_INTERVAL_SECONDS = int(os.getenv("REPLICA_CHECK_INTERVAL_SECONDS", "5"))
+REPLICA_RETRY_SECONDS = float(os.getenv("REPLICA_RETRY_SECONDS", "30"))
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "10"))
+
+# Seconds of WAL not yet replayed; 0 when the replica has caught up
+REPLICA_LAG_SQL = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+class ReplicaRouter:
+    """
+    Decides per request whether the replica can serve it. State is per
+    worker process: the read-your-writes window covers writes handled
+    by this worker, older writes are covered by the lag bound.
+    """
+
+    def __init__(self, primary, replica=None, max_lag: float = REPLICA_MAX_LAG_SECONDS,
+                 read_your_writes: float = READ_YOUR_WRITES_SECONDS, retry_after: float = REPLICA_RETRY_SECONDS):
+        self.primary = primary
+        self.replica = replica
+        self.max_lag = max_lag
+        self.read_your_writes = read_your_writes
+        self.retry_after = retry_after
+        self.lag: Optional[float] = None
+        self._down_until = 0.0
+        self._recent_writes: Dict[Tuple[str, int], float] = {}
+        self._lock = threading.Lock()
+        self.replica_reads = 0
+        self.primary_reads = 0
+
+    # --- state ---
+    def note_writes(self, user_ids: Iterable[Optional[int]] = (), team_ids: Iterable[Optional[int]] = ()):
+        """Pin reads about these users / teams to the primary for the read-your-writes window."""
+        until = time.monotonic() + self.read_your_writes
+        keys = [("user", i) for i in user_ids if i is not None] + [("team", i) for i in team_ids if i is not None]
+        with self._lock:
+            for key in keys:
+                self._recent_writes[key] = until
+
+    def mark_down(self, reason):
+        self._down_until = time.monotonic() + self.retry_after
+        print(f"[DB] Replica unavailable, reads go to the primary for {self.retry_after:.0f}s: {reason}")
+
+    def replica_usable(self) -> bool:
+        if self.replica is None or time.monotonic() < self._down_until:
+            return False
+        return self.lag is None or self.lag <= self.max_lag
+
+    def engine_for(self, user_id: Optional[int] = None, team_id: Optional[int] = None):
+        if (
+            self.replica_usable()
+            and not self._recently_wrote(("user", user_id))
+            and not self._recently_wrote(("team", team_id))
+        ):
+            return self.replica
+        return self.primary
+
+    def _recently_wrote(self, key: Tuple[str, Optional[int]]) -> bool:
+        if key[1] is None:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            until = self._recent_writes.get(key)
+            if until is not None and until <= now:
+                del self._recent_writes[key]
+                return False
+        return until is not None
+
+    # --- health ---
+    async def check(self) -> Optional[float]:
+        """Measure replication lag (scheduler job). Marks the replica down if unreachable."""
+        if self.replica is None:
+            return None
+        try:
+            async with self.replica.connect() as conn:
+                self.lag = float((await conn.execute(REPLICA_LAG_SQL)).scalar() or 0)
+        except (DBAPIError, OSError, asyncio.TimeoutError) as e:
+            self.mark_down(e)
+            return None
+        self._down_until = 0.0
+        if self.lag > self.max_lag:
+            print(f"[DB] Replica lags {self.lag:.1f}s behind the primary, reads go to the primary")
+        return self.lag
+
+    def stats(self) -> dict:
+        return {
+            "configured": self.replica is not None,
+            "usable": self.replica_usable(),
+            "lag_seconds": self.lag,
+            "replica_reads": self.replica_reads,
+            "primary_reads": self.primary_reads,
+        }
+
+
+replica_router = ReplicaRouter(async_engine, replica_engine)
+
+
+def _request_id(request: Request, name: str) -> Optional[int]:
+    value = request.path_params.get(name) or request.query_params.get(name)
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+async def get_read_session(request: Request):
+    """AsyncSession for read-only routes: replica when safe, primary otherwise."""
+    engine = replica_router.engine_for(_request_id(request, "user_id"), _request_id(request, "team_id"))
+    if engine is not replica_router.primary:
+        session = AsyncSession(engine, expire_on_commit=False)
+        try:
+            await session.connection()
+        except (DBAPIError, OSError, asyncio.TimeoutError) as e:
+            await session.close()
+            replica_router.mark_down(e)
+        else:
+            replica_router.replica_reads += 1
+            async with session:
+                yield session
+            return
+
+    replica_router.primary_reads += 1
+    async with AsyncSession(replica_router.primary, expire_on_commit=False) as session:
+        yield session
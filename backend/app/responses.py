@@ -0,0 +1,24 @@
+"""
+App-wide JSON response class (orjson).
+
+FastAPI(default_response_class=FastJSONResponse) renders every JSON
+response with orjson instead of stdlib json. Routes returning a
+response themselves (the projections in app.projections) use it too.
+
+Datetimes are written the way Pydantic writes them, so the bytes do not
+depend on which path built the payload:
+    aware UTC       2026-03-02T08:00:00Z
+    other offsets   2026-03-02T10:00:00+02:00
+    naive           2026-03-02T08:00:00 (no offset added)
+"""
+from typing import Any
+
+import orjson
+from fastapi.responses import ORJSONResponse
+
+ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+class FastJSONResponse(ORJSONResponse):
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=ORJSON_OPTIONS)
@@ -1,61 +1,227 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from datetime import datetime, timezone
-from app.database import get_session
-from app.models import User, Clock, ClockCreate, ClockPublic
+from typing import Literal, Optional
+from app.database import get_session, get_async_session
+from app.read_routing import get_read_session, replica_router
+from app.models import (
+    User, UserMinimal, Clock, ClockCreate, ClockPublic, ClockPage, ClockBatch, ClockBatchResult,
+    ActiveClock,
+)
+from app.pagination import paginate_clock_rows, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.exports import export_statement, iter_export_rows, stream_csv, stream_ndjson
+from app.kpi_rollup import record_clock_in, record_clock_out
+from app.clock_ingest import ingest_clock_events, lock_user_clocks, MAX_BATCH_EVENTS
+from app.presence import presence
+from app.responses import FastJSONResponse
 
 router = APIRouter(prefix="/clocks", tags=["clocks"])
 
+# ClockPublic reads clock.user, which AsyncSession cannot lazy load
+CLOCK_PUBLIC_LOAD = (selectinload(Clock.user),)
+
+
+def _clock_public(row, user: UserMinimal) -> ClockPublic:
+    return ClockPublic(
+        id=row.id,
+        user_id=row.user_id,
+        clock_in=row.clock_in,
+        clock_out=row.clock_out,
+        user=user,
+    )
+
 
 @router.post("/", response_model=ClockPublic)
 async def create_clock(
     clock: ClockCreate,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ) -> ClockPublic:
+    """
+    Toggle the user's shift. One lookup returns the user and their open
+    clock, then a single guarded statement closes or opens the shift.
+    The partial unique index uq_clocks_open_per_user guarantees at most
+    one open clock per user; a concurrent duplicate tap resolves to the
+    shift the other request wrote. On PostgreSQL the per-user advisory
+    lock also covers partitioned clocks, where that index is per month.
+    """
+    now = datetime.now(timezone.utc)
+    returning = (Clock.id, Clock.user_id, Clock.clock_in, Clock.clock_out)
+
+    await session.run_sync(lock_user_clocks, [clock.user_id])
 
-    db_user = session.get(User, clock.user_id)
-    if not db_user:
+    db_row = (await session.exec(
+        select(
+            User.id, User.first_name, User.last_name, User.email,
+            User.phone_number, User.realm_roles, User.team_id,
+            Clock.id.label("open_clock_id"),
+        )
+        .outerjoin(Clock, and_(Clock.user_id == User.id, Clock.clock_out.is_(None)))
+        .where(User.id == clock.user_id)
+    )).first()
+    if not db_row:
         raise HTTPException(status_code=404, detail="User not found")
 
-    # Check active clock
-    statement = select(Clock).where(
-        Clock.user_id == clock.user_id,
-        Clock.clock_out == None  # noqa: E711
+    user = UserMinimal(
+        id=db_row.id,
+        first_name=db_row.first_name,
+        last_name=db_row.last_name,
+        email=db_row.email,
+        phone_number=db_row.phone_number,
+        realm_roles=db_row.realm_roles,
     )
-    db_clock = session.exec(statement).first()
 
     # Close active clock if exists
-    if db_clock:
-        db_clock.clock_out = datetime.now(timezone.utc)
-        session.add(db_clock)
-        session.commit()
-        session.refresh(db_clock)
-        return ClockPublic.model_validate(db_clock)
-
-    # Create new clock
-    new_clock = Clock(**clock.model_dump())
-    session.add(new_clock)
-    session.commit()
-    session.refresh(new_clock)
-    return ClockPublic.model_validate(new_clock)
-
-
-@router.get("/", response_model=list[ClockPublic])
+    if db_row.open_clock_id is not None:
+        closed = (await session.exec(
+            update(Clock)
+            .where(Clock.id == db_row.open_clock_id, Clock.clock_out.is_(None))
+            .values(clock_out=now)
+            .returning(*returning)
+        )).first()
+        if closed is None:
+            # Closed by a concurrent tap in the meantime
+            await session.rollback()
+            return ClockPublic.model_validate(
+                await session.get(Clock, db_row.open_clock_id, options=CLOCK_PUBLIC_LOAD)
+            )
+
+        await session.run_sync(
+            record_clock_out, closed.user_id, db_row.team_id, closed.clock_in, closed.clock_out
+        )
+        await session.commit()
+        presence.clock_out(closed.user_id, closed.id)
+        replica_router.note_writes([closed.user_id])
+        return _clock_public(closed, user)
+
+    # Create new clock (no ON CONFLICT: the open-shift unique index lives
+    # on each partition once clocks is partitioned, so it can't be targeted.
+    # Nothing else is written before the insert, so a failure rolls back
+    # the whole transaction instead of a savepoint.)
+    try:
+        opened = (await session.exec(
+            insert(Clock)
+            .values(user_id=clock.user_id, clock_in=now)
+            .returning(*returning)
+        )).one()
+    except IntegrityError:
+        await session.rollback()
+        # Opened by a concurrent tap in the meantime...
+        open_clock = (await session.exec(
+            select(Clock)
+            .where(Clock.user_id == clock.user_id, Clock.clock_out.is_(None))
+            .options(*CLOCK_PUBLIC_LOAD)
+        )).first()
+        if open_clock is not None:
+            return ClockPublic.model_validate(open_clock)
+        # ...or not a duplicate open: the user was deleted since the lookup
+        # (foreign key), or the concurrent shift is already closed again
+        if await session.get(User, clock.user_id) is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        raise HTTPException(status_code=409, detail="Clock changed by a concurrent request, retry")
+
+    await session.run_sync(record_clock_in, opened.user_id, db_row.team_id, opened.clock_in)
+    await session.commit()
+    presence.clock_in(opened.user_id, opened.id, opened.clock_in, db_row.team_id)
+    replica_router.note_writes([opened.user_id])
+    return _clock_public(opened, user)
+
+
+@router.post("/batch", response_model=ClockBatchResult)
+async def create_clocks_batch(
+    batch: ClockBatch,
+    session: AsyncSession = Depends(get_async_session)
+) -> ClockBatchResult:
+    """
+    Replay buffered badge taps (offline terminals) in one transaction.
+    Returns one result per event, in request order.
+    """
+    if len(batch.events) > MAX_BATCH_EVENTS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_EVENTS} events per batch")
+
+    try:
+        result = await session.run_sync(ingest_clock_events, batch.events)
+    except IntegrityError:
+        await session.rollback()
+        raise HTTPException(status_code=409, detail="Batch conflicts with a concurrent clock change, retry")
+
+    replica_router.note_writes({r.user_id for r in result.results if r.status in ("opened", "closed")})
+    return result
+
+
+@router.get("/", response_model=ClockPage)
 async def read_clocks(
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    user_id: Optional[int] = None,
+    team_id: Optional[int] = None,
+    session: AsyncSession = Depends(get_read_session)
+) -> ClockPage:
+
+    # Column projection, returned as is: no ORM objects or response_model validation
+    return FastJSONResponse(await session.run_sync(
+        paginate_clock_rows,
+        cursor=cursor,
+        limit=limit,
+        start=start,
+        end=end,
+        user_id=user_id,
+        team_id=team_id,
+    ))
+
+
+@router.get("/active", response_model=list[ActiveClock])
+async def read_active_clocks(
+    team_id: Optional[int] = None,
+    session: AsyncSession = Depends(get_read_session)
+) -> list[ActiveClock]:
+    """Users clocked in right now, oldest shift first (served from memory)."""
+    if not presence.warmed:
+        await session.run_sync(presence.warm)
+
+    return [ActiveClock(**shift._asdict()) for shift in presence.active(team_id)]
+
+
+@router.get("/export")
+def export_clocks(
+    export_format: Literal["csv", "ndjson"] = Query("csv", alias="format"),
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    team_id: Optional[int] = None,
     session: Session = Depends(get_session)
-) -> list[ClockPublic]:
+) -> StreamingResponse:
+    # Stays on the sync engine: rows are streamed from a server-side
+    # cursor while the threadpool iterates the response generator
+
+    statement = export_statement(start=start, end=end, team_id=team_id)
+    rows = iter_export_rows(session.get_bind(), statement)
+    timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%d")
 
-    db_clocks = session.exec(select(Clock)).all()
-    return [ClockPublic.model_validate(c) for c in db_clocks]
+    if export_format == "ndjson":
+        body, media_type = stream_ndjson(rows), "application/x-ndjson"
+    else:
+        body, media_type = stream_csv(rows), "text/csv; charset=utf-8"
+
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="clocks_export_{timestamp}.{export_format}"'},
+    )
 
 
 @router.get("/{clock_id}", response_model=ClockPublic)
 async def read_clock(
     clock_id: int,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_read_session)
 ) -> ClockPublic:
 
-    db_clock = session.get(Clock, clock_id)
+    db_clock = await session.get(Clock, clock_id, options=CLOCK_PUBLIC_LOAD)
     if not db_clock:
         raise HTTPException(status_code=404, detail="Clock not found")
 
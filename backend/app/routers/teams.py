@@ -1,49 +1,63 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select
-from app.database import get_session
+from sqlalchemy.orm import joinedload, selectinload
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.database import get_async_session
+from app.read_routing import get_read_session, replica_router
 from app.models import User, Team, TeamCreate, TeamUpdate, TeamPublic
+from app.presence import presence
 
 router = APIRouter(prefix="/teams", tags=["teams"])
 
+# TeamPublic reads manager and members, which AsyncSession cannot lazy load.
+# Manager is joined into the team query, members come from one extra
+# IN query for all loaded teams: two queries whatever the team count.
+TEAM_PUBLIC_LOAD = (joinedload(Team.manager), selectinload(Team.members))
+
+
+async def _get_team(session: AsyncSession, team_id: int, reload: bool = False):
+    return await session.get(Team, team_id, options=TEAM_PUBLIC_LOAD, populate_existing=reload)
+
 
 # Create Team
 @router.post("/", response_model=TeamPublic)
 async def create_team(
     team: TeamCreate,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ) -> TeamPublic:
 
     if team.manager_id:
-        db_user = session.get(User, team.manager_id)
+        db_user = await session.get(User, team.manager_id)
         if not db_user:
             raise HTTPException(status_code=404, detail="User not found")
 
-    existing_team = session.exec(
+    existing_team = (await session.exec(
         select(Team).where(Team.name == team.name)
-    ).first()
+    )).first()
 
     if existing_team:
         raise HTTPException(status_code=409, detail="Team already exists")
 
     db_team = Team(**team.model_dump())
     session.add(db_team)
-    session.commit()
-    session.refresh(db_team)
+    await session.commit()
+    replica_router.note_writes([db_team.manager_id], [db_team.id])
+    db_team = await _get_team(session, db_team.id, reload=True)
 
     return TeamPublic.model_validate(db_team)
 
 
 # Read All Teams
 @router.get("/", response_model=list[TeamPublic])
-async def read_teams(session: Session = Depends(get_session)) -> list[TeamPublic]:
-    db_teams = session.exec(select(Team)).all()
+async def read_teams(session: AsyncSession = Depends(get_read_session)) -> list[TeamPublic]:
+    db_teams = (await session.exec(select(Team).options(*TEAM_PUBLIC_LOAD))).all()
     return [TeamPublic.model_validate(t) for t in db_teams]
 
 
 # Read Team by ID
 @router.get("/{team_id}", response_model=TeamPublic)
-async def read_team(team_id: int, session: Session = Depends(get_session)) -> TeamPublic:
-    db_team = session.get(Team, team_id)
+async def read_team(team_id: int, session: AsyncSession = Depends(get_read_session)) -> TeamPublic:
+    db_team = await _get_team(session, team_id)
     if not db_team:
         raise HTTPException(status_code=404, detail="Team not found")
     return TeamPublic.model_validate(db_team)
@@ -54,19 +68,22 @@ async def read_team(team_id: int, session: Session = Depends(get_session)) -> Te
 async def update_team(
     team_id: int,
     team: TeamUpdate,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ) -> TeamPublic:
 
-    db_team = session.get(Team, team_id)
+    db_team = await _get_team(session, team_id)
     if not db_team:
         raise HTTPException(status_code=404, detail="Team not found")
 
     team_data = team.model_dump(exclude_unset=True)
+    # Users embed their managed team: the previous and the new manager
+    manager_ids = [db_team.manager_id, team_data.get("manager_id")]
     db_team.sqlmodel_update(team_data)
 
     session.add(db_team)
-    session.commit()
-    session.refresh(db_team)
+    await session.commit()
+    replica_router.note_writes(manager_ids, [team_id])
+    db_team = await _get_team(session, team_id, reload=True)
 
     return TeamPublic.model_validate(db_team)
 
@@ -76,21 +93,25 @@ async def update_team(
 async def create_team_member(
     team_id: int,
     user_id: int,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ) -> TeamPublic:
 
-    db_team = session.get(Team, team_id)
+    db_team = await _get_team(session, team_id)
     if not db_team:
         raise HTTPException(status_code=404, detail=f"[{team_id}] Team not found")
 
-    db_user = session.get(User, user_id)
+    db_user = await session.get(User, user_id)
     if not db_user:
         raise HTTPException(status_code=404, detail=f"[{user_id}] User not found")
 
-    db_user.team_id = team_id
-    session.add(db_user)
-    session.commit()
-    session.refresh(db_team)
+    # Through the loaded collection: sets team_id on flush and keeps
+    # db_team.members current without reloading the team
+    previous_team_id = db_user.team_id
+    if db_user not in db_team.members:
+        db_team.members.append(db_user)
+    await session.commit()
+    presence.set_team(user_id, team_id)
+    replica_router.note_writes([user_id], [team_id, previous_team_id])
 
     return TeamPublic.model_validate(db_team)
 
@@ -100,33 +121,34 @@ async def create_team_member(
 async def delete_team_member(
     team_id: int,
     user_id: int,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ) -> TeamPublic:
 
-    db_team = session.get(Team, team_id)
+    db_team = await _get_team(session, team_id)
     if not db_team:
         raise HTTPException(status_code=404, detail=f"[{team_id}] Team not found")
 
-    db_user = session.get(User, user_id)
+    db_user = await session.get(User, user_id)
     if not db_user or db_user.team_id != team_id:
         raise HTTPException(status_code=404, detail=f"[{user_id}] User not in this team")
 
-    db_user.team_id = None
-    session.add(db_user)
-    session.commit()
-    session.refresh(db_team)
+    db_team.members.remove(db_user)
+    await session.commit()
+    presence.set_team(user_id, None)
+    replica_router.note_writes([user_id], [team_id])
 
     return TeamPublic.model_validate(db_team)
 
 
 # Delete Team
 @router.delete("/{team_id}", response_model=TeamPublic)
-async def delete_team(team_id: int, session: Session = Depends(get_session)) -> TeamPublic:
-    db_team = session.get(Team, team_id)
+async def delete_team(team_id: int, session: AsyncSession = Depends(get_async_session)) -> TeamPublic:
+    db_team = await _get_team(session, team_id)
     if not db_team:
         raise HTTPException(status_code=404, detail="Team not found")
 
     # Unassign all members from this team first
+    member_ids = [member.id for member in db_team.members]
     for member in db_team.members:
         member.team_id = None
         session.add(member)
@@ -134,7 +156,10 @@ async def delete_team(team_id: int, session: Session = Depends(get_session)) ->
     # Create response before deletion (while object is still valid)
     response = TeamPublic.model_validate(db_team)
 
-    session.delete(db_team)
-    session.commit()
+    await session.delete(db_team)
+    await session.commit()
+    for member_id in member_ids:
+        presence.set_team(member_id, None)
+    replica_router.note_writes([*member_ids, response.manager_id], [team_id])
 
     return response
@@ -1,11 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlmodel import Session, select
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlalchemy.orm import selectinload
-from app.database import get_session
+from app.database import get_async_session
+from app.read_routing import get_read_session, replica_router
 from app.auth import get_current_user
 from app.models import (
-    User, UserMinimal, TeamMinimal, TeamBasic, UserCreate, UserPublic, UserUpdate,
-    Clock, ClockPublic, UserMe, PasswordChange, PasswordReset
+    User, Team, UserMinimal, TeamMinimal, UserCreate, UserPublic, UserUpdate,
+    ClockPage, UserMe, PasswordChange, PasswordReset, UserImportResult
+)
+from app.pagination import paginate_clock_rows, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.projections import user_public_dicts, users_statement
+from app.responses import FastJSONResponse
+from app.presence import presence
+from app.user_provisioning import (
+    import_users,
+    parse_csv_rows,
+    generate_temp_password,
+    keycloak_username,
+    MAX_IMPORT_ROWS,
 )
 from app.keycloak_admin import (
     create_keycloak_user,
@@ -13,23 +26,29 @@ from app.keycloak_admin import (
     change_keycloak_user_password,
     verify_user_password,
 )
-import secrets
-import string
+import csv
+import json
 from datetime import datetime
+from typing import Optional
 
 router = APIRouter(prefix="/users", tags=["users"])
 
+# UserPublic reads team and managed_team, which AsyncSession cannot lazy load
+USER_PUBLIC_LOAD = (selectinload(User.team), selectinload(User.managed_team))
+
 @router.get("/me", response_model=UserMe)
-def get_me(
+async def get_me(
     user: User = Depends(get_current_user),
-    session: Session = Depends(get_session)
+    # Primary, not get_read_session: get_current_user may have just created the user
+    session: AsyncSession = Depends(get_async_session)
 ):
     # Fetch the full user with team relationship from DB
-    db_user = session.get(User, user.id)
+    db_user = await session.get(User, user.id, options=[selectinload(User.team).selectinload(Team.manager)])
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    roles = [r.lower() for r in db_user.realm_roles]
+    # Token roles: the stored copy is synced write-behind (app.identity_sync)
+    roles = [r.lower() for r in user.realm_roles]
 
     if "organization" in roles:
         role = "organization"
@@ -72,7 +91,7 @@ def get_me(
 async def create_user(
     user: UserCreate,
     current_user: UserPublic = Depends(get_current_user),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ) -> UserPublic:
     # Check if user has permission to create users (only organization role)
     user_roles = [r.lower() for r in current_user.realm_roles]
@@ -82,44 +101,24 @@ async def create_user(
             detail="Only organization admins can create users"
         )
 
-    existing_user = session.exec(
+    existing_user = (await session.exec(
         select(User).where(
             (User.email == user.email) |
             (User.phone_number == user.phone_number)
         )
-    ).first()
+    )).first()
 
     if existing_user:
         raise HTTPException(status_code=409, detail="User already exists")
 
-    # Generate a temporary password if not provided
-    # Format: Bank{year}{special_char}{5_random_chars}
-    # Use secrets for cryptographically secure random generation
-    special_chars = '@#$%&'
-    year = datetime.now().year
-    
-    # Create alphabet without ambiguous characters (i, I, l, L, o, O, 0, 1)
-    alphabet = (
-        string.ascii_letters.replace('i', '').replace('I', '').replace('l', '').replace('L', '').replace('o', '').replace('O', '') +
-        string.digits.replace('0', '').replace('1', '')
-    )
-    
-    # Generate 5 random characters using secrets (cryptographically secure)
-    random_chars = ''.join(secrets.choice(alphabet) for _ in range(5))
-    
-    # Generate random special character
-    random_special = secrets.choice(special_chars)
-    
-    temp_password = f"Bank{year}{random_special}{random_chars}"
+    # Generate a temporary password
+    temp_password = generate_temp_password()
 
     # Create user in Keycloak first
     try:
-        # Use email as username if keycloak_id is not provided or is a placeholder
-        username = user.email.split('@')[0] if not user.keycloak_id or user.keycloak_id.startswith('manual-') else user.keycloak_id
-        
-        keycloak_id = create_keycloak_user(
+        keycloak_id = await create_keycloak_user(
             email=user.email,
-            username=username,
+            username=keycloak_username(user),
             password=temp_password,
             first_name=user.first_name,
             last_name=user.last_name,
@@ -136,8 +135,9 @@ async def create_user(
     user_data["keycloak_id"] = keycloak_id
     db_user = User(**user_data)
     session.add(db_user)
-    session.commit()
-    session.refresh(db_user)
+    await session.commit()
+    await session.refresh(db_user, ["team", "managed_team"])
+    replica_router.note_writes([db_user.id])
 
     # Return user with temporary password
     user_public = UserPublic.model_validate(db_user)
@@ -145,43 +145,64 @@ async def create_user(
     return user_public
 
 
-# Read all users
-@router.get("/", response_model=list[UserPublic])
-async def read_users(session: Session = Depends(get_session)) -> list[UserPublic]:
-    statement = select(User).options(
-        selectinload(User.team),
-        selectinload(User.managed_team)
-    )
-    db_users = session.exec(statement).all()
-    
-    result = []
-    for u in db_users:
-        user_data = UserPublic(
-            id=u.id,
-            email=u.email,
-            first_name=u.first_name,
-            last_name=u.last_name,
-            phone_number=u.phone_number,
-            created_at=u.created_at,
-            keycloak_id=u.keycloak_id,
-            realm_roles=u.realm_roles,
-            team_id=u.team_id,
-            team=TeamBasic(id=u.team.id, name=u.team.name) if u.team else None,
-            managed_team=TeamBasic(id=u.managed_team.id, name=u.managed_team.name) if u.managed_team else None
+# Bulk import users (only for organization role)
+@router.post("/bulk", response_model=UserImportResult)
+async def create_users_bulk(
+    request: Request,
+    current_user: UserPublic = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session)
+) -> UserImportResult:
+    """
+    Import many users at once. Body is either JSON (a list of UserCreate
+    objects, or {"users": [...]}) or CSV (Content-Type: text/csv) with a
+    header row: first_name,last_name,email,phone_number,realm_roles
+    (roles separated by ';'). Returns one result per row, in order,
+    with the generated temporary passwords.
+    """
+    user_roles = [r.lower() for r in current_user.realm_roles]
+    if "organization" not in user_roles:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only organization admins can create users"
         )
-        result.append(user_data)
-    
+
+    body = await request.body()
+    try:
+        if request.headers.get("content-type", "").startswith("text/csv"):
+            rows = parse_csv_rows(body.decode("utf-8-sig"))
+        else:
+            rows = json.loads(body)
+            if isinstance(rows, dict):
+                rows = rows.get("users")
+    except (UnicodeDecodeError, ValueError, csv.Error):
+        raise HTTPException(status_code=400, detail="Body must be a JSON list of users or a CSV file")
+    if not isinstance(rows, list):
+        raise HTTPException(status_code=400, detail="Body must be a JSON list of users or a CSV file")
+
+    if len(rows) > MAX_IMPORT_ROWS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_IMPORT_ROWS} users per import")
+
+    result = await import_users(session, rows)
+    replica_router.note_writes(r.user_id for r in result.results if r.status == "created")
     return result
 
 
+# Read all users
+@router.get("/", response_model=list[UserPublic])
+async def read_users(session: AsyncSession = Depends(get_read_session)) -> list[UserPublic]:
+    # Column projection, returned as is: no ORM objects or response_model validation
+    rows = (await session.exec(users_statement())).all()
+    return FastJSONResponse(user_public_dicts(rows))
+
+
 # Read single user
 @router.get("/{user_id}", response_model=UserPublic)
 async def read_user(
     user_id: int,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_read_session)
 ) -> UserPublic:
 
-    db_user = session.get(User, user_id)
+    db_user = await session.get(User, user_id, options=USER_PUBLIC_LOAD)
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
 
@@ -193,10 +214,10 @@ async def read_user(
 async def update_user(
     user_id: int,
     user: UserUpdate,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ) -> UserPublic:
 
-    db_user = session.get(User, user_id)
+    db_user = await session.get(User, user_id, options=USER_PUBLIC_LOAD)
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
 
@@ -204,23 +225,35 @@ async def update_user(
     db_user.sqlmodel_update(user_data)
 
     session.add(db_user)
-    session.commit()
-    session.refresh(db_user)
+    await session.commit()  # expire_on_commit=False: team / managed_team stay loaded
+    # Teams embed their manager and members: pin those reads too
+    replica_router.note_writes(
+        [user_id], [db_user.team_id, db_user.managed_team.id if db_user.managed_team else None]
+    )
 
     return UserPublic.model_validate(db_user)
 
 
 # Read user's clocks
-@router.get("/{user_id}/clocks/", response_model=list[ClockPublic])
+@router.get("/{user_id}/clocks/", response_model=ClockPage)
 async def read_user_clocks(
     user_id: int,
-    session: Session = Depends(get_session)
-) -> list[ClockPublic]:
-
-    statement = select(Clock).where(Clock.user_id == user_id)
-    db_clocks = session.exec(statement).all()
-
-    return [ClockPublic.model_validate(c) for c in db_clocks]
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    session: AsyncSession = Depends(get_read_session)
+) -> ClockPage:
+
+    # Column projection, returned as is: no ORM objects or response_model validation
+    return FastJSONResponse(await session.run_sync(
+        paginate_clock_rows,
+        cursor=cursor,
+        limit=limit,
+        start=start,
+        end=end,
+        user_id=user_id,
+    ))
 
 
 # Change password (for current user)
@@ -228,14 +261,14 @@ async def read_user_clocks(
 async def change_password(
     password_data: PasswordChange,
     current_user: UserPublic = Depends(get_current_user),
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
 ):
     """
     Change the password for the currently authenticated user.
     Requires the current password for verification.
     """
     # Get the user from database
-    db_user = session.get(User, current_user.id)
+    db_user = await session.get(User, current_user.id)
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -247,7 +280,7 @@ async def change_password(
         )
     
     # Verify current password
-    if not verify_user_password(db_user.keycloak_id, password_data.current_password):
+    if not await verify_user_password(db_user.keycloak_id, password_data.current_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Current password is incorrect"
@@ -268,7 +301,7 @@ async def change_password(
     
     # Change password in Keycloak
     try:
-        change_keycloak_user_password(db_user.keycloak_id, password_data.new_password, temporary=False)
+        await change_keycloak_user_password(db_user.keycloak_id, password_data.new_password, temporary=False)
     except Exception as e:
         error_msg = str(e)
         print(f"Error changing password in Keycloak: {error_msg}")
@@ -285,7 +318,7 @@ async def change_password(
 async def reset_user_password(
     user_id: int,
     current_user: UserPublic = Depends(get_current_user),
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
 ) -> PasswordReset:
     """
     Reset a user's password to a temporary password.
@@ -300,7 +333,7 @@ async def reset_user_password(
         )
     
     # Get the user from database
-    db_user = session.get(User, user_id)
+    db_user = await session.get(User, user_id)
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -319,20 +352,11 @@ async def reset_user_password(
         )
     
     # Generate a temporary password
-    # Format: Bank{year}{special_char}{5_random_chars}
-    special_chars = '@#$%&'
-    year = datetime.now().year
-    alphabet = (
-        string.ascii_letters.replace('i', '').replace('I', '').replace('l', '').replace('L', '').replace('o', '').replace('O', '') +
-        string.digits.replace('0', '').replace('1', '')
-    )
-    random_chars = ''.join(secrets.choice(alphabet) for _ in range(5))
-    random_special = secrets.choice(special_chars)
-    temp_password = f"Bank{year}{random_special}{random_chars}"
+    temp_password = generate_temp_password()
     
     # Reset password in Keycloak (mark as temporary)
     try:
-        change_keycloak_user_password(db_user.keycloak_id, temp_password, temporary=True)
+        await change_keycloak_user_password(db_user.keycloak_id, temp_password, temporary=True)
     except Exception as e:
         error_msg = str(e)
         print(f"Error resetting password in Keycloak: {error_msg}")
@@ -348,13 +372,17 @@ async def reset_user_password(
 @router.delete("/{user_id}", response_model=UserPublic)
 async def delete_user(
     user_id: int,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ) -> UserPublic:
 
-    db_user = session.get(User, user_id)
+    db_user = await session.get(
+        User, user_id, options=[*USER_PUBLIC_LOAD, selectinload(User.clocks)]
+    )
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
 
+    team_ids = [db_user.team_id, db_user.managed_team.id if db_user.managed_team else None]
+
     # If user is a manager, unassign them from the team first
     if db_user.managed_team:
         db_user.managed_team.manager_id = None
@@ -362,7 +390,7 @@ async def delete_user(
 
     # Delete all user's clocks first
     for clock in db_user.clocks:
-        session.delete(clock)
+        await session.delete(clock)
 
     # Create response before deletion (while object is still valid)
     response = UserPublic.model_validate(db_user)
@@ -370,13 +398,15 @@ async def delete_user(
     # Delete user from Keycloak if keycloak_id exists and is not a placeholder
     if db_user.keycloak_id and not db_user.keycloak_id.startswith('manual-'):
         try:
-            delete_keycloak_user(db_user.keycloak_id)
+            await delete_keycloak_user(db_user.keycloak_id)
         except Exception as e:
             # Log error but continue with database deletion
             print(f"Warning: Failed to delete user from Keycloak: {e}")
 
-    session.delete(db_user)
-    session.commit()
+    await session.delete(db_user)
+    await session.commit()
+    presence.remove(user_id)
+    replica_router.note_writes([user_id], team_ids)
 
     return response
 
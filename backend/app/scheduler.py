@@ -1,57 +1,262 @@
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+from sqlalchemy import DateTime, update
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
 from sqlmodel import Session, select
-from datetime import datetime, timezone
-from app.database import engine
-from app.models import Clock
+from sqlmodel.ext.asyncio.session import AsyncSession
+from datetime import datetime, timezone, timedelta
+from typing import Optional
+from app.database import engine, async_engine, dialect_insert
+from app.models import Clock, User, JobRun
+from app.kpi_rollup import apply_deltas_bulk, as_utc, clock_out_deltas
+from app.partitions import maintain_partitions
+from app.presence import presence
+from app.identity_sync import identity_writes
+from app.read_routing import replica_router, REPLICA_CHECK_INTERVAL_SECONDS
+from app.user_reconciler import reconcile_users, RECONCILE_INTERVAL_MINUTES
 
 scheduler = AsyncIOScheduler()
 
-def auto_clock_out_past_midnight():
+AUTO_CLOCK_OUT_JOB = "auto_clock_out"
+AUTO_CLOCK_OUT_HOUR, AUTO_CLOCK_OUT_MINUTE = 0, 1
+AUTO_CLOCK_OUT_CHUNK = 1000
+
+
+# ==========================================
+# SQL: 23:59:59 UTC of a timestamp's day
+# ==========================================
+class end_of_utc_day(FunctionElement):
+    type = DateTime(timezone=True)
+    inherit_cache = True
+
+
+@compiles(end_of_utc_day, "postgresql")
+def _end_of_utc_day_pg(element, compiler, **kw):
+    column = compiler.process(list(element.clauses)[0], **kw)
+    return (
+        f"(date_trunc('day', {column} AT TIME ZONE 'UTC') + interval '23:59:59') AT TIME ZONE 'UTC'"
+    )
+
+
+@compiles(end_of_utc_day, "sqlite")
+def _end_of_utc_day_sqlite(element, compiler, **kw):
+    column = compiler.process(list(element.clauses)[0], **kw)
+    return f"strftime('%Y-%m-%d 23:59:59.000000', {column})"
+
+
+# ==========================================
+# JOB STATE
+# ==========================================
+def last_success(session: Session, name: str) -> Optional[datetime]:
+    run = session.get(JobRun, name)
+    return as_utc(run.last_success_at) if run else None
+
+
+def record_success(session: Session, name: str, affected_rows: int, at: datetime):
+    stmt = dialect_insert(session)(JobRun).values(name=name, last_success_at=at, affected_rows=affected_rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["name"],
+        set_={"last_success_at": stmt.excluded.last_success_at, "affected_rows": stmt.excluded.affected_rows},
+    )
+    session.exec(stmt)
+    session.commit()
+
+
+def last_scheduled_fire(now: datetime) -> datetime:
+    """Most recent daily 00:01 UTC fire time at or before now."""
+    fire = now.replace(hour=AUTO_CLOCK_OUT_HOUR, minute=AUTO_CLOCK_OUT_MINUTE, second=0, microsecond=0)
+    return fire if fire <= now else fire - timedelta(days=1)
+
+
+# ==========================================
+# JOBS
+# ==========================================
+async def run_on_async_engine(job, *args, **kwargs):
+    """
+    Run a Session-based job on a connection from the asyncpg pool, so its
+    queries are awaited on the event loop instead of blocking a thread.
+    The sync job functions stay usable from the CLIs and tests.
+    """
+    async with async_engine.connect() as conn:
+        return await conn.run_sync(lambda sync_conn: job(sync_conn, *args, **kwargs))
+
+def auto_clock_out_past_midnight(bind=None, now: Optional[datetime] = None,
+                                 chunk_size: int = AUTO_CLOCK_OUT_CHUNK) -> int:
     """
     Close any clock entries that are still open from before today.
-    Sets clock_out to 23:59:59 of the clock_in day.
-    """
-    with Session(engine) as session:
-        # Get current date at midnight (start of today)
-        now = datetime.now(timezone.utc)
-        today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        
-        # Find all open clocks where clock_in is before today
-        statement = select(Clock).where(
-            Clock.clock_out.is_(None),
-            Clock.clock_in < today_start
-        )
-        open_clocks = session.exec(statement).all()
-        
-        for clock in open_clocks:
-            # Set clock_out to 23:59:59 of the clock_in day
-            clock_in_date = clock.clock_in.date()
-            clock.clock_out = datetime.combine(
-                clock_in_date,
-                datetime.max.time().replace(microsecond=0),  # 23:59:59
-                tzinfo=timezone.utc
+    Sets clock_out to 23:59:59 (UTC) of the clock_in day.
+
+    Set-based: each chunk is a single UPDATE ... RETURNING committed on
+    its own, so a large backlog never holds long locks. Returns the
+    number of clocks closed.
+    """
+    bind = bind or engine
+    now = now or datetime.now(timezone.utc)
+    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    total = 0
+
+    with Session(bind) as session:
+        while True:
+            stale = (
+                select(Clock.id)
+                .where(Clock.clock_out.is_(None), Clock.clock_in < today_start)
+                .limit(chunk_size)
+                .with_for_update(skip_locked=True)
+                .scalar_subquery()
             )
-            session.add(clock)
-        
-        if open_clocks:
+            closed = session.exec(
+                update(Clock)
+                .where(Clock.id.in_(stale))
+                .values(clock_out=end_of_utc_day(Clock.clock_in))
+                .returning(Clock.id, Clock.user_id, Clock.clock_in, Clock.clock_out)
+                .execution_options(synchronize_session=False)
+            ).all()
+            if not closed:
+                break
+
+            teams = dict(session.exec(
+                select(User.id, User.team_id).where(User.id.in_({row.user_id for row in closed}))
+            ).all())
+            apply_deltas_bulk(session, [
+                (row.user_id, teams.get(row.user_id), as_utc(row.clock_in).date(),
+                 clock_out_deltas(row.clock_in, row.clock_out))
+                for row in closed
+            ])
             session.commit()
-            print(f"[Scheduler] Auto clocked out {len(open_clocks)} users who stayed past midnight")
-        else:
-            print("[Scheduler] No open clocks from previous days found")
+            for row in closed:
+                presence.clock_out(row.user_id, row.id)
+            total += len(closed)
+
+            if len(closed) < chunk_size:
+                break
+
+        record_success(session, AUTO_CLOCK_OUT_JOB, total, now)
+
+    if total:
+        print(f"[Scheduler] Auto clocked out {total} users who stayed past midnight")
+    else:
+        print("[Scheduler] No open clocks from previous days found")
+    return total
+
+
+def catch_up_auto_clock_out(bind=None, now: Optional[datetime] = None) -> bool:
+    """
+    Run the auto clock-out now if its last successful run is older than
+    the most recent 00:01 fire time (process was down at midnight).
+    """
+    bind = bind or engine
+    now = now or datetime.now(timezone.utc)
+    with Session(bind) as session:
+        last = last_success(session, AUTO_CLOCK_OUT_JOB)
+
+    if last is not None and last >= last_scheduled_fire(now):
+        return False
+
+    print(f"[Scheduler] Missed auto clock-out run (last success: {last}), catching up")
+    auto_clock_out_past_midnight(bind, now=now)
+    return True
+
+async def resync_presence():
+    """
+    Rebuild the presence index from the database, picking up clocks
+    edited outside the API (admin panel, manual SQL).
+    """
+    async with AsyncSession(async_engine) as session:
+        await session.run_sync(presence.warm)
+
+async def flush_identity_writes():
+    """Write the queued Keycloak role changes to users in one batch."""
+    updated = await run_on_async_engine(identity_writes.flush)
+    if updated:
+        print(f"[Scheduler] Synced realm roles of {updated} users")
+
+async def reconcile_keycloak_users():
+    """
+    Pull users and realm roles from Keycloak and apply creates / updates
+    to the users table in bulk (report only when RECONCILE_DRY_RUN=true).
+    """
+    try:
+        stats = await reconcile_users()
+    except Exception as e:
+        print(f"[Scheduler] Keycloak user reconciliation failed: {e}")
+        return
+    print(f"[Scheduler] Keycloak user reconciliation: {stats}")
+
+def maintain_clock_partitions():
+    """
+    Create upcoming monthly clocks partitions and apply the retention
+    policy (no-op while clocks is not partitioned).
+    """
+    result = maintain_partitions()
+    if result["partitioned"]:
+        print(f"[Scheduler] Partitions ensured: {len(result['ensured'])}, expired: {result['expired']}")
 
 def start_scheduler():
     # Run every day at 00:01 UTC
     scheduler.add_job(
-        auto_clock_out_past_midnight,
-        CronTrigger(hour=0, minute=1),
-        id="auto_clock_out",
+        run_on_async_engine,
+        CronTrigger(hour=AUTO_CLOCK_OUT_HOUR, minute=AUTO_CLOCK_OUT_MINUTE),
+        args=[auto_clock_out_past_midnight],
+        id=AUTO_CLOCK_OUT_JOB,
+        replace_existing=True,
+        coalesce=True,
+        misfire_grace_time=3600,
+    )
+    # Run once right away if the process was down at 00:01
+    scheduler.add_job(
+        run_on_async_engine,
+        args=[catch_up_auto_clock_out],
+        id="auto_clock_out_catch_up",
+        replace_existing=True
+    )
+    # Run every 5 seconds
+    scheduler.add_job(
+        flush_identity_writes,
+        IntervalTrigger(seconds=5),
+        id="flush_identity_writes",
+        replace_existing=True,
+        coalesce=True,
+        max_instances=1,
+    )
+    # Run every RECONCILE_INTERVAL_MINUTES
+    scheduler.add_job(
+        reconcile_keycloak_users,
+        IntervalTrigger(minutes=RECONCILE_INTERVAL_MINUTES),
+        id="reconcile_keycloak_users",
+        replace_existing=True,
+        coalesce=True,
+        max_instances=1,
+    )
+    # Run every REPLICA_CHECK_INTERVAL_SECONDS (no-op without a replica)
+    scheduler.add_job(
+        replica_router.check,
+        IntervalTrigger(seconds=REPLICA_CHECK_INTERVAL_SECONDS),
+        id="check_replica_lag",
+        replace_existing=True,
+        coalesce=True,
+        max_instances=1,
+    )
+    # Run every 5 minutes
+    scheduler.add_job(
+        resync_presence,
+        IntervalTrigger(minutes=5),
+        id="resync_presence",
+        replace_existing=True
+    )
+    # Run every day at 00:10 UTC (partition DDL stays on the sync engine, in a worker thread)
+    scheduler.add_job(
+        maintain_clock_partitions,
+        CronTrigger(hour=0, minute=10),
+        id="maintain_clock_partitions",
         replace_existing=True
     )
     scheduler.start()
-    print("[Scheduler] Started - auto clock-out job scheduled for 00:01 daily")
+    print("[Scheduler] Started - auto clock-out job scheduled for 00:01 daily, partition maintenance at 00:10")
 
-def shutdown_scheduler():
+async def shutdown_scheduler():
     if scheduler.running:
         scheduler.shutdown()
-        print("[Scheduler] Shutdown complete")
\ No newline at end of file
+        await flush_identity_writes()
+        print("[Scheduler] Shutdown complete")
@@ -1,13 +1,28 @@
 # backend/app/tests/conftest.py
+import os
+import tempfile
 import pytest
 from fastapi.testclient import TestClient  # simulates a real HTTP client to test your API without a server
 from sqlmodel import SQLModel, create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
 from app.main import app  # import your FastAPI application
-from app.database import get_session
+from app.database import get_session, get_async_session
+from app.read_routing import get_read_session
 
-# SQLite in-memory database for tests
-TEST_DATABASE_URL = "sqlite:///:memory:"  # temporary database
-engine = create_engine(TEST_DATABASE_URL, connect_args={"check_same_thread": False})  # necessary so multiple threads (pytest and FastAPI) can access the database
+# SQLite file database for tests, shared by the sync engine (test setup,
+# sync routes) and the async engine (async routes, auth)
+TEST_DATABASE_FILE = os.path.join(tempfile.mkdtemp(prefix="time-manager-tests-"), "test.db")
+engine = create_engine(
+    f"sqlite:///{TEST_DATABASE_FILE}",
+    connect_args={"check_same_thread": False},  # necessary so multiple threads (pytest and FastAPI) can access the database
+)
+async_engine = create_async_engine(
+    f"sqlite+aiosqlite:///{TEST_DATABASE_FILE}",
+    poolclass=NullPool,  # aiosqlite connections are tied to the event loop that opened them
+)
 
 @pytest.fixture(name="session")
 def session_fixture():
@@ -16,8 +31,26 @@ def session_fixture():
         yield session
     SQLModel.metadata.drop_all(engine)
 
+@pytest.fixture(name="async_session_factory")
+def async_session_factory_fixture():
+    def factory():
+        return AsyncSession(async_engine, expire_on_commit=False)
+    return factory
+
+@pytest.fixture(name="query_log")
+def query_log_fixture():
+    """SQL statements run on the async engine (async routes) during the test."""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+    yield statements
+    event.remove(async_engine.sync_engine, "before_cursor_execute", record)
+
 @pytest.fixture(name="client")
-def client_fixture(session: Session):
+def client_fixture(session: Session, async_session_factory):
     # Prevent the on_startup() call from connecting to PostgreSQL
     def fake_on_startup():
         SQLModel.metadata.create_all(engine)
@@ -27,7 +60,13 @@ def client_fixture(session: Session):
     def get_session_override():
         yield session
 
+    async def get_async_session_override():
+        async with async_session_factory() as async_session:
+            yield async_session
+
     app.dependency_overrides[get_session] = get_session_override
+    app.dependency_overrides[get_async_session] = get_async_session_override
+    app.dependency_overrides[get_read_session] = get_async_session_override
 
     with TestClient(app) as c:
         yield c
@@ -0,0 +1,165 @@
+import asyncio
+import time
+import pytest
+import rsa
+from fastapi.security import HTTPAuthorizationCredentials
+from jose import jwk, jwt
+from app import auth
+from app.models import User
+
+
+@pytest.fixture(name="signing_key", scope="module")
+def signing_key_fixture():
+    public, private = rsa.newkeys(1024)
+    public_jwk = jwk.construct(public.save_pkcs1().decode(), "RS256").to_dict()
+    public_jwk["kid"] = "test-kid"
+    return private.save_pkcs1().decode(), {"keys": [public_jwk]}
+
+
+def make_token(private_pem, **claims):
+    payload = {
+        "sub": "kc-token-user",
+        "email": "token@user.fr",
+        "given_name": "Token",
+        "family_name": "User",
+        "aud": auth.KEYCLOAK_AUDIENCE,
+        "iss": auth.KEYCLOAK_ISSUER,
+        "exp": int(time.time()) + 300,
+        "realm_access": {"roles": ["employee", "offline_access"]},
+        **claims,
+    }
+    return jwt.encode(payload, private_pem, algorithm="RS256", headers={"kid": "test-kid"})
+
+
+def authenticate(session_factory, token):
+    async def run():
+        async with session_factory() as session:
+            return await auth.get_current_user(HTTPAuthorizationCredentials(scheme="Bearer", credentials=token), session)
+    return asyncio.run(run())
+
+
+def test_verified_token_cache_skips_verification(session, async_session_factory, signing_key, monkeypatch):
+    private_pem, jwks = signing_key
+    fetches = []
+    monkeypatch.setattr(auth, "jwks_manager", auth.JWKSManager(fetch=lambda: fetches.append(1) or jwks))
+    monkeypatch.setattr(auth, "token_cache", auth.TokenCache(maxsize=2))
+
+    session.add(User(first_name="Token", last_name="User", email="token@user.fr",
+                     keycloak_id="kc-token-user", realm_roles=["employee"]))
+    session.commit()
+
+    token = make_token(private_pem)
+    first = authenticate(async_session_factory, token)
+    second = authenticate(async_session_factory, token)
+
+    assert first == second
+    assert second.realm_roles == ["employee"]
+    assert len(fetches) == 1
+    assert auth.token_cache.stats() == {"size": 1, "hits": 1, "misses": 1}
+
+    # LRU bound
+    for i in range(3):
+        token = make_token(private_pem, jti=str(i))
+        authenticate(async_session_factory, token)
+    assert auth.token_cache.stats()["size"] == 2
+
+
+def test_token_cache_honours_exp():
+    cache = auth.TokenCache(maxsize=10, max_ttl=300)
+    user = auth.UserPublic(id=1, email="a@b.fr", first_name="A", last_name="B", phone_number=None,
+                           created_at="2026-01-01T00:00:00Z", keycloak_id="kc", realm_roles=[])
+    cache.put("expired", time.time() - 1, user)
+    cache.put("valid", time.time() + 60, user)
+
+    assert cache.get("expired") is None
+    assert cache.get("valid") == user
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_jwks_manager_refreshes_on_unknown_kid(signing_key):
+    _, jwks = signing_key
+    rotated = {"keys": [dict(jwks["keys"][0], kid="rotated-kid")]}
+    documents = [jwks, rotated, rotated]
+    manager = auth.JWKSManager(fetch=lambda: documents.pop(0), ttl=3600, min_interval=0)
+
+    assert manager.get_key("test-kid") is not None
+    # Key rotation: unknown kid triggers one refetch
+    assert manager.get_key("rotated-kid") is not None
+    assert manager.get_key("test-kid") is None
+    assert documents == []
+
+
+def test_jwks_manager_rate_limits_and_keeps_keys_on_failure(signing_key):
+    _, jwks = signing_key
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        if len(calls) > 1:
+            raise ConnectionError("keycloak down")
+        return jwks
+
+    manager = auth.JWKSManager(fetch=fetch, ttl=3600, min_interval=60)
+    assert manager.get_key("test-kid") is not None
+    for _ in range(5):
+        assert manager.get_key("forged-kid") is None
+    assert len(calls) == 1  # unknown kids inside min_interval don't refetch
+
+    manager.min_interval = 0
+    assert manager.get_key("forged-kid") is None
+    assert len(calls) == 2
+    assert manager.get_key("test-kid") is not None  # failed refresh keeps old keys
+
+
+def test_role_changes_are_written_behind(session, async_session_factory, signing_key, monkeypatch):
+    from app.identity_sync import IdentityWriteBehind
+    from sqlmodel import select
+    from sqlmodel.ext.asyncio.session import AsyncSession
+
+    private_pem, jwks = signing_key
+    monkeypatch.setattr(auth, "jwks_manager", auth.JWKSManager(fetch=lambda: jwks))
+    monkeypatch.setattr(auth, "token_cache", auth.TokenCache())
+    writes = IdentityWriteBehind()
+    monkeypatch.setattr(auth, "identity_writes", writes)
+
+    session.add(User(first_name="Token", last_name="User", email="token@user.fr",
+                     keycloak_id="kc-token-user", realm_roles=["employee"]))
+    session.commit()
+
+    commits = []
+    async def commit(self):
+        commits.append(1)
+    monkeypatch.setattr(AsyncSession, "commit", commit)
+    for roles in (["manager"], ["employee", "manager"]):
+        token = make_token(private_pem, realm_access={"roles": roles}, jti=str(roles))
+        user = authenticate(async_session_factory, token)
+        assert user.realm_roles == roles
+    monkeypatch.undo()
+
+    assert commits == []  # the auth path stayed read-only
+    assert writes.pending() == 1  # coalesced per keycloak_id
+
+    assert writes.flush(session.get_bind()) == 1
+    session.expire_all()
+    stored = session.exec(select(User).where(User.keycloak_id == "kc-token-user")).one()
+    assert stored.realm_roles == ["employee", "manager"]
+    assert writes.pending() == 0
+
+    # Same roles in another token order: the stored form matches, nothing to write
+    monkeypatch.setattr(auth, "jwks_manager", auth.JWKSManager(fetch=lambda: jwks))
+    monkeypatch.setattr(auth, "identity_writes", writes)
+    token = make_token(private_pem, realm_access={"roles": ["manager", "employee"]}, jti="reordered")
+    assert authenticate(async_session_factory, token).realm_roles == ["employee", "manager"]
+    assert writes.pending() == 0
+
+
+def test_first_login_creates_user(session, async_session_factory, signing_key, monkeypatch):
+    private_pem, jwks = signing_key
+    monkeypatch.setattr(auth, "jwks_manager", auth.JWKSManager(fetch=lambda: jwks))
+    monkeypatch.setattr(auth, "token_cache", auth.TokenCache())
+
+    token = make_token(private_pem, sub="kc-new-user", email="new@user.fr")
+    user = authenticate(async_session_factory, token)
+    again = authenticate(async_session_factory, make_token(private_pem, sub="kc-new-user", jti="2"))
+    assert user.id is not None and user.id == again.id
+    assert user.realm_roles == ["employee"]
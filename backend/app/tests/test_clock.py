@@ -1,5 +1,12 @@
-from datetime import datetime, timezone
-from app.models import Clock, User
+import json
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime, timezone, timedelta
+from sqlmodel import select
+from unittest.mock import Mock
+from app.clock_ingest import CLOCK_LOCK_NAMESPACE, close_duplicate_open_shifts, lock_user_clocks
+from app.models import Clock, Team, User
 
 def test_clock_creation(session):
     user = User(
@@ -22,3 +29,301 @@ def test_clock_creation(session):
     # ✅ correction: make clock_in "timezone-aware"
     clock_in_aware = clock.clock_in.replace(tzinfo=timezone.utc)
     assert clock_in_aware <= datetime.now(timezone.utc)
+
+
+def test_clock_listing_keyset_pagination(client, session):
+    team = Team(name="Support", description="Support Team")
+    session.add(team)
+    session.commit()
+    alice = User(first_name="Alice", last_name="Martin", email="alice@martin.fr",
+                 keycloak_id="kc-alice", realm_roles=[], team_id=team.id)
+    bob = User(first_name="Bob", last_name="Petit", email="bob@petit.fr",
+               keycloak_id="kc-bob", realm_roles=[])
+    session.add_all([alice, bob])
+    session.commit()
+
+    start = datetime(2026, 3, 2, 9, 0, tzinfo=timezone.utc)
+    for day in range(5):
+        for user in (alice, bob):
+            clock_in = start + timedelta(days=day)
+            session.add(Clock(user_id=user.id, clock_in=clock_in, clock_out=clock_in + timedelta(hours=8)))
+    session.commit()
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 3, **({"cursor": cursor} if cursor else {})}
+        page = client.get("/clocks/", params=params).json()
+        seen.extend(c["id"] for c in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert len(seen) == 10 == len(set(seen))
+
+    ranged = client.get("/clocks/", params={
+        "from": (start + timedelta(days=1)).isoformat(),
+        "to": (start + timedelta(days=3)).isoformat(),
+        "team_id": team.id,
+    }).json()
+    assert [c["user_id"] for c in ranged["items"]] == [alice.id, alice.id]
+    assert ranged["next_cursor"] is None
+
+    user_page = client.get(f"/users/{bob.id}/clocks/", params={"limit": 2}).json()
+    assert len(user_page["items"]) == 2
+    assert user_page["next_cursor"] is not None
+
+    assert client.get("/clocks/", params={"cursor": "not-a-cursor"}).status_code == 400
+
+
+def test_clock_export_streams_csv_and_ndjson(client, session):
+    team = Team(name="Tellers", description="Front desk")
+    session.add(team)
+    session.commit()
+    user = User(first_name="Chloé", last_name="Roux", email="chloe@roux.fr",
+                keycloak_id="kc-chloe", realm_roles=[], team_id=team.id)
+    session.add(user)
+    session.commit()
+
+    clock_in = datetime(2026, 3, 2, 9, 0, tzinfo=timezone.utc)
+    session.add(Clock(user_id=user.id, clock_in=clock_in, clock_out=clock_in + timedelta(hours=8)))
+    session.add(Clock(user_id=user.id, clock_in=clock_in + timedelta(days=1)))
+    session.commit()
+
+    response = client.get("/clocks/export", params={"format": "csv"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    lines = response.text.strip().splitlines()
+    assert lines[0].startswith("clock_id,user_id,first_name")
+    assert len(lines) == 3
+    assert "Tellers" in lines[1] and lines[1].endswith(",8.0")
+
+    response = client.get("/clocks/export", params={
+        "format": "ndjson",
+        "from": (clock_in + timedelta(hours=12)).isoformat(),
+    })
+    rows = [json.loads(line) for line in response.text.strip().splitlines()]
+    assert len(rows) == 1
+    assert rows[0]["clock_out"] is None
+    assert rows[0]["team_name"] == "Tellers"
+
+
+def test_clock_toggle_opens_then_closes(client, session):
+    user = User(first_name="Inès", last_name="Blanc", email="ines@blanc.fr",
+                keycloak_id="kc-ines", realm_roles=["employee"])
+    session.add(user)
+    session.commit()
+
+    opened = client.post("/clocks/", json={"user_id": user.id}).json()
+    assert opened["clock_out"] is None
+    assert opened["user"]["email"] == "ines@blanc.fr"
+
+    closed = client.post("/clocks/", json={"user_id": user.id}).json()
+    assert closed["id"] == opened["id"]
+    assert closed["clock_out"] is not None
+
+    assert client.post("/clocks/", json={"user_id": 9999}).status_code == 404
+
+
+def test_clock_toggle_insert_failure_without_open_shift(client, session):
+    user = User(first_name="Inès", last_name="Blanc", email="ines@blanc.fr",
+                keycloak_id="kc-ines", realm_roles=["employee"])
+    session.add(user)
+    session.commit()
+    # An integrity error that is not a duplicate open shift (e.g. a foreign key)
+    session.execute(text(
+        "CREATE TRIGGER reject_clock BEFORE INSERT ON clocks "
+        "BEGIN SELECT RAISE(ABORT, 'constraint failed'); END"
+    ))
+    session.commit()
+
+    assert client.post("/clocks/", json={"user_id": user.id}).status_code == 409
+    assert session.exec(select(Clock)).all() == []
+
+
+def test_only_one_open_clock_per_user(session):
+    user = User(first_name="Hugo", last_name="Noir", email="hugo@noir.fr",
+                keycloak_id="kc-hugo", realm_roles=[])
+    session.add(user)
+    session.commit()
+
+    session.add(Clock(user_id=user.id))
+    session.commit()
+
+    session.add(Clock(user_id=user.id))
+    with pytest.raises(IntegrityError):
+        session.commit()
+
+
+def test_duplicate_open_shifts_are_closed_before_the_unique_index(session):
+    # Data left by concurrent taps before uq_clocks_open_per_user existed
+    index = next(i for i in Clock.__table__.indexes if i.name == "uq_clocks_open_per_user")
+    index.drop(session.connection())
+    users = [User(first_name="Dup", last_name=str(i), email=f"dup{i}@corp.fr", keycloak_id=f"kc-dup-{i}", realm_roles=[])
+             for i in range(2)]
+    session.add_all(users)
+    session.commit()
+    first, second = users
+    start = datetime(2026, 3, 2, 9, 0)
+    session.add_all([
+        Clock(user_id=first.id, clock_in=start),
+        Clock(user_id=first.id, clock_in=start + timedelta(seconds=1)),
+        Clock(user_id=first.id, clock_in=start + timedelta(hours=1), clock_out=start + timedelta(hours=2)),
+        Clock(user_id=first.id, clock_in=start + timedelta(hours=3)),
+        Clock(user_id=second.id, clock_in=start),
+    ])
+    session.commit()
+
+    assert close_duplicate_open_shifts(session.connection()) == 2
+    index.create(session.connection())
+    session.commit()
+
+    shifts = [(c.user_id, c.clock_in, c.clock_out) for c in session.exec(select(Clock).order_by(Clock.id))]
+    assert shifts == [
+        (first.id, start, start + timedelta(seconds=1)),
+        (first.id, start + timedelta(seconds=1), start + timedelta(hours=1)),
+        (first.id, start + timedelta(hours=1), start + timedelta(hours=2)),
+        (first.id, start + timedelta(hours=3), None),
+        (second.id, start, None),
+    ]
+
+
+def test_clock_batch_ingestion(client, session):
+    user = User(first_name="Nina", last_name="Garnier", email="nina@garnier.fr",
+                keycloak_id="kc-nina", realm_roles=[])
+    session.add(user)
+    session.commit()
+    day = datetime(2026, 3, 2, tzinfo=timezone.utc)
+    session.add(Clock(user_id=user.id, clock_in=day + timedelta(hours=8)))
+    session.commit()
+
+    events = [
+        {"user_id": user.id, "timestamp": (day + timedelta(hours=13)).isoformat(), "direction": "in"},
+        {"user_id": user.id, "timestamp": (day + timedelta(hours=12)).isoformat()},
+        {"user_id": user.id, "timestamp": (day + timedelta(hours=17)).isoformat()},
+        {"user_id": user.id, "timestamp": (day + timedelta(hours=17)).isoformat()},
+        {"user_id": user.id, "timestamp": (day + timedelta(hours=18)).isoformat(), "direction": "out"},
+        {"user_id": 9999, "timestamp": day.isoformat()},
+    ]
+    response = client.post("/clocks/batch", json={"events": events})
+    assert response.status_code == 200
+    data = response.json()
+
+    assert [r["status"] for r in data["results"]] == [
+        "opened", "closed", "closed", "duplicate", "rejected", "rejected"
+    ]
+    assert (data["opened"], data["closed"], data["rejected"]) == (1, 2, 2)
+
+    clocks = session.exec(select(Clock).where(Clock.user_id == user.id).order_by(Clock.clock_in)).all()
+    assert [(c.clock_in.hour, c.clock_out.hour) for c in clocks] == [(8, 12), (13, 17)]
+
+
+def test_clock_batch_retry_is_not_replayed_twice(client, session):
+    user = User(first_name="Hugo", last_name="Bernard", email="hugo@bernard.fr",
+                keycloak_id="kc-hugo", realm_roles=[])
+    session.add(user)
+    session.commit()
+    day = datetime(2026, 3, 3, tzinfo=timezone.utc)
+    events = [
+        {"user_id": user.id, "timestamp": (day + timedelta(hours=h)).isoformat()}
+        for h in (8, 12, 13)
+    ]
+
+    first = client.post("/clocks/batch", json={"events": events}).json()
+    assert [r["status"] for r in first["results"]] == ["opened", "closed", "opened"]
+
+    # The terminal lost the response and sends the same batch again
+    retry = client.post("/clocks/batch", json={"events": events}).json()
+    assert [r["status"] for r in retry["results"]] == ["duplicate"] * 3
+    assert [r["clock_id"] for r in retry["results"]] == [r["clock_id"] for r in first["results"]]
+    assert (retry["opened"], retry["closed"], retry["rejected"]) == (0, 0, 0)
+
+    session.expire_all()
+    clocks = session.exec(select(Clock).where(Clock.user_id == user.id).order_by(Clock.clock_in)).all()
+    assert [(c.clock_in.hour, c.clock_out and c.clock_out.hour) for c in clocks] == [(8, 12), (13, None)]
+
+
+def test_auto_clock_out_closes_stale_shifts_in_chunks(session):
+    from app.scheduler import auto_clock_out_past_midnight, catch_up_auto_clock_out
+    from app.models import JobRun, UserDailyKPI
+
+    users = [User(first_name=f"Night{i}", last_name="Test", email=f"night{i}@test.fr",
+                  keycloak_id=f"kc-night{i}", realm_roles=[]) for i in range(5)]
+    session.add_all(users)
+    session.commit()
+
+    now = datetime(2026, 3, 10, 0, 1, tzinfo=timezone.utc)
+    for i, user in enumerate(users[:4]):
+        session.add(Clock(user_id=user.id, clock_in=datetime(2026, 3, 9 - i, 20, 0, tzinfo=timezone.utc)))
+    session.add(Clock(user_id=users[4].id, clock_in=datetime(2026, 3, 10, 0, 0, 30, tzinfo=timezone.utc)))
+    session.commit()
+
+    closed = auto_clock_out_past_midnight(session.get_bind(), now=now, chunk_size=3)
+    assert closed == 4
+
+    session.expire_all()
+    clocks = session.exec(select(Clock).order_by(Clock.user_id)).all()
+    for clock in clocks[:4]:
+        out = clock.clock_out.replace(tzinfo=timezone.utc)
+        assert out == clock.clock_in.replace(tzinfo=timezone.utc).replace(hour=23, minute=59, second=59)
+    assert clocks[4].clock_out is None
+
+    run = session.get(JobRun, "auto_clock_out")
+    assert run.affected_rows == 4
+    assert session.exec(select(UserDailyKPI)).all()[0].shift_count == 1
+
+    # Already ran after today's 00:01: no catch-up
+    assert catch_up_auto_clock_out(session.get_bind(), now=now + timedelta(hours=2)) is False
+    # Down through the next 00:01: catch up on startup
+    assert catch_up_auto_clock_out(session.get_bind(), now=now + timedelta(days=1, hours=2)) is True
+    session.expire_all()
+    assert session.exec(select(Clock).where(Clock.clock_out.is_(None))).all() == []
+
+
+def test_active_clocks_presence_index(client, session):
+    from app.presence import presence
+
+    team = Team(name="Floor", description="Floor Team")
+    session.add(team)
+    session.commit()
+    alice = User(first_name="Alice", last_name="Martin", email="alice@martin.fr",
+                 keycloak_id="kc-alice", realm_roles=[], team_id=team.id)
+    bob = User(first_name="Bob", last_name="Petit", email="bob@petit.fr",
+               keycloak_id="kc-bob", realm_roles=[])
+    session.add_all([alice, bob])
+    session.commit()
+    session.add(Clock(user_id=bob.id, clock_in=datetime(2026, 3, 2, 9, 0, tzinfo=timezone.utc)))
+    session.commit()
+
+    assert presence.warm(session) == 1
+
+    opened = client.post("/clocks/", json={"user_id": alice.id}).json()
+    active = client.get("/clocks/active").json()
+    assert [a["user_id"] for a in active] == [bob.id, alice.id]
+    assert active[1]["clock_id"] == opened["id"]
+
+    team_active = client.get("/clocks/active", params={"team_id": team.id}).json()
+    assert [a["user_id"] for a in team_active] == [alice.id]
+
+    client.delete(f"/teams/{team.id}/members/{alice.id}")
+    assert client.get("/clocks/active", params={"team_id": team.id}).json() == []
+
+    client.post("/clocks/", json={"user_id": alice.id})
+    client.post("/clocks/batch", json={"events": [
+        {"user_id": bob.id, "timestamp": "2026-03-02T17:00:00Z"},
+    ]})
+    assert client.get("/clocks/active").json() == []
+
+
+def test_open_paths_take_the_per_user_lock_on_postgresql():
+    session = Mock()
+    session.get_bind.return_value.dialect.name = "postgresql"
+    lock_user_clocks(session, [7, 3, 7])
+
+    statement, params = session.execute.call_args.args
+    assert "pg_advisory_xact_lock(:namespace, user_id)" in str(statement)
+    assert params == {"namespace": CLOCK_LOCK_NAMESPACE, "user_ids": [3, 7]}
+
+    session = Mock()
+    session.get_bind.return_value.dialect.name = "sqlite"
+    lock_user_clocks(session, [1])
+    session.execute.assert_not_called()
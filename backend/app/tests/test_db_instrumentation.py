@@ -0,0 +1,35 @@
+from sqlalchemy import text
+from sqlmodel import create_engine
+
+from app import db_instrumentation
+from app.db_instrumentation import TimedQueuePool, db_metrics, instrument_engine, track_request
+
+
+def test_request_stats_slow_query_log_and_pool_metrics(monkeypatch, capsys):
+    engine = instrument_engine(
+        create_engine("sqlite://", poolclass=TimedQueuePool, pool_size=2, max_overflow=0), "test"
+    )
+    monkeypatch.setattr(db_instrumentation, "DB_SLOW_QUERY_MS", 0)
+
+    stats = track_request()
+    with engine.connect() as conn:
+        conn.execute(text("SELECT :secret"), {"secret": "hunter2"})
+        conn.execute(text("SELECT 1"))
+
+    assert stats.queries == 2
+    assert stats.seconds > 0
+    assert stats.server_timing().endswith('desc="2 queries"')
+
+    log = capsys.readouterr().out
+    assert "[DB] Slow query on test" in log
+    assert "SELECT ? params=<1 redacted>" in log and "hunter2" not in log
+
+    pool = db_metrics()["test"]
+    assert pool["checkouts"] == 1 and pool["timeouts"] == 0
+    assert pool["size"] == 2 and pool["checked_out"] == 0
+    assert pool["slow_queries"] == 2
+
+
+def test_responses_carry_server_timing(client):
+    response = client.get("/")
+    assert response.headers["Server-Timing"].startswith("db;dur=")
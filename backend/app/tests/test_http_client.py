@@ -0,0 +1,57 @@
+import asyncio
+import httpx
+import pytest
+from app.http_client import HTTPClient
+
+
+def flaky_handler(failures):
+    calls = []
+
+    def handler(request):
+        calls.append(request.method)
+        if len(calls) <= failures:
+            return httpx.Response(503)
+        return httpx.Response(200, json={"ok": True})
+
+    return handler, calls
+
+
+def test_idempotent_requests_are_retried_with_metrics():
+    handler, calls = flaky_handler(failures=2)
+    client = HTTPClient(max_retries=2, backoff=0, async_transport=httpx.MockTransport(handler))
+
+    async def run():
+        try:
+            return await client.request("GET", "http://keycloak/roles", endpoint="realm_roles")
+        finally:
+            await client.aclose()
+
+    response = asyncio.run(run())
+    assert response.status_code == 200
+    assert calls == ["GET", "GET", "GET"]
+
+    stats = client.metrics()["realm_roles"]
+    assert stats["count"] == 1 and stats["retries"] == 2 and stats["errors"] == 0
+
+
+def test_non_idempotent_requests_are_not_retried_on_5xx():
+    handler, calls = flaky_handler(failures=1)
+    client = HTTPClient(max_retries=2, backoff=0, transport=httpx.MockTransport(handler))
+
+    response = client.request_sync("POST", "http://keycloak/users", endpoint="create_user", json={})
+    assert response.status_code == 503
+    assert calls == ["POST"]
+    assert client.metrics()["create_user"]["errors"] == 1
+
+
+def test_connection_errors_are_retried_then_raised():
+    attempts = []
+
+    def handler(request):
+        attempts.append(1)
+        raise httpx.ConnectError("refused", request=request)
+
+    client = HTTPClient(max_retries=1, backoff=0, transport=httpx.MockTransport(handler))
+    with pytest.raises(httpx.ConnectError):
+        client.request_sync("POST", "http://keycloak/token", endpoint="admin_token")
+    assert len(attempts) == 2
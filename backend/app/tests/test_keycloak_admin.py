@@ -0,0 +1,93 @@
+import asyncio
+import httpx
+from app.http_client import HTTPClient
+from app.keycloak_admin import KeycloakAdminSession
+
+
+def keycloak_transport(calls, expires_in=300):
+    async def handler(request):
+        calls.append(request.url.path)
+        await asyncio.sleep(0.01)
+        if request.url.path.endswith("/token"):
+            return httpx.Response(200, json={"access_token": f"token-{len(calls)}", "expires_in": expires_in})
+        return httpx.Response(200, json=[{"id": "1", "name": "Employee"}, {"id": "2", "name": "manager"}])
+
+    return httpx.MockTransport(handler)
+
+
+def test_admin_token_refresh_is_single_flight():
+    calls = []
+    session = KeycloakAdminSession(http=HTTPClient(async_transport=keycloak_transport(calls)))
+
+    async def run():
+        return await asyncio.gather(*(session.token() for _ in range(20)))
+
+    tokens = asyncio.run(run())
+    assert len(set(tokens)) == 1
+    assert len(calls) == 1
+
+    session.invalidate_token()
+    assert asyncio.run(session.token()) != tokens[0]
+    assert len(calls) == 2
+
+
+def test_short_lived_admin_token_is_reused():
+    # Master-realm default: the token lives exactly as long as the default margin
+    calls = []
+    session = KeycloakAdminSession(http=HTTPClient(async_transport=keycloak_transport(calls, expires_in=60)),
+                                   refresh_margin=60)
+
+    async def run():
+        session.start()
+        tokens = [await session.token()]
+        for _ in range(10):
+            await asyncio.sleep(0.1)
+            tokens.append(await session.token())
+        await session.stop()
+        return tokens
+
+    tokens = asyncio.run(run())
+    assert len(set(tokens)) == 1
+    assert len(calls) == 1
+
+
+def test_realm_roles_are_cached_by_lowercase_name():
+    calls = []
+    session = KeycloakAdminSession(http=HTTPClient(async_transport=keycloak_transport(calls)), roles_ttl=300)
+
+    async def run():
+        first = await session.realm_roles()
+        second = await session.realm_roles()
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert set(first) == {"employee", "manager"}
+    assert first["employee"]["id"] == "1"
+    assert second is first
+    assert [path.rsplit("/", 1)[-1] for path in calls] == ["token", "roles"]
+
+
+def test_admin_functions_against_fake_keycloak(monkeypatch):
+    from app import keycloak_admin
+    from app.benchmarks.fake_keycloak import FakeKeycloak
+
+    fake = FakeKeycloak(key_bits=1024)
+    http = HTTPClient(async_transport=httpx.ASGITransport(app=fake.app))
+    monkeypatch.setattr(keycloak_admin, "keycloak_http", http)
+    monkeypatch.setattr(keycloak_admin, "admin_session", KeycloakAdminSession(http=http))
+
+    async def run():
+        kc_id = await keycloak_admin.create_keycloak_user(
+            email="ana@corp.fr", username="ana", password="Temp1234",
+            first_name="Ana", last_name="Lopez", realm_roles=["Employee", "manager"],
+        )
+        assert await keycloak_admin.verify_user_password(kc_id, "Temp1234")
+        await keycloak_admin.change_keycloak_user_password(kc_id, "NewPass99")
+        assert not await keycloak_admin.verify_user_password(kc_id, "Temp1234")
+        assert await keycloak_admin.verify_user_password(kc_id, "NewPass99")
+        await keycloak_admin.delete_keycloak_user(kc_id)
+        return kc_id
+
+    kc_id = asyncio.run(run())
+    assert fake.role_mappings.get(kc_id) is None and kc_id not in fake.users
+    assert set(http.metrics()) >= {"admin_token", "create_user", "realm_roles", "password_grant"}
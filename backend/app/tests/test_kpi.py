@@ -0,0 +1,139 @@
+# backend/app/tests/test_kpi.py
+from datetime import datetime, timezone, timedelta
+from sqlmodel import select
+from app.models import Clock, Team, User, UserDailyKPI
+from app.kpi_engine import compute_kpi_summary, start_of_week_utc
+from app.kpi_rollup import compute_kpi_summary_from_rollup, rebuild_rollup
+from app.analytics import compute_breakdown
+
+NOW = datetime(2026, 10, 15, 14, 30, tzinfo=timezone.utc)  # Thursday
+
+
+def python_kpi_summary(session, now):
+    """Reference implementation: the original in-Python KPI loop."""
+    week_start = start_of_week_utc(now)
+    week_clocks = session.exec(select(Clock).where(Clock.clock_in >= week_start)).all()
+    completed = [c for c in week_clocks if c.clock_out is not None]
+
+    def utc(dt):
+        return dt.replace(tzinfo=timezone.utc)
+
+    total_hours = sum((utc(c.clock_out) - utc(c.clock_in)).total_seconds() / 3600.0 for c in completed)
+
+    late = [utc(c.clock_in) for c in week_clocks
+            if utc(c.clock_in).hour > 9 or (utc(c.clock_in).hour == 9 and utc(c.clock_in).minute > 0)]
+    overtime = [utc(c.clock_out) for c in completed
+                if utc(c.clock_out).hour > 17 or (utc(c.clock_out).hour == 17 and utc(c.clock_out).minute > 0)]
+
+    return {
+        "totalEmployees": len(session.exec(select(User)).all()),
+        "totalTeams": len(session.exec(select(Team)).all()),
+        "activeClocks": len([c for c in session.exec(select(Clock)).all() if c.clock_out is None]),
+        "totalHoursThisWeek": round(total_hours, 2),
+        "avgHoursPerShift": round(total_hours / len(completed), 2) if completed else 0.0,
+        "avgLateTimeMinutes": round(
+            sum((t - t.replace(hour=9, minute=0, second=0)).total_seconds() / 60.0 for t in late) / len(late), 1
+        ) if late else 0.0,
+        "avgOvertimeHours": round(
+            sum((t - t.replace(hour=17, minute=0, second=0)).total_seconds() / 3600.0 for t in overtime) / len(overtime), 2
+        ) if overtime else 0.0,
+    }
+
+
+def seed(session):
+    users = [
+        User(first_name=f"User{i}", last_name="Test", email=f"user{i}@test.fr",
+             keycloak_id=f"kc-{i}", realm_roles=["employee"])
+        for i in range(4)
+    ]
+    session.add_all(users)
+    session.add(Team(name="Ops", description="Operations"))
+    session.commit()
+
+    monday = start_of_week_utc(NOW)
+    shifts = [
+        (0, monday + timedelta(hours=8, minutes=45), monday + timedelta(hours=17)),
+        (0, monday + timedelta(days=1, hours=9, minutes=0, seconds=40), monday + timedelta(days=1, hours=17, minutes=0, seconds=50)),
+        (1, monday + timedelta(hours=9, minutes=17, seconds=12), monday + timedelta(hours=18, minutes=42)),
+        (1, monday + timedelta(days=2, hours=10, minutes=3), monday + timedelta(days=2, hours=19, minutes=5, seconds=9)),
+        (2, monday + timedelta(days=3, hours=9, minutes=31), None),
+        (3, monday - timedelta(days=2, hours=-9), monday - timedelta(days=2, hours=-18)),  # previous week
+        (3, monday - timedelta(days=1, hours=-8), None),  # stale open clock
+    ]
+    for idx, clock_in, clock_out in shifts:
+        session.add(Clock(user_id=users[idx].id, clock_in=clock_in, clock_out=clock_out))
+    session.commit()
+
+
+def test_kpi_summary_matches_python_reference(session):
+    seed(session)
+
+    expected = python_kpi_summary(session, NOW)
+    result = compute_kpi_summary(session, now=NOW)
+
+    assert result.model_dump() == expected
+    assert result.activeClocks == 2
+    assert result.avgLateTimeMinutes > 0
+    assert result.avgOvertimeHours > 0
+
+
+def test_kpi_summary_empty_database(session):
+    result = compute_kpi_summary(session, now=NOW)
+
+    assert result.totalEmployees == 0
+    assert result.totalHoursThisWeek == 0.0
+    assert result.avgLateTimeMinutes == 0.0
+
+
+def test_rollup_rebuild_matches_engine(session):
+    seed(session)
+
+    rows = rebuild_rollup(session)
+
+    assert rows > 0
+    assert compute_kpi_summary_from_rollup(session, now=NOW) == compute_kpi_summary(session, now=NOW)
+
+
+def test_rollup_updated_on_clock_toggle(client, session):
+    user = User(first_name="Léo", last_name="Dupont", email="leo@dupont.fr",
+                keycloak_id="kc-leo", realm_roles=["employee"])
+    session.add(user)
+    session.commit()
+
+    assert client.post("/clocks/", json={"user_id": user.id}).status_code == 200
+    assert client.post("/clocks/", json={"user_id": user.id}).status_code == 200
+
+    row = session.exec(select(UserDailyKPI).where(UserDailyKPI.user_id == user.id)).one()
+    assert row.shift_count == 1
+    assert row.worked_seconds >= 0
+
+
+def test_breakdown_by_user(session):
+    seed(session)
+    monday = start_of_week_utc(NOW)
+
+    result = compute_breakdown(session, monday, NOW, group_by="user")
+    by_label = {g.label: g for g in result.groups}
+
+    user1 = by_label["User1 Test"]
+    assert user1.shifts == 2
+    assert user1.lateShifts == 2
+    assert user1.overtimeShifts == 2
+    assert user1.latenessHistogram == [0, 0, 1, 0, 1]  # 17 min and 63 min late
+    assert user1.shiftHoursP50 == round((33888 + 32529) / 2 / 3600, 2)
+
+    user2 = by_label["User2 Test"]
+    assert (user2.shifts, user2.completedShifts, user2.shiftHoursP50) == (1, 0, None)
+    assert sum(g.shifts for g in result.groups) == 5
+
+
+def test_breakdown_accepts_naive_bounds(client, session):
+    seed(session)
+    start = datetime.now(timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+    response = client.get("/kpi/breakdown", params={"from": start.replace(tzinfo=None).isoformat()})
+    assert response.status_code == 200
+    assert response.json()["groupBy"] == "team"
+
+    response = client.get("/kpi/breakdown", params={"from": "2026-10-15T12:00:00", "to": "2026-10-15T12:00:00+02:00"})
+    assert response.status_code == 400
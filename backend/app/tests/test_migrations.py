@@ -0,0 +1,95 @@
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+import sqlalchemy as sa
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from sqlalchemy import inspect
+from sqlalchemy.dialects.postgresql import JSON
+from sqlmodel import SQLModel, create_engine
+
+from app.migrate import make_config
+
+# The schema create_all built before migrations existed (users, teams, clocks only)
+PRE_MIGRATIONS = sa.MetaData()
+sa.Table(
+    "users", PRE_MIGRATIONS,
+    sa.Column("id", sa.Integer, primary_key=True),
+    sa.Column("first_name", sa.VARCHAR, nullable=False),
+    sa.Column("last_name", sa.VARCHAR, nullable=False),
+    sa.Column("email", sa.VARCHAR, unique=True, nullable=False, index=True),
+    sa.Column("phone_number", sa.VARCHAR, unique=True, nullable=True),
+    sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+    sa.Column("keycloak_id", sa.VARCHAR, unique=True, nullable=False, index=True),
+    sa.Column("realm_roles", JSON, nullable=False),
+    sa.Column("team_id", sa.Integer, sa.ForeignKey("teams.id"), nullable=True),
+)
+sa.Table(
+    "teams", PRE_MIGRATIONS,
+    sa.Column("id", sa.Integer, primary_key=True),
+    sa.Column("name", sa.VARCHAR, unique=True, nullable=False),
+    sa.Column("description", sa.VARCHAR, nullable=False),
+    sa.Column("manager_id", sa.Integer, sa.ForeignKey("users.id"), nullable=True),
+    sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+)
+sa.Table(
+    "clocks", PRE_MIGRATIONS,
+    sa.Column("id", sa.Integer, primary_key=True),
+    sa.Column("user_id", sa.Integer, sa.ForeignKey("users.id"), nullable=False),
+    sa.Column("clock_in", sa.DateTime(timezone=True), nullable=False),
+    sa.Column("clock_out", sa.DateTime(timezone=True), nullable=True),
+)
+
+
+def _engine():
+    path = os.path.join(tempfile.mkdtemp(prefix="time-manager-migrations-"), "migrations.db")
+    return create_engine(f"sqlite:///{path}")
+
+
+def _assert_matches_models(engine):
+    with engine.connect() as conn:
+        assert compare_metadata(MigrationContext.configure(conn), SQLModel.metadata) == []
+
+
+def test_migrations_build_the_model_schema():
+    engine = _engine()
+    with engine.begin() as conn:
+        command.upgrade(make_config(conn), "head")
+
+    _assert_matches_models(engine)
+    with engine.connect() as conn:
+        indexes = {index["name"] for table in ("clocks", "users", "teams") for index in inspect(conn).get_indexes(table)}
+    assert {"ix_clocks_user_id_clock_in_id", "ix_clocks_clock_in_id", "ix_users_team_id", "ix_teams_manager_id",
+            "uq_clocks_open_per_user"} <= indexes
+
+    with engine.begin() as conn:
+        command.downgrade(make_config(conn), "base")
+    assert inspect(engine).get_table_names() == ["alembic_version"]
+
+
+def test_upgrade_of_a_pre_migrations_database():
+    engine = _engine()
+    PRE_MIGRATIONS.create_all(engine)
+    users, clocks = PRE_MIGRATIONS.tables["users"], PRE_MIGRATIONS.tables["clocks"]
+    start = datetime(2026, 3, 2, 9, 0)
+    with engine.begin() as conn:
+        conn.execute(users.insert(), [
+            {"first_name": "Ana", "last_name": "LOPEZ", "email": "ana@corp.fr", "created_at": start,
+             "keycloak_id": "kc-ana", "realm_roles": []},
+        ])
+        # Double open left by two concurrent taps
+        conn.execute(clocks.insert(), [
+            {"user_id": 1, "clock_in": start},
+            {"user_id": 1, "clock_in": start + timedelta(milliseconds=40)},
+        ])
+
+    with engine.begin() as conn:
+        command.upgrade(make_config(conn), "head")
+
+    _assert_matches_models(engine)
+    with engine.connect() as conn:
+        assert conn.execute(sa.text("SELECT count(*) FROM clocks WHERE clock_out IS NULL")).scalar() == 1
+        assert conn.execute(sa.text("SELECT count(*) FROM clocks")).scalar() == 2
+        assert conn.execute(sa.text("SELECT count(*) FROM users")).scalar() == 1
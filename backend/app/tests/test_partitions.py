@@ -0,0 +1,105 @@
+# backend/app/tests/test_partitions.py
+from datetime import date
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+from app.partitions import (
+    add_months, apply_retention, create_partition, ensure_future_partitions, partition_month, partition_name,
+)
+
+
+class RecordingConnection:
+    """PostgreSQL connection stand-in: records statements, answers the introspection queries."""
+
+    dialect = SimpleNamespace(name="postgresql")
+
+    def __init__(self, tables=(), partitions=()):
+        self.tables = set(tables)
+        self.partitions = list(partitions)
+        self.statements = []
+
+    def execute(self, statement, params=None):
+        sql = " ".join(str(statement).split())
+        if "to_regclass" in sql:
+            return Mock(scalar=Mock(return_value=params["name"] in self.tables))
+        if "pg_inherits" in sql:
+            return Mock(scalars=Mock(return_value=iter(self.partitions)))
+        self.statements.append(sql)
+        return Mock()
+
+
+def test_partition_naming_round_trip():
+    month = date(2026, 12, 1)
+
+    assert partition_name(month) == "clocks_y2026m12"
+    assert partition_month(partition_name(month)) == month
+    assert partition_month("clocks_default") is None
+
+
+def test_add_months_crosses_years():
+    assert add_months(date(2026, 11, 1), 3) == date(2027, 2, 1)
+    assert add_months(date(2026, 1, 1), -1) == date(2025, 12, 1)
+
+
+def test_create_partition():
+    conn = RecordingConnection()
+    assert create_partition(conn, date(2026, 12, 1)) == "clocks_y2026m12"
+    assert conn.statements == [
+        "CREATE TABLE clocks_y2026m12 PARTITION OF clocks "
+        "FOR VALUES FROM ('2026-12-01 00:00:00+00') TO ('2027-01-01 00:00:00+00')",
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_clocks_y2026m12_open_per_user "
+        "ON clocks_y2026m12 (user_id) WHERE clock_out IS NULL",
+    ]
+
+    # Existing partitions only get their index ensured
+    conn = RecordingConnection(tables={"clocks_y2026m12", "clocks_default"})
+    create_partition(conn, date(2026, 12, 1))
+    assert [sql.split(" ON ")[0] for sql in conn.statements] == [
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_clocks_y2026m12_open_per_user",
+    ]
+
+
+def test_create_partition_moves_rows_out_of_the_default_partition():
+    conn = RecordingConnection(tables={"clocks_default"})
+    create_partition(conn, date(2027, 3, 1))
+
+    assert conn.statements[:4] == [
+        "LOCK TABLE clocks_default IN SHARE ROW EXCLUSIVE MODE",
+        "CREATE TABLE clocks_y2027m03 (LIKE clocks INCLUDING DEFAULTS INCLUDING CONSTRAINTS)",
+        "WITH moved AS (DELETE FROM clocks_default "
+        "WHERE clock_in >= '2027-03-01 00:00:00+00' AND clock_in < '2027-04-01 00:00:00+00' "
+        "RETURNING id, user_id, clock_in, clock_out) "
+        "INSERT INTO clocks_y2027m03 (id, user_id, clock_in, clock_out) "
+        "SELECT id, user_id, clock_in, clock_out FROM moved",
+        "ALTER TABLE clocks ATTACH PARTITION clocks_y2027m03 "
+        "FOR VALUES FROM ('2027-03-01 00:00:00+00') TO ('2027-04-01 00:00:00+00')",
+    ]
+    assert conn.statements[4].startswith("CREATE UNIQUE INDEX IF NOT EXISTS uq_clocks_y2027m03_open_per_user")
+
+
+def test_ensure_future_partitions_covers_current_and_ahead_months():
+    conn = RecordingConnection()
+    created = ensure_future_partitions(conn, months_ahead=2, today=date(2026, 11, 15))
+    assert created == ["clocks_y2026m11", "clocks_y2026m12", "clocks_y2027m01"]
+
+
+def test_apply_retention_detaches_or_drops_expired_months():
+    partitions = ["clocks_default", "clocks_y2026m01", "clocks_y2026m02", "clocks_y2026m03", "clocks_y2026m06"]
+
+    conn = RecordingConnection(partitions=partitions)
+    assert apply_retention(conn, retention_months=3, mode="detach", today=date(2026, 6, 10)) == [
+        "clocks_y2026m01", "clocks_y2026m02",
+    ]
+    assert conn.statements == [
+        "ALTER TABLE clocks DETACH PARTITION clocks_y2026m01",
+        "ALTER TABLE clocks DETACH PARTITION clocks_y2026m02",
+    ]
+
+    conn = RecordingConnection(partitions=partitions)
+    apply_retention(conn, retention_months=3, mode="drop", today=date(2026, 6, 10))
+    assert conn.statements == [
+        "ALTER TABLE clocks DETACH PARTITION clocks_y2026m01", "DROP TABLE clocks_y2026m01",
+        "ALTER TABLE clocks DETACH PARTITION clocks_y2026m02", "DROP TABLE clocks_y2026m02",
+    ]
+
+    assert apply_retention(RecordingConnection(partitions=partitions), retention_months=0) == []
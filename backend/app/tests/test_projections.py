@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta, timezone
+
+from pydantic import TypeAdapter
+from sqlalchemy.orm import selectinload
+from sqlmodel import select
+
+from app.models import Clock, Team, User, UserPublic
+from app.pagination import paginate_clock_rows, paginate_clocks
+from app.responses import FastJSONResponse
+
+
+def seed(session):
+    users = [
+        User(first_name="Ana", last_name="Lopez", email="ana@corp.fr", keycloak_id="kc-ana",
+             phone_number="+33611112222", realm_roles=["manager"]),
+        User(first_name="Bob", last_name="Martin", email="bob@corp.fr", keycloak_id="kc-bob", realm_roles=["employee"]),
+        User(first_name="Cid", last_name="Petit", email="cid@corp.fr", keycloak_id="kc-cid", realm_roles=[]),
+    ]
+    session.add_all(users)
+    session.commit()
+    ana, bob, cid = users
+    team = Team(name="Ops", description="Operations", manager_id=ana.id)
+    session.add(team)
+    session.commit()
+    bob.team_id = team.id
+    session.add(bob)
+
+    start = datetime(2026, 3, 2, 8, 0, tzinfo=timezone.utc)
+    for day in range(5):
+        for user in users:
+            clock_in = start + timedelta(days=day, minutes=user.id)
+            session.add(Clock(user_id=user.id, clock_in=clock_in, clock_out=clock_in + timedelta(hours=8)))
+    session.add(Clock(user_id=cid.id, clock_in=start + timedelta(days=6)))
+    session.commit()
+    return team, users
+
+
+def test_clock_projection_matches_orm_pages(session):
+    team, (ana, bob, cid) = seed(session)
+
+    for filters in ({}, {"user_id": cid.id}, {"team_id": team.id}, {"start": datetime(2026, 3, 4, tzinfo=timezone.utc)}):
+        cursor = None
+        while True:
+            projected = paginate_clock_rows(session, cursor=cursor, limit=4, **filters)
+            orm = paginate_clocks(session, cursor=cursor, limit=4, **filters)
+            assert FastJSONResponse(projected).body == FastJSONResponse(orm.model_dump(mode="json")).body
+            if orm.next_cursor is None:
+                break
+            cursor = orm.next_cursor
+
+
+def test_read_users_projection_matches_user_public(client, session):
+    seed(session)
+    db_users = session.exec(
+        select(User).options(selectinload(User.team), selectinload(User.managed_team)).order_by(User.id)
+    ).all()
+    adapter = TypeAdapter(list[UserPublic])
+    expected = adapter.dump_python(adapter.validate_python(db_users, from_attributes=True), mode="json")
+
+    response = client.get("/users/")
+    assert response.json() == expected
+    assert [(u["team"], u["managed_team"]) for u in expected][:2] == [
+        (None, {"id": 1, "name": "Ops"}), ({"id": 1, "name": "Ops"}, None),
+    ]
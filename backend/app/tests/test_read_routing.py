@@ -0,0 +1,89 @@
+import asyncio
+import os
+import tempfile
+
+from sqlalchemy.ext.asyncio import create_async_engine
+from starlette.requests import Request
+
+from app import read_routing
+from app.models import Team, User
+from app.read_routing import ReplicaRouter, get_read_session, replica_router
+
+PRIMARY, REPLICA = object(), object()
+
+
+def make_request(path_params=None, query_string=b""):
+    return Request({"type": "http", "path_params": path_params or {}, "query_string": query_string, "headers": []})
+
+
+def test_replica_routing_rules():
+    router = ReplicaRouter(PRIMARY, REPLICA, max_lag=5, read_your_writes=60)
+    assert router.engine_for(1) is REPLICA
+
+    # Read-your-writes: only the user who toggled is pinned to the primary
+    router.note_writes([1])
+    assert router.engine_for(1) is PRIMARY
+    assert router.engine_for(2) is REPLICA
+    assert router.engine_for(None) is REPLICA
+
+    # Teams are keyed apart from users: team 1 is not user 1
+    router.note_writes(team_ids=[2, None])
+    assert router.engine_for(2, team_id=2) is PRIMARY
+    assert router.engine_for(None, team_id=1) is REPLICA
+
+    router.lag = 12  # replica behind
+    assert router.engine_for(2) is PRIMARY
+    router.lag = 0.5
+    router.mark_down("connection refused")
+    assert router.engine_for(2) is PRIMARY
+
+    assert ReplicaRouter(PRIMARY, None).engine_for(2) is PRIMARY
+
+    expired = ReplicaRouter(PRIMARY, REPLICA, read_your_writes=0)
+    expired.note_writes([1])
+    assert expired.engine_for(1) is REPLICA
+
+
+def test_read_session_falls_back_to_primary_when_replica_is_down(monkeypatch):
+    directory = tempfile.mkdtemp()
+    primary = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(directory, 'primary.db')}")
+    unreachable = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(directory, 'missing', 'replica.db')}")
+    router = ReplicaRouter(primary, unreachable)
+    monkeypatch.setattr(read_routing, "replica_router", router)
+
+    async def run():
+        assert await router.check() is None  # unreachable: marked down
+        assert not router.replica_usable()
+        router._down_until = 0.0  # retry window over, but the replica is still down
+
+        sessions = get_read_session(make_request(query_string=b"user_id=3"))
+        session = await sessions.__anext__()
+        bind = session.bind
+        await sessions.aclose()
+        await primary.dispose()
+        return bind
+
+    assert asyncio.run(run()) is primary
+    assert router.stats()["primary_reads"] == 1
+    assert not router.replica_usable()
+
+
+def test_user_and_team_writes_pin_the_following_reads(client, session):
+    member = User(first_name="Ana", last_name="Lopez", email="ana@corp.fr", keycloak_id="kc-ana")
+    team = Team(name="Support", description="Level 1")
+    session.add_all([member, team])
+    session.commit()
+
+    assert client.put(f"/users/{member.id}", json={"first_name": "Anna"}).status_code == 200
+    assert replica_router._recently_wrote(("user", member.id))
+
+    replica_router._recent_writes.clear()
+    assert client.post(f"/teams/{team.id}/members/{member.id}").status_code == 200
+    assert replica_router._recently_wrote(("user", member.id))
+    assert replica_router._recently_wrote(("team", team.id))
+
+    replica_router._recent_writes.clear()
+    assert client.delete(f"/teams/{team.id}/members/{member.id}").status_code == 200
+    assert replica_router._recently_wrote(("user", member.id))
+    assert replica_router._recently_wrote(("team", team.id))
+    replica_router._recent_writes.clear()
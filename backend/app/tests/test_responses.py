@@ -0,0 +1,32 @@
+from datetime import datetime, timedelta, timezone
+
+import orjson
+from pydantic import TypeAdapter
+
+from app.models import ClockPublic, User
+from app.responses import FastJSONResponse
+
+
+def test_datetimes_render_like_pydantic():
+    adapter = TypeAdapter(datetime)
+    for value in (
+        datetime(2026, 3, 2, 8, 0, 0, 123, tzinfo=timezone.utc),
+        datetime(2026, 3, 2, 10, 0, tzinfo=timezone(timedelta(hours=2))),
+        datetime(2026, 3, 2, 8, 0),
+    ):
+        assert FastJSONResponse(value).body == adapter.dump_json(value)
+    assert FastJSONResponse(None).body == b"null"
+
+
+def test_app_default_response_class(client, session):
+    user = User(first_name="Ana", last_name="Lopez", email="ana@corp.fr", keycloak_id="kc-ana", realm_roles=[])
+    session.add(user)
+    session.commit()
+    opened = client.post("/clocks/", json={"user_id": user.id})
+
+    assert opened.headers["content-type"] == "application/json"
+    clock = ClockPublic.model_validate(orjson.loads(opened.content))
+    assert clock.user_id == user.id and clock.clock_out is None
+    # response_model routes and projections encode clock_in identically
+    page = client.get(f"/users/{user.id}/clocks/").json()
+    assert page["items"][0]["clock_in"] == opened.json()["clock_in"]
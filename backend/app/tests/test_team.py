@@ -14,3 +14,58 @@ def test_team_relationships(session):
 
     assert team.manager_id == manager.id
     assert team.name == "Developers"
+
+
+def seed_teams(session, count, members_per_team=3):
+    start = session.query(Team).count()
+    teams = []
+    for i in range(start, start + count):
+        manager = User(first_name="Manager", last_name=str(i), email=f"manager{i}@corp.fr",
+                       keycloak_id=f"kc-manager-{i}", realm_roles=["manager"])
+        members = [
+            User(first_name="Member", last_name=f"{i}-{j}", email=f"member{i}-{j}@corp.fr",
+                 keycloak_id=f"kc-member-{i}-{j}", realm_roles=["employee"])
+            for j in range(members_per_team)
+        ]
+        team = Team(name=f"Team {i}", description="Load", manager=manager, members=members)
+        session.add(team)
+        teams.append(team)
+    session.commit()
+    return teams
+
+
+def test_team_listing_query_count_is_constant(client, session, query_log):
+    seed_teams(session, 2)
+    assert len(client.get("/teams/").json()) == 2
+    small = len(query_log)
+
+    seed_teams(session, 40)
+    query_log.clear()
+    teams = client.get("/teams/").json()
+
+    assert len(teams) == 42
+    assert all(t["manager"] and len(t["members"]) == 3 for t in teams)
+    assert len(query_log) == small == 2  # teams JOIN manager, then members IN (...)
+
+
+def test_member_changes_do_not_reload_the_team(client, session, query_log):
+    team = seed_teams(session, 1)[0]
+    newcomer = User(first_name="New", last_name="Comer", email="new@corp.fr",
+                    keycloak_id="kc-new", realm_roles=["employee"])
+    session.add(newcomer)
+    session.commit()
+
+    added = client.post(f"/teams/{team.id}/members/{newcomer.id}").json()
+    assert newcomer.id in [m["id"] for m in added["members"]]
+    update = next(i for i, sql in enumerate(query_log) if sql.startswith("UPDATE users"))
+    assert not any(sql.startswith("SELECT") for sql in query_log[update:])
+
+    query_log.clear()
+    removed = client.delete(f"/teams/{team.id}/members/{newcomer.id}").json()
+    assert newcomer.id not in [m["id"] for m in removed["members"]]
+    assert len(removed["members"]) == 3
+    update = next(i for i, sql in enumerate(query_log) if sql.startswith("UPDATE users"))
+    assert not any(sql.startswith("SELECT") for sql in query_log[update:])
+
+    session.expire_all()
+    assert session.get(User, newcomer.id).team_id is None
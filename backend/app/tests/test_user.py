@@ -31,3 +31,52 @@ def test_create_user_endpoint(client):
     assert data["first_name"] == "Bob"
     assert data["last_name"] == "MARLEY"  # ✅ your model converts the name to uppercase
     assert data["email"] == "bob@marley.com"
+
+
+def test_bulk_user_import(client, session, monkeypatch):
+    from app import user_provisioning
+    from app.auth import get_current_user
+    from app.main import app
+    from app.models import UserPublic
+
+    app.dependency_overrides[get_current_user] = lambda: UserPublic(
+        id=0, email="org@corp.fr", first_name="Org", last_name="ADMIN", phone_number=None,
+        created_at="2026-01-01T00:00:00Z", keycloak_id="kc-org", realm_roles=["organization"],
+    )
+    created = []
+
+    async def fake_create_keycloak_user(email, **kwargs):
+        if email == "fail@corp.fr":
+            raise Exception("Keycloak unavailable")
+        created.append(email)
+        return f"kc-{email}"
+
+    monkeypatch.setattr(user_provisioning, "create_keycloak_user", fake_create_keycloak_user)
+
+    session.add(User(first_name="Existing", last_name="User", email="taken@corp.fr",
+                     phone_number="+33611111111", keycloak_id="kc-taken", realm_roles=[]))
+    session.commit()
+
+    csv_body = (
+        "first_name,last_name,email,phone_number,realm_roles\n"
+        "Ana,Lopez,Ana@Corp.fr,+33622222222,employee;manager\n"
+        "Ben,Roy,ben@corp.fr,+33633333333,employee\n"
+        "Ana,Twice,ana@corp.fr,+33644444444,\n"
+        "Tom,Taken,taken@corp.fr,+33655555555,\n"
+        "Fay,Fail,fail@corp.fr,+33666666666,\n"
+        "Bad,Email,not-an-email,+33677777777,\n"
+    )
+    response = client.post("/users/bulk", content=csv_body, headers={"Content-Type": "text/csv"})
+    app.dependency_overrides.pop(get_current_user, None)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["created"], body["rejected"], body["failed"]) == (2, 3, 1)
+    statuses = [r["status"] for r in body["results"]]
+    assert statuses == ["created", "created", "rejected", "rejected", "failed", "rejected"]
+    assert body["results"][0]["temp_password"].startswith("Bank")
+    assert sorted(created) == ["ana@corp.fr", "ben@corp.fr"]
+
+    ana = session.get(User, body["results"][0]["user_id"])
+    assert ana.keycloak_id == "kc-ana@corp.fr"
+    assert ana.realm_roles == ["employee", "manager"]
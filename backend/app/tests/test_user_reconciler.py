@@ -0,0 +1,97 @@
+import asyncio
+from sqlmodel import select
+from app.auth import business_roles
+from app.models import User
+from app.user_reconciler import reconcile_users
+
+
+class FakeAdmin:
+    def __init__(self, users, role_members):
+        self.users = users
+        self.role_members = role_members
+        self.calls = []
+
+    async def get_json(self, path, *, endpoint, params=None):
+        self.calls.append((path, params["first"]))
+        if path == "/users":
+            items = self.users
+        else:
+            items = self.role_members.get(path.split("/")[2], [])
+        return items[params["first"]:params["first"] + params["max"]]
+
+
+def kc_user(kc_id, email, first, last, phone=None):
+    user = {"id": kc_id, "email": email, "firstName": first, "lastName": last}
+    if phone:
+        user["attributes"] = {"phone_number": [phone]}
+    return user
+
+
+def test_reconcile_creates_updates_and_reports(session):
+    session.add_all([
+        User(first_name="Ana", last_name="Old", email="ana@corp.fr", keycloak_id="kc-ana", realm_roles=["employee"]),
+        User(first_name="Gone", last_name="User", email="gone@corp.fr", keycloak_id="kc-gone", realm_roles=[]),
+        User(first_name="Manual", last_name="User", email="manual@corp.fr", keycloak_id="manual-1", realm_roles=[]),
+    ])
+    session.commit()
+
+    admin = FakeAdmin(
+        users=[
+            kc_user("kc-ana", "ana@corp.fr", "Ana", "Lopez"),
+            kc_user("kc-ben", "Ben@Corp.fr", "Ben", "Roy", "+33633333333"),
+            kc_user("kc-dup", "manual@corp.fr", "Dup", "Email"),
+        ],
+        role_members={
+            "employee": [{"id": "kc-ana"}, {"id": "kc-ben"}],
+            "manager": [{"id": "kc-ana"}],
+        },
+    )
+
+    dry = asyncio.run(reconcile_users(session.get_bind(), admin=admin, dry_run=True))
+    assert (dry["created"], dry["updated"], dry["conflicts"], dry["orphans"]) == (1, 1, 1, 1)
+    assert session.exec(select(User).where(User.keycloak_id == "kc-ben")).first() is None
+
+    stats = asyncio.run(reconcile_users(session.get_bind(), admin=admin, dry_run=False))
+    assert stats["created"] == 1 and stats["updated"] == 1
+    assert {"fetch_seconds", "diff_seconds", "apply_seconds"} <= set(stats)
+
+    session.expire_all()
+    ana = session.exec(select(User).where(User.keycloak_id == "kc-ana")).one()
+    assert (ana.last_name, ana.realm_roles) == ("Lopez", ["employee", "manager"])
+    ben = session.exec(select(User).where(User.keycloak_id == "kc-ben")).one()
+    assert (ben.email, ben.phone_number, ben.realm_roles) == ("ben@corp.fr", "+33633333333", ["employee"])
+
+    again = asyncio.run(reconcile_users(session.get_bind(), admin=admin, dry_run=False))
+    assert again["created"] == again["updated"] == 0
+
+
+def test_reconcile_pages_through_keycloak(session):
+    users = [kc_user(f"kc-{i}", f"user{i}@corp.fr", "User", str(i)) for i in range(5)]
+    admin = FakeAdmin(users=users, role_members={})
+
+    from app.user_reconciler import fetch_keycloak_users
+    fetched = asyncio.run(fetch_keycloak_users(admin, page_size=2))
+    assert len(fetched) == 5
+    assert [first for path, first in admin.calls if path == "/users"] == [0, 2, 4]
+
+
+def test_reconcile_compares_roles_and_phones_in_stored_form(session):
+    session.add(User(first_name="Ana", last_name="Lopez", email="ana@corp.fr", phone_number="+33633333333",
+                     keycloak_id="kc-ana", realm_roles=["manager", "employee"]))
+    session.commit()
+    admin = FakeAdmin(
+        users=[kc_user("kc-ana", "ana@corp.fr", "Ana", "Lopez", "06 33 33 33 33")],
+        role_members={"manager": [{"id": "kc-ana"}], "employee": [{"id": "kc-ana"}]},
+    )
+
+    # Token order and formatting differ from Keycloak's: nothing to update
+    stats = asyncio.run(reconcile_users(session.get_bind(), admin=admin, dry_run=False))
+    assert stats["updated"] == 0
+    assert business_roles(["manager", "employee", "offline_access", "manager"]) == ["employee", "manager"]
+
+    admin.users = [kc_user("kc-ana", "ana@corp.fr", "Ana", "Lopez", "06 44 44 44 44")]
+    stats = asyncio.run(reconcile_users(session.get_bind(), admin=admin, dry_run=False))
+    assert stats["updated"] == 1
+    session.expire_all()
+    ana = session.exec(select(User).where(User.keycloak_id == "kc-ana")).one()
+    assert (ana.phone_number, ana.realm_roles) == ("+33644444444", ["manager", "employee"])
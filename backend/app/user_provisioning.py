@@ -0,0 +1,197 @@
+"""
+Bulk user provisioning (onboarding a whole branch at once).
+
+Rows come from JSON or CSV and are validated up front: schema errors,
+duplicates inside the file, and emails / phone numbers already in the
+database (one IN query). Valid rows are created in Keycloak with
+bounded concurrency, then inserted into users in one multi-row INSERT.
+"""
+import asyncio
+import csv
+import io
+import os
+import secrets
+import string
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from pydantic import ValidationError
+from sqlalchemy import insert, or_
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.keycloak_admin import create_keycloak_user, delete_keycloak_user
+from app.models import User, UserCreate, UserImportRowResult, UserImportResult
+
+MAX_IMPORT_ROWS = 1000
+KEYCLOAK_BULK_CONCURRENCY = int(os.getenv("KEYCLOAK_BULK_CONCURRENCY", "8"))
+
+CSV_ROLE_SEPARATOR = ";"
+
+
+# ==========================================
+# HELPERS SHARED WITH POST /users/
+# ==========================================
+def generate_temp_password() -> str:
+    """
+    Format: Bank{year}{special_char}{5_random_chars}
+    Uses secrets for cryptographically secure random generation.
+    """
+    special_chars = '@#$%&'
+    year = datetime.now().year
+    # Alphabet without ambiguous characters (i, I, l, L, o, O, 0, 1)
+    alphabet = (
+        string.ascii_letters.replace('i', '').replace('I', '').replace('l', '').replace('L', '').replace('o', '').replace('O', '') +
+        string.digits.replace('0', '').replace('1', '')
+    )
+    random_chars = ''.join(secrets.choice(alphabet) for _ in range(5))
+    random_special = secrets.choice(special_chars)
+    return f"Bank{year}{random_special}{random_chars}"
+
+
+def keycloak_username(user: UserCreate) -> str:
+    # Use email as username if keycloak_id is not provided or is a placeholder
+    if not user.keycloak_id or user.keycloak_id.startswith('manual-'):
+        return user.email.split('@')[0]
+    return user.keycloak_id
+
+
+# ==========================================
+# PARSING / VALIDATION
+# ==========================================
+def parse_csv_rows(body: str) -> List[dict]:
+    """CSV with a header row; realm_roles are separated by ';'."""
+    rows = []
+    for row in csv.DictReader(io.StringIO(body)):
+        row = {key.strip(): (value or "").strip() for key, value in row.items() if key}
+        roles = row.get("realm_roles", "")
+        row["realm_roles"] = [r.strip() for r in roles.split(CSV_ROLE_SEPARATOR) if r.strip()]
+        rows.append(row)
+    return rows
+
+
+class _Row:
+    def __init__(self, index: int, user: UserCreate):
+        self.index = index
+        self.user = user
+        self.temp_password = generate_temp_password()
+        self.keycloak_id: Optional[str] = None
+        self.error: Optional[str] = None
+
+
+def _validate(session: Session, raw_rows: List[dict], results: dict) -> List[_Row]:
+    def reject(index, email, detail):
+        results[index] = UserImportRowResult(index=index, email=email, status="rejected", detail=detail)
+
+    candidates = []
+    for index, raw in enumerate(raw_rows):
+        try:
+            user = UserCreate.model_validate(raw)
+        except ValidationError as e:
+            errors = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+            reject(index, raw.get("email") if isinstance(raw, dict) else None, errors)
+            continue
+        user.email = user.email.strip().lower()
+        user.phone_number = user.phone_number.strip() or None
+        candidates.append(_Row(index, user))
+
+    emails = {row.user.email for row in candidates}
+    phones = {row.user.phone_number for row in candidates if row.user.phone_number}
+    taken_emails, taken_phones = set(), set()
+    if candidates:
+        for email, phone in session.exec(
+            select(User.email, User.phone_number).where(
+                or_(User.email.in_(emails), User.phone_number.in_(phones))
+            )
+        ).all():
+            taken_emails.add(email)
+            taken_phones.add(phone)
+
+    valid = []
+    seen_emails, seen_phones = set(), set()
+    for row in candidates:
+        email, phone = row.user.email, row.user.phone_number
+        if email in taken_emails or (phone and phone in taken_phones):
+            reject(row.index, email, "User already exists")
+        elif email in seen_emails or (phone and phone in seen_phones):
+            reject(row.index, email, "Duplicate email or phone number in import")
+        else:
+            valid.append(row)
+        seen_emails.add(email)
+        if phone:
+            seen_phones.add(phone)
+    return valid
+
+
+# ==========================================
+# IMPORT
+# ==========================================
+async def _create_in_keycloak(rows: List[_Row]):
+    semaphore = asyncio.Semaphore(KEYCLOAK_BULK_CONCURRENCY)
+
+    async def create(row: _Row):
+        async with semaphore:
+            try:
+                row.keycloak_id = await create_keycloak_user(
+                    email=row.user.email,
+                    username=keycloak_username(row.user),
+                    password=row.temp_password,
+                    first_name=row.user.first_name,
+                    last_name=row.user.last_name,
+                    phone_number=row.user.phone_number,
+                    realm_roles=row.user.realm_roles,
+                )
+            except Exception as e:
+                row.error = str(e)
+
+    await asyncio.gather(*(create(row) for row in rows))
+
+
+async def import_users(session: AsyncSession, raw_rows: List[dict]) -> UserImportResult:
+    results = {}
+    valid = await session.run_sync(_validate, raw_rows, results)
+
+    await _create_in_keycloak(valid)
+    created = [row for row in valid if row.keycloak_id is not None]
+    for row in valid:
+        if row.error is not None:
+            results[row.index] = UserImportRowResult(
+                index=row.index, email=row.user.email, status="failed",
+                detail=f"Failed to create user in Keycloak: {row.error}",
+            )
+
+    if created:
+        now = datetime.now(timezone.utc)
+        try:
+            user_ids = (await session.exec(
+                insert(User).returning(User.id, sort_by_parameter_order=True),
+                params=[
+                    {**row.user.model_dump(), "keycloak_id": row.keycloak_id, "created_at": now}
+                    for row in created
+                ],
+            )).scalars().all()
+            await session.commit()
+        except IntegrityError:
+            # Lost a race with a concurrent create: undo the Keycloak side
+            await session.rollback()
+            await asyncio.gather(*(delete_keycloak_user(row.keycloak_id) for row in created))
+            for row in created:
+                results[row.index] = UserImportRowResult(
+                    index=row.index, email=row.user.email, status="failed",
+                    detail="Conflicts with a concurrent user change, retry",
+                )
+        else:
+            for row, user_id in zip(created, user_ids):
+                results[row.index] = UserImportRowResult(
+                    index=row.index, email=row.user.email, status="created",
+                    user_id=user_id, keycloak_id=row.keycloak_id, temp_password=row.temp_password,
+                )
+
+    ordered = [results[i] for i in range(len(raw_rows))]
+    return UserImportResult(
+        created=sum(r.status == "created" for r in ordered),
+        rejected=sum(r.status == "rejected" for r in ordered),
+        failed=sum(r.status == "failed" for r in ordered),
+        results=ordered,
+    )
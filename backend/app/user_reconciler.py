@@ -0,0 +1,205 @@
+"""
+Keycloak -> users table reconciliation.
+
+Pages through the Keycloak admin users API, reads realm role members
+once per business role, diffs everything against users by keycloak_id
+and applies the changes in bulk (one INSERT for new users, one
+executemany UPDATE for changed ones). Users that exist only in the
+database are reported, never deleted.
+
+Runs every RECONCILE_INTERVAL_MINUTES from the scheduler, or by hand:
+    docker exec -it backend python -m app.user_reconciler [--dry-run]
+"""
+import argparse
+import asyncio
+import os
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import bindparam, insert, update
+from sqlmodel import Session, select
+
+from app.auth import BUSINESS_ROLES, business_roles
+from app.database import engine
+from app.keycloak_admin import admin_session
+from app.models import User
+
+load_dotenv()
+
+RECONCILE_PAGE_SIZE = int(os.getenv("RECONCILE_PAGE_SIZE", "500"))
+RECONCILE_INTERVAL_MINUTES = int(os.getenv("RECONCILE_INTERVAL_MINUTES", "15"))
+RECONCILE_DRY_RUN = os.getenv("RECONCILE_DRY_RUN", "false").lower() == "true"
+
+UPDATED_COLUMNS = ("email", "phone_number", "first_name", "last_name", "realm_roles")
+
+
+# ==========================================
+# KEYCLOAK SIDE
+# ==========================================
+async def _paged(admin, path: str, endpoint: str, page_size: int, params=None) -> List[dict]:
+    items, first = [], 0
+    while True:
+        page = await admin.get_json(
+            path, endpoint=endpoint, params={**(params or {}), "first": first, "max": page_size}
+        )
+        items.extend(page)
+        if len(page) < page_size:
+            return items
+        first += page_size
+
+
+async def fetch_keycloak_users(admin=admin_session, page_size: int = RECONCILE_PAGE_SIZE) -> Dict[str, dict]:
+    """keycloak_id -> user representation, with business realm roles under "roles"."""
+    users = await _paged(admin, "/users", "reconcile_users", page_size, {"briefRepresentation": "false"})
+    by_id = {user["id"]: {**user, "roles": []} for user in users}
+
+    # One paged listing per business role instead of one role lookup per user
+    role_members = await asyncio.gather(*(
+        _paged(admin, f"/roles/{role}/users", "reconcile_role_members", page_size)
+        for role in sorted(BUSINESS_ROLES)
+    ))
+    for role, members in zip(sorted(BUSINESS_ROLES), role_members):
+        for member in members:
+            if member["id"] in by_id:
+                by_id[member["id"]]["roles"].append(role)
+    return by_id
+
+
+def _phone(value) -> Optional[str]:
+    """E.164 as User.validate_phone stores it; unparsable numbers are dropped."""
+    try:
+        return User.validate_phone(value)
+    except ValueError:
+        return None
+
+
+def _db_values(kc_user: dict) -> dict:
+    phones = (kc_user.get("attributes") or {}).get("phone_number") or [None]
+    return {
+        "email": (kc_user.get("email") or f"{kc_user['id']}@unknown.local").lower(),
+        "first_name": kc_user.get("firstName") or "",
+        "last_name": kc_user.get("lastName") or "",
+        "phone_number": _phone(phones[0]),
+        "realm_roles": business_roles(kc_user["roles"]),
+    }
+
+
+# ==========================================
+# DIFF / APPLY
+# ==========================================
+def plan_changes(session: Session, kc_users: Dict[str, dict]) -> dict:
+    rows = session.exec(
+        select(User.keycloak_id, User.email, User.phone_number, User.first_name, User.last_name, User.realm_roles)
+    ).all()
+    db_users = {row.keycloak_id: row for row in rows}
+    emails = {row.email: row.keycloak_id for row in rows}
+    # Stored numbers in E.164 too, parsed once
+    stored_phones = {row.keycloak_id: _phone(row.phone_number) for row in rows if row.phone_number}
+    phones = {phone: keycloak_id for keycloak_id, phone in stored_phones.items() if phone}
+
+    creates, updates, conflicts = [], [], []
+    for keycloak_id, kc_user in kc_users.items():
+        values = _db_values(kc_user)
+        current = db_users.get(keycloak_id)
+
+        if current is None:
+            if values["email"] in emails or (values["phone_number"] and values["phone_number"] in phones):
+                conflicts.append(keycloak_id)
+                continue
+            creates.append({"keycloak_id": keycloak_id, **values})
+            emails[values["email"]] = keycloak_id
+            if values["phone_number"]:
+                phones[values["phone_number"]] = keycloak_id
+            continue
+
+        changes = {
+            col: values[col]
+            for col in ("first_name", "last_name")
+            if getattr(current, col) != values[col]
+        }
+        # Compared in stored form, as auth.get_current_user does
+        if business_roles(current.realm_roles or []) != values["realm_roles"]:
+            changes["realm_roles"] = values["realm_roles"]
+        if values["email"] != current.email:
+            if emails.get(values["email"], keycloak_id) != keycloak_id:
+                conflicts.append(keycloak_id)
+            else:
+                changes["email"] = values["email"]
+        # A number missing in Keycloak keeps the stored one
+        if values["phone_number"] and values["phone_number"] != stored_phones.get(keycloak_id):
+            if phones.get(values["phone_number"], keycloak_id) != keycloak_id:
+                conflicts.append(keycloak_id)
+            else:
+                changes["phone_number"] = values["phone_number"]
+        if changes:
+            # Full rows so one executemany UPDATE covers every changed user
+            updates.append({
+                "keycloak_id": keycloak_id,
+                **{col: changes.get(col, getattr(current, col)) for col in UPDATED_COLUMNS},
+            })
+
+    orphans = [
+        keycloak_id for keycloak_id in db_users
+        if keycloak_id and not keycloak_id.startswith("manual-") and keycloak_id not in kc_users
+    ]
+    return {"creates": creates, "updates": updates, "conflicts": conflicts, "orphans": orphans}
+
+
+def apply_plan(session: Session, plan: dict):
+    if plan["creates"]:
+        now = datetime.now(timezone.utc)
+        session.exec(insert(User), params=[{**row, "created_at": now} for row in plan["creates"]])
+
+    if plan["updates"]:
+        users = User.__table__
+        session.exec(
+            update(users)
+            .where(users.c.keycloak_id == bindparam("b_keycloak_id"))
+            .values({col: bindparam(f"b_{col}") for col in UPDATED_COLUMNS}),
+            params=[{f"b_{key}": value for key, value in row.items()} for row in plan["updates"]],
+        )
+    session.commit()
+
+
+async def reconcile_users(bind=None, admin=admin_session, dry_run: bool = RECONCILE_DRY_RUN) -> dict:
+    """Fetch, diff and (unless dry_run) apply. Returns counts and timings."""
+    started = time.perf_counter()
+    kc_users = await fetch_keycloak_users(admin)
+    fetched = time.perf_counter()
+
+    def diff_and_apply():
+        with Session(bind or engine) as session:
+            plan = plan_changes(session, kc_users)
+            planned = time.perf_counter()
+            if not dry_run:
+                apply_plan(session, plan)
+            return plan, planned
+
+    plan, planned = await asyncio.to_thread(diff_and_apply)
+    done = time.perf_counter()
+
+    return {
+        "dry_run": dry_run,
+        "keycloak_users": len(kc_users),
+        "created": len(plan["creates"]),
+        "updated": len(plan["updates"]),
+        "conflicts": len(plan["conflicts"]),
+        "orphans": len(plan["orphans"]),
+        "fetch_seconds": round(fetched - started, 3),
+        "diff_seconds": round(planned - fetched, 3),
+        "apply_seconds": round(done - planned, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconcile the users table with Keycloak.")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would change")
+    args = parser.parse_args()
+
+    print(asyncio.run(reconcile_users(dry_run=args.dry_run)))
+
+
+if __name__ == "__main__":
+    main()
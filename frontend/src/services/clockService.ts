@@ -1,5 +1,26 @@
 import { api } from '@/lib/api'
-import type { Clock, ClockInOutCreatePayload } from '@/types/clock'
+import type { Clock, ClockInOutCreatePayload, ClockPage } from '@/types/clock'
+
+/**
+ * Follow next_cursor on a paginated clock listing and return every item
+ */
+export async function fetchAllClockPages(path: string, authToken?: string | null) {
+  const clocks: Clock[] = []
+  let cursor: string | null = null
+
+  do {
+    const params = new URLSearchParams({ limit: '1000' })
+    if (cursor) params.set('cursor', cursor)
+    const page: ClockPage = await api<ClockPage>(`${path}?${params}`, {
+      method: 'GET',
+      authToken,
+    })
+    clocks.push(...page.items)
+    cursor = page.next_cursor
+  } while (cursor)
+
+  return clocks
+}
 
 /**
  * POST /clocks/
@@ -21,13 +42,10 @@ export async function createClockInOut(
 
 /**
  * GET /clocks
- * Return all clocks
+ * Return all clocks (walks every page)
  */
 export async function getClocks(authToken?: string | null) {
-  return api<Clock[]>(`/clocks/`, {
-    method: 'GET',
-    authToken,
-  })
+  return fetchAllClockPages(`/clocks/`, authToken)
 }
 
 /**
@@ -1,7 +1,7 @@
 import { api } from '@/lib/api'
 import type { User, UserUpdatePayload, UserRole } from '@/types/user'
 import { UserRole as UserRoleEnum } from '@/types/user'
-import type { Clock } from '@/types/clock'
+import { fetchAllClockPages } from '@/services/clockService'
 
 export interface UserCreatePayload {
   first_name: string
@@ -117,10 +117,7 @@ export async function updateUser(
  * Return all users clocks
  */
 export async function getUserClocks(userId: number, authToken?: string | null) {
-  return api<Clock[]>(`/users/${userId}/clocks/`, {
-    method: 'GET',
-    authToken,
-  })
+  return fetchAllClockPages(`/users/${userId}/clocks/`, authToken)
 }
 
 /**
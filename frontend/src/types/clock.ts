@@ -9,6 +9,11 @@ export interface Clock {
   created_at: string
 }
 
+export interface ClockPage {
+  items: Clock[]
+  next_cursor: string | null
+}
+
 export interface ClockInOutCreatePayload {
   user_id: number
 }